@@ -42,7 +42,7 @@ def create_app() -> Flask:
     except Exception:
         pass
     limiter.init_app(app)
-    cors.init_app(app, resources={r"/api/*": {"origins": "*"}})
+    cors.init_app(app, resources={r"/api/*": {"origins": "*"}, r"/.well-known/*": {"origins": "*"}})
 
     login_manager.login_view = "account.login"
 
@@ -102,6 +102,9 @@ def create_app() -> Flask:
     except Exception:
         pass
 
+    from cli import register_cli
+    register_cli(app)
+
     if app.config.get("ENV") == "development":
         from blueprints.dev import bp as dev_bp
         app.register_blueprint(dev_bp)
@@ -170,7 +173,10 @@ def create_app() -> Flask:
             User, Publisher, Article, Transaction, Event, AdminAccount,
             AuthorProfile, ContentLicense, ShowcaseSite, AuthorEarnings,
             ThemeSettings, SiteSettings, SplitRule, RevokedToken,
-            ContactMessage, MagicLogin, PublisherUser
+            ContactMessage, MagicLogin, PublisherUser, PublisherApiKey, SpendBucket,
+            WalletLedgerEntry, WalletCheckpoint, IdempotencyKey,
+            SettlementRun, PayoutStatement, PayoutLine, SearchDocument, Entitlement,
+            EventDailyCount, AnalyticsWatermark, UserAgent
         )
         db.create_all()
         # Dev-friendly: ensure new columns exist in SQLite without migrations
@@ -225,11 +231,31 @@ def create_app() -> Flask:
                     db.session.execute(text("ALTER TABLE publishers ADD COLUMN accepts_submissions BOOLEAN DEFAULT 1"))
                 if "default_author_split_bps" not in pub_cols:
                     db.session.execute(text("ALTER TABLE publishers ADD COLUMN default_author_split_bps INTEGER DEFAULT 6000"))
+                if "updated_at" not in pub_cols:
+                    db.session.execute(text("ALTER TABLE publishers ADD COLUMN updated_at TIMESTAMP"))
+                
+                # Ensure keyset pagination indexes on existing tables
+                for stmt in (
+                    "CREATE INDEX IF NOT EXISTS ix_publishers_name_id ON publishers (name, id)",
+                    "CREATE INDEX IF NOT EXISTS ix_users_created_id ON users (created_at, id)",
+                    "CREATE INDEX IF NOT EXISTS ix_articles_created_id ON articles (created_at, id)",
+                    "CREATE INDEX IF NOT EXISTS ix_articles_publisher_created_id ON articles (publisher_id, created_at, id)",
+                    "CREATE INDEX IF NOT EXISTS ix_articles_author_created_id ON articles (author_id, created_at, id)",
+                    "CREATE UNIQUE INDEX IF NOT EXISTS ix_settlement_runs_from_transaction_id "
+                    "ON settlement_runs (from_transaction_id)",
+                ):
+                    db.session.execute(text(stmt))
                 
                 db.session.commit()
         except Exception:
             db.session.rollback()
 
+        # Full-text search structures (FTS5 on SQLite, GIN index on Postgres)
+        from services.search import ensure_schema as ensure_search_schema
+        ensure_search_schema(app)
+        from services.suggest import get_index as get_suggest_index
+        get_suggest_index(app).build()
+
         # Ensure a default admin account for demo
         try:
             from werkzeug.security import generate_password_hash
@@ -240,6 +266,19 @@ def create_app() -> Flask:
         except Exception:
             db.session.rollback()
 
+    # Analytics events are written in batches off the request path
+    from services.event_sink import init_event_sink
+    init_event_sink(app)
+    from services.event_policy import get_policy
+    get_policy(app)  # fail fast on a malformed EVENT_POLICIES
+    from services.signing_keys import get_keyring
+    get_keyring(app)  # fail fast on missing signing keys
+    if app.config["SQLALCHEMY_BINDS"]["analytics"].startswith("sqlite"):
+        # Dev-friendly: move an events table from before the compact encoding to its columns
+        from services.event_encoding import ensure_compact_schema
+        with app.app_context():
+            ensure_compact_schema()
+
     return app
 
 
@@ -4,6 +4,7 @@ from flask_login import login_required
 from extensions import db, csrf
 from models import ThemeSettings, AdminAccount, Publisher, SplitRule, SiteSettings
 from werkzeug.security import generate_password_hash, check_password_hash
+from services.splits import invalidate_publisher as invalidate_publisher_splits
 
 
 bp = Blueprint("admin", __name__, template_folder="../templates")
@@ -203,6 +204,7 @@ def splits_post():
         lab = (labels[i] if i < len(labels) else '') or role
         db.session.add(SplitRule(publisher_id=pub_id, role=role, percent_bps=bps, recipient_label=lab))
     db.session.commit()
+    invalidate_publisher_splits(pub_id)
     # Validate sum <= 10000
     total = db.session.query(db.func.coalesce(db.func.sum(SplitRule.percent_bps), 0)).filter_by(publisher_id=pub_id).scalar() or 0
     if total > 10000:
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 from datetime import datetime, timedelta
 import csv
+import hashlib
 import io
 import json
 import secrets
@@ -9,28 +10,46 @@ import secrets
 from flask import Blueprint, request, jsonify, session, current_app, Response
 from flask_login import login_required, current_user, login_user, logout_user
 from sqlalchemy import func
+from sqlalchemy.orm import defer
 from werkzeug.security import check_password_hash
 
 from extensions import db, csrf, limiter
 from models import (
     Article, Transaction, Publisher, User, ContactMessage, 
     MagicLogin, PublisherUser, AdminAccount, ThemeSettings, 
-    SiteSettings, SplitRule, Event
+    SiteSettings, SplitRule, Event, IdempotencyKey
 )
-from services.payments import calculate_fees_cents, apply_split_rules
-from services.tokens import issue_jwt, verify_jwt, revoke_token
+from services.payments import apply_split_rules
+from services.splits import (
+    invalidate_article as invalidate_article_splits,
+    invalidate_publisher as invalidate_publisher_splits,
+)
+from services.tokens import issue_jwt, verify_jwt, verify_many, revoke_token, get_verifier as get_token_verifier
 from services.schemas import (
-    PayRequestSchema, VerifyRequestSchema, RefundRequestSchema, 
+    PayRequestSchema, BatchPayRequestSchema, VerifyRequestSchema, BatchVerifyRequestSchema, RefundRequestSchema, 
     TopupRequestSchema, ContactRequestSchema, LoginRequestSchema,
     MagicLinkRequestSchema, ThemeUpdateSchema, SiteUpdateSchema,
-    SplitRulesUpdateSchema
+    SplitRulesUpdateSchema, SplitSimulationSchema, ApiKeyCreateSchema
 )
 from services.events import track_event
+from services.event_sink import get_sink as get_event_sink
+from services.event_policy import get_policy as get_event_policy
+from services.listings import (
+    listing_query, with_publisher, with_author_profile, transaction_listing_query, article_summary,
+)
+from services.spend import spent_in_window, record_spend, spend_committed
+from services.ledger import adjust_wallet, append_entry
+from services.idempotency import idempotent, lookup as lookup_idempotency_key
+from services.pagination import keyset_page, InvalidCursor
+from services import entitlements, search as search_index
+from services.suggest import get_index as get_suggest_index, suggest as suggest_names
+from services.response_cache import cached_response, catalog_changed, get_cache as get_response_cache
 
 
 bp = Blueprint("api", __name__)
 @bp.route("/publishers", methods=["GET"])  # simple pagination/filters for newsstand
 @csrf.exempt
+@cached_response()
 def list_publishers():
     from models import Publisher
     try:
@@ -44,14 +63,14 @@ def list_publishers():
     if category:
         qry = qry.filter(Publisher.category == category)
     if q:
-        like = f"%{q}%"
-        qry = qry.filter(Publisher.name.ilike(like))
-    pubs = (
-        qry.order_by(Publisher.name.asc())
-        .offset(offset)
-        .limit(limit)
-        .all()
-    )
+        qry = qry.filter(Publisher.id.in_(search_index.matching_ids(q, "publisher")))
+    try:
+        pubs, next_cursor = keyset_page(
+            qry, (Publisher.name, Publisher.id), limit,
+            cursor=request.args.get("cursor"), offset=offset,
+        )
+    except InvalidCursor:
+        return jsonify({"error": "Invalid cursor"}), 400
     items = [
         {
             "slug": p.slug,
@@ -62,13 +81,14 @@ def list_publishers():
         }
         for p in pubs
     ]
-    return jsonify({"items": items})
+    return jsonify({"items": items, "next_cursor": next_cursor})
 
 
 @bp.route("/pay", methods=["POST"])
 @csrf.exempt
 @limiter.limit("10/minute")
 @login_required
+@idempotent()
 def pay():
     payload = request.get_json(silent=True) or {}
     data = PayRequestSchema().load(payload)
@@ -80,66 +100,99 @@ def pay():
 
     price = article.price_cents or (article.publisher.default_price_cents if article.publisher else 25)
 
-    # Daily cap enforcement
+    # Daily cap enforcement (hourly spend buckets, at most 24 rows)
     cap = int(current_app.config.get("DAILY_SPEND_CAP_CENTS", 1500))
-    since = datetime.utcnow() - timedelta(days=1)
-    spent = (
-        db.session.query(db.func.coalesce(db.func.sum(Transaction.price_cents), 0))
-        .filter(Transaction.user_id == current_user.id, Transaction.created_at >= since, Transaction.type == "debit")
-        .scalar()
-    )
+    spent = spent_in_window(current_user.id)
     if spent + price > cap:
         return jsonify({"error": "Daily spend cap reached"}), 429
 
     if (current_user.wallet_cents or 0) < price:
         return jsonify({"error": "Insufficient balance"}), 402
 
-    # Calculate revenue split using new flexible logic
-    from services.payments import calculate_article_split, record_author_earnings
-    split_amounts = calculate_article_split(price, article)
-    
-    # Legacy fee/net calculation for backward compatibility
-    fee, net = calculate_fees_cents(price)
-
-    import json
-    txn = Transaction(
-        user_id=current_user.id,
-        article_id=article.id,
-        publisher_id=article.publisher_id,
-        price_cents=price,
-        fee_cents=fee,
-        net_cents=net,
-        type="debit",
+    # Debit, transaction, author earnings and pay event commit together
+    from services.payments import purchase_article
+    result = purchase_article(
+        current_user.id,
+        article,
+        price,
         ip_address=request.remote_addr,
         user_agent=request.headers.get("User-Agent"),
-        split_breakdown_json=json.dumps(split_amounts),
     )
-    current_user.wallet_cents = (current_user.wallet_cents or 0) - price
-    db.session.add(txn)
-    db.session.commit()
+    if result is None:
+        return jsonify({"error": "Insufficient balance"}), 402
 
-    # Record author earnings if applicable
-    try:
-        record_author_earnings(article, txn, split_amounts)
-    except Exception as e:
-        # Don't fail transaction if earnings recording fails
-        print(f"Failed to record author earnings: {e}")
+    token = issue_jwt(current_user.id, result.article_id, result.publisher_id, exp_minutes=10)
+    entitlements.changed(current_user.id)
 
-    # Analytics
-    track_event("pay", article_id=article.id, publisher_id=article.publisher_id, metadata={"price_cents": price})
+    return jsonify({
+        "access_token": token,
+        "balance_cents": current_user.wallet_cents,
+        "price_cents": price,
+        "transaction_id": result.transaction_id,
+        "split": result.split,
+    })
 
-    token = issue_jwt(current_user.id, article.id, article.publisher_id, exp_minutes=10)
 
-    unlocked = set(session.get("unlocked_articles", []))
-    unlocked.add(str(article.id))
-    session["unlocked_articles"] = list(unlocked)
+@bp.route("/pay/batch", methods=["POST"])
+@csrf.exempt
+@limiter.limit("10/minute")
+@login_required
+@idempotent()
+def pay_batch():
+    """Unlock several articles with one cap check, one debit and one commit."""
+    from sqlalchemy.orm import joinedload
+    from services.payments import purchase_articles
+
+    payload = request.get_json(silent=True) or {}
+    data = BatchPayRequestSchema().load(payload)
+    article_ids = data["article_ids"]
+
+    articles = {
+        a.id: a
+        for a in Article.query.options(joinedload(Article.publisher)).filter(Article.id.in_(article_ids)).all()
+    }
+    missing = [aid for aid in article_ids if aid not in articles]
+    if missing:
+        return jsonify({"error": "Article not found", "article_ids": missing}), 404
+
+    items = []
+    for aid in article_ids:
+        article = articles[aid]
+        price = article.price_cents or (article.publisher.default_price_cents if article.publisher else 25)
+        items.append((article, price))
+    total = sum(price for _, price in items)
+
+    cap = int(current_app.config.get("DAILY_SPEND_CAP_CENTS", 1500))
+    if spent_in_window(current_user.id) + total > cap:
+        return jsonify({"error": "Daily spend cap reached"}), 429
+
+    if (current_user.wallet_cents or 0) < total:
+        return jsonify({"error": "Insufficient balance"}), 402
+
+    purchases = purchase_articles(
+        current_user.id,
+        items,
+        ip_address=request.remote_addr,
+        user_agent=request.headers.get("User-Agent"),
+    )
+    if purchases is None:
+        return jsonify({"error": "Insufficient balance"}), 402
+
+    out = []
+    for p in purchases:
+        out.append({
+            "article_id": p.article_id,
+            "access_token": issue_jwt(current_user.id, p.article_id, p.publisher_id, exp_minutes=10),
+            "price_cents": p.price_cents,
+            "transaction_id": p.transaction_id,
+            "split": p.split,
+        })
+    entitlements.changed(current_user.id)
 
     return jsonify({
-        "access_token": token,
+        "items": out,
+        "total_cents": total,
         "balance_cents": current_user.wallet_cents,
-        "price_cents": price,
-        "transaction_id": txn.id,
-        "split": split_amounts,
     })
 
 
@@ -158,10 +211,51 @@ def verify():
     return jsonify({"valid": valid})
 
 
+def _api_key_from_request():
+    """The publisher API key sent as `Authorization: Bearer <key>` or `X-Api-Key`."""
+    auth = request.headers.get("Authorization", "")
+    if auth.lower().startswith("bearer "):
+        return auth[7:].strip()
+    return request.headers.get("X-Api-Key", "").strip() or None
+
+
+@bp.route("/partner/verify", methods=["POST"])
+@csrf.exempt
+@limiter.limit("120/minute")
+def partner_verify_batch():
+    """Check many (token, article_id) pairs for one publisher in a single call."""
+    from services.api_keys import authenticate, touch as touch_api_key
+
+    key = authenticate(_api_key_from_request())
+    if key is None:
+        return jsonify({"error": "Valid publisher API key required"}), 401
+
+    payload = request.get_json(silent=True) or {}
+    items = BatchVerifyRequestSchema().load(payload)["items"]
+
+    results = []
+    for item, claims in zip(items, verify_many([i["token"] for i in items])):
+        # A key only vouches for its own publisher's tokens
+        valid = bool(
+            claims
+            and str(claims.get("article_id")) == str(item["article_id"])
+            and str(claims.get("publisher_id")) == str(key.publisher_id)
+        )
+        results.append({
+            "article_id": item["article_id"],
+            "valid": valid,
+            "exp": claims.get("exp") if valid else None,
+        })
+
+    touch_api_key(key)
+    return jsonify({"results": results})
+
+
 @bp.route("/refund", methods=["POST"])
 @csrf.exempt
 @limiter.limit("5/minute")
 @login_required
+@idempotent()
 def refund():
     payload = request.get_json(silent=True) or {}
     data = RefundRequestSchema().load(payload)
@@ -186,9 +280,14 @@ def refund():
         ip_address=request.remote_addr,
         user_agent=request.headers.get("User-Agent"),
     )
-    current_user.wallet_cents = (current_user.wallet_cents or 0) + orig.price_cents
     db.session.add(refund_txn)
+    db.session.flush()
+    adjust_wallet(current_user.id, orig.price_cents, "refund", transaction_id=refund_txn.id)
+    bucket_start = record_spend(current_user.id, -orig.price_cents, at=orig.created_at)
+    entitlements.revoke(current_user.id, orig.article_id)
     db.session.commit()
+    spend_committed(current_user.id, bucket_start, -orig.price_cents)
+    entitlements.changed(current_user.id)
 
     # Revoke any token provided for this article if supplied by client (optional best-effort)
     token = (payload or {}).get("access_token")
@@ -200,8 +299,29 @@ def refund():
 
 # ========== PUBLIC APIs ==========
 
+def _conditional(response, version_parts, last_modified=None, private=False, max_age=None):
+    """
+    Attach a strong ETag built from version_parts (and Last-Modified), then
+    turn the response into a 304 if the request's validators match.
+    Responses are revalidated every time unless a public max_age is given.
+    """
+    raw = ":".join("" if p is None else str(p) for p in version_parts)
+    response.set_etag(hashlib.sha1(raw.encode()).hexdigest())
+    if last_modified:
+        response.last_modified = last_modified
+    if private:
+        response.headers["Cache-Control"] = "private, no-cache"
+        response.vary.add("Cookie")
+    elif max_age is not None:
+        response.headers["Cache-Control"] = f"public, max-age={max_age}"
+    else:
+        response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+
 @bp.route("/publishers/<string:slug>", methods=["GET"])
 @csrf.exempt
+@cached_response()
 def get_publisher(slug: str):
     """Get publisher details with article counts."""
     pub = Publisher.query.filter_by(slug=slug).first()
@@ -209,8 +329,9 @@ def get_publisher(slug: str):
         return jsonify({"error": "Publisher not found"}), 404
     
     article_count = db.session.query(func.count(Article.id)).filter(Article.publisher_id == pub.id).scalar()
+    last_modified = pub.updated_at or pub.created_at
     
-    return jsonify({
+    return _conditional(jsonify({
         "id": pub.id,
         "name": pub.name,
         "slug": pub.slug,
@@ -222,11 +343,12 @@ def get_publisher(slug: str):
         "layout_style": pub.layout_style,
         "strapline": pub.strapline,
         "article_count": article_count or 0,
-    })
+    }), ("publisher", pub.id, last_modified, article_count), last_modified)
 
 
 @bp.route("/articles", methods=["GET"])
 @csrf.exempt
+@cached_response(when=lambda: request.args.get("featured") == "true")
 def list_articles():
     """List articles with optional filters."""
     try:
@@ -239,7 +361,7 @@ def list_articles():
     category = (request.args.get("category") or "").strip()
     featured = request.args.get("featured") == "true"
     
-    query = Article.query
+    query = with_publisher(listing_query())
     
     if publisher_slug:
         pub = Publisher.query.filter_by(slug=publisher_slug).first()
@@ -249,46 +371,132 @@ def list_articles():
     if category:
         query = query.join(Publisher).filter(Publisher.category == category)
     
+    next_cursor = None
     if featured:
-        query = query.join(Publisher).order_by(Article.created_at.desc()).limit(8)
+        articles = query.join(Publisher).order_by(Article.created_at.desc()).limit(8).all()
     else:
-        query = query.order_by(Article.created_at.desc()).offset(offset).limit(limit)
-    
-    articles = query.all()
+        try:
+            articles, next_cursor = keyset_page(
+                query, (Article.created_at, Article.id), limit,
+                cursor=request.args.get("cursor"), descending=True, offset=offset,
+            )
+        except InvalidCursor:
+            return jsonify({"error": "Invalid cursor"}), 400
     
     items = []
     for a in articles:
         items.append({
-            "id": a.id,
-            "slug": a.slug,
-            "title": a.title,
-            "dek": a.dek,
+            **article_summary(a),
             "author": a.author,
             "media_type": a.media_type,
             "price_cents": a.price_cents or (a.publisher.default_price_cents if a.publisher else 25),
-            "cover_url": a.cover_url,
             "publisher_slug": a.publisher.slug if a.publisher else None,
             "publisher_name": a.publisher.name if a.publisher else None,
-            "created_at": a.created_at.isoformat() if a.created_at else None,
         })
     
-    return jsonify({"items": items})
+    return jsonify({"items": items, "next_cursor": next_cursor})
 
 
-@bp.route("/articles/<int:article_id>", methods=["GET"])
+@bp.route("/search", methods=["GET"])
 @csrf.exempt
-def get_article(article_id: int):
-    """Get article detail with unlock status."""
-    article = Article.query.get(article_id)
-    if not article:
-        return jsonify({"error": "Article not found"}), 404
-    
-    unlocked_set = set(session.get("unlocked_articles", []))
-    unlocked = str(article.id) in unlocked_set
-    
+def search():
+    """Ranked full-text search over publishers and articles."""
+    q = (request.args.get("q") or "").strip()
+    kind = (request.args.get("type") or "").strip()
+    if kind not in ("", "article", "publisher"):
+        return jsonify({"error": "type must be article or publisher"}), 400
+    try:
+        offset = max(int(request.args.get("offset", 0) or 0), 0)
+        limit = min(max(int(request.args.get("limit", 20) or 20), 1), 50)
+        min_price = int(request.args["min_price"]) if request.args.get("min_price") else None
+        max_price = int(request.args["max_price"]) if request.args.get("max_price") else None
+    except ValueError:
+        return jsonify({"error": "Invalid number"}), 400
+    if not q:
+        return jsonify({"items": [], "next_offset": None})
+
+    hits, has_more = search_index.search(
+        q, kind=kind or None,
+        category=(request.args.get("category") or "").strip() or None,
+        media_type=(request.args.get("media_type") or "").strip() or None,
+        min_price=min_price, max_price=max_price,
+        limit=limit, offset=offset,
+    )
+
+    # Hydrate hits with one query per kind, then restore rank order
+    article_ids = [h.ref_id for h in hits if h.kind == "article"]
+    publisher_ids = [h.ref_id for h in hits if h.kind == "publisher"]
+    articles = {
+        a.id: a for a in with_publisher(listing_query()).filter(Article.id.in_(article_ids)).all()
+    } if article_ids else {}
+    publishers = {
+        p.id: p for p in Publisher.query.filter(Publisher.id.in_(publisher_ids)).all()
+    } if publisher_ids else {}
+
+    items = []
+    for h in hits:
+        if h.kind == "article" and h.ref_id in articles:
+            a = articles[h.ref_id]
+            items.append({
+                "type": "article",
+                "score": h.score,
+                **article_summary(a),
+                "author": a.author,
+                "media_type": a.media_type,
+                "price_cents": a.price_cents or (a.publisher.default_price_cents if a.publisher else 25),
+                "publisher_slug": a.publisher.slug if a.publisher else None,
+                "publisher_name": a.publisher.name if a.publisher else None,
+            })
+        elif h.kind == "publisher" and h.ref_id in publishers:
+            p = publishers[h.ref_id]
+            items.append({
+                "type": "publisher",
+                "score": h.score,
+                "id": p.id,
+                "slug": p.slug,
+                "name": p.name,
+                "strapline": p.strapline,
+                "hero_url": p.hero_url,
+                "category": p.category,
+                "accent_color": p.accent_color,
+            })
+
+    return jsonify({"items": items, "next_offset": offset + limit if has_more else None})
+
+
+@bp.route("/suggest", methods=["GET"])
+@csrf.exempt
+def suggest():
+    """Typeahead over publisher and author names, served from memory."""
+    try:
+        limit = min(max(int(request.args.get("limit", 8) or 8), 1), 20)
+    except ValueError:
+        limit = 8
+    items = suggest_names(request.args.get("q") or "", limit=limit)
+    return jsonify({"items": [s.to_dict() for s in items]})
+
+
+def _article_version(article_id: int):
+    """Row versions only (no body columns), so repeat views can 304 cheaply."""
+    return (
+        db.session.query(Article.updated_at, Article.created_at, Publisher.id, Publisher.updated_at)
+        .outerjoin(Publisher, Publisher.id == Article.publisher_id)
+        .filter(Article.id == article_id)
+        .first()
+    )
+
+
+def _article_validators(article_id: int, version):
+    """(version_parts, last_modified) for an article and its publisher."""
+    article_modified = version[0] or version[1]
+    last_modified = max(d for d in (article_modified, version[3]) if d)
+    return ("article", article_id, article_modified, version[2], version[3]), last_modified
+
+
+def _public_article_doc(article) -> dict:
+    """The shared, user-independent part of an article."""
     price = article.price_cents or (article.publisher.default_price_cents if article.publisher else 25)
-    
-    result = {
+    return {
         "id": article.id,
         "slug": article.slug,
         "title": article.title,
@@ -303,9 +511,31 @@ def get_article(article_id: int):
             "slug": article.publisher.slug if article.publisher else None,
             "accent_color": article.publisher.accent_color if article.publisher else None,
         } if article.publisher else None,
-        "unlocked": unlocked,
         "created_at": article.created_at.isoformat() if article.created_at else None,
     }
+
+
+@bp.route("/articles/<int:article_id>", methods=["GET"])
+@csrf.exempt
+def get_article(article_id: int):
+    """Get article detail with unlock status."""
+    version = _article_version(article_id)
+    if not version:
+        return jsonify({"error": "Article not found"}), 404
+    
+    unlocked = entitlements.is_entitled(current_user, article_id)
+    
+    version_parts, last_modified = _article_validators(article_id, version)
+    version_parts += (int(unlocked),)
+    not_modified = _conditional(current_app.response_class(), version_parts, last_modified, private=True)
+    if not_modified.status_code == 304:
+        track_event("article_view", article_id=article_id, publisher_id=version[2])
+        return not_modified
+    
+    article = Article.query.get(article_id)
+    
+    result = _public_article_doc(article)
+    result["unlocked"] = unlocked
     
     if unlocked:
         result["body_html"] = article.body_html
@@ -314,11 +544,55 @@ def get_article(article_id: int):
     
     track_event("article_view", article_id=article.id, publisher_id=article.publisher_id if article.publisher else None)
     
-    return jsonify(result)
+    return _conditional(jsonify(result), version_parts, last_modified, private=True)
+
+
+@bp.route("/articles/<int:article_id>/public", methods=["GET"])
+@csrf.exempt
+@cached_response()
+def get_article_public(article_id: int):
+    """Shared article document (metadata and preview), cacheable by browsers and CDNs."""
+    version = _article_version(article_id)
+    if not version:
+        return jsonify({"error": "Article not found"}), 404
+    
+    max_age = int(current_app.config.get("ARTICLE_PUBLIC_MAX_AGE", 60))
+    version_parts, last_modified = _article_validators(article_id, version)
+    not_modified = _conditional(current_app.response_class(), version_parts, last_modified, max_age=max_age)
+    if not_modified.status_code == 304:
+        return not_modified
+    
+    article = Article.query.options(defer(Article.body_html)).filter(Article.id == article_id).first()
+    result = _public_article_doc(article)
+    result["body_preview"] = article.body_preview
+    return _conditional(jsonify(result), version_parts, last_modified, max_age=max_age)
+
+
+@bp.route("/articles/<int:article_id>/entitlement", methods=["GET"])
+@csrf.exempt
+def get_article_entitlement(article_id: int):
+    """The caller's unlock state for an article, with the body only when entitled."""
+    unlocked = entitlements.is_entitled(current_user, article_id)
+    
+    columns = [Article.publisher_id] + ([Article.body_html] if unlocked else [])
+    row = db.session.query(*columns).filter(Article.id == article_id).first()
+    if not row:
+        return jsonify({"error": "Article not found"}), 404
+    
+    # Views are counted here: the public document may be served from cache
+    track_event("article_view", article_id=article_id, publisher_id=row[0])
+    
+    result = {"article_id": article_id, "unlocked": unlocked}
+    if unlocked:
+        result["body_html"] = row[1]
+    response = jsonify(result)
+    response.headers["Cache-Control"] = "private, no-store"
+    return response
 
 
 @bp.route("/categories", methods=["GET"])
 @csrf.exempt
+@cached_response()
 def list_categories():
     """List distinct publisher categories."""
     cats = [
@@ -332,6 +606,7 @@ def list_categories():
 
 @bp.route("/publications-showcase", methods=["GET"])
 @csrf.exempt
+@cached_response()
 def publications_showcase():
     """Get showcase data for publications using Paypr (fake examples for demo)."""
     showcase_pubs = [
@@ -469,6 +744,8 @@ def auth_login():
     if not user:
         user = User(email=email, wallet_cents=500)  # $5 starter balance
         db.session.add(user)
+        db.session.flush()
+        append_entry(user.id, 500, "signup")
         db.session.commit()
     
     login_user(user, remember=True)
@@ -527,6 +804,8 @@ def auth_magic_verify():
     if not user:
         user = User(email=ml.email, wallet_cents=500)
         db.session.add(user)
+        db.session.flush()
+        append_entry(user.id, 500, "signup")
         db.session.commit()
     
     login_user(user, remember=True)
@@ -590,6 +869,7 @@ def account_wallet():
 @csrf.exempt
 @limiter.limit("20/minute")
 @login_required
+@idempotent()
 def account_topup():
     """Dev wallet topup."""
     payload = request.get_json(silent=True) or {}
@@ -597,7 +877,7 @@ def account_topup():
     
     amount_cents = data["amount_cents"]
     
-    current_user.wallet_cents = (current_user.wallet_cents or 0) + amount_cents
+    adjust_wallet(current_user.id, amount_cents, "topup")
     db.session.commit()
     
     return jsonify({
@@ -610,6 +890,7 @@ def account_topup():
 @csrf.exempt
 @limiter.limit("10/minute")
 @login_required
+@idempotent()
 def account_topup_stripe():
     """Stripe test topup."""
     import stripe
@@ -636,7 +917,7 @@ def account_topup_stripe():
         )
         
         if intent.status == "succeeded":
-            current_user.wallet_cents = (current_user.wallet_cents or 0) + amount_cents
+            adjust_wallet(current_user.id, amount_cents, "topup")
             db.session.commit()
             return jsonify({"ok": True, "balance_cents": current_user.wallet_cents})
         
@@ -738,8 +1019,10 @@ def account_topup_verify_session():
         if session.payment_status != "paid":
             return jsonify({"error": "Payment not completed", "status": session.payment_status}), 400
         
-        # Check if we already credited this session (idempotency)
-        existing = Transaction.query.filter_by(
+        # Check if we already credited this session (idempotency): unique-index
+        # lookup first, then the legacy ip_address match for credits made
+        # before the key store existed
+        existing = lookup_idempotency_key("stripe-checkout", session_id) or Transaction.query.filter_by(
             user_id=current_user.id,
             type="topup"
         ).filter(
@@ -755,7 +1038,6 @@ def account_topup_verify_session():
         
         # Credit the wallet
         amount_cents = int(session.metadata.get("amount_cents", 0))
-        current_user.wallet_cents = (current_user.wallet_cents or 0) + amount_cents
         
         # Create transaction record
         txn = Transaction(
@@ -770,6 +1052,16 @@ def account_topup_verify_session():
             user_agent=request.headers.get("User-Agent"),
         )
         db.session.add(txn)
+        db.session.flush()
+        adjust_wallet(current_user.id, amount_cents, "topup", transaction_id=txn.id)
+        # Never expires: a paid Checkout session stays retrievable indefinitely
+        db.session.add(IdempotencyKey(
+            scope="stripe-checkout",
+            key=session_id,
+            endpoint=request.endpoint,
+            status_code=200,
+            expires_at=None,
+        ))
         db.session.commit()
         
         return jsonify({
@@ -788,7 +1080,7 @@ def account_topup_verify_session():
 def account_transactions():
     """Get transaction history."""
     txns = (
-        Transaction.query.filter_by(user_id=current_user.id)
+        transaction_listing_query().filter_by(user_id=current_user.id)
         .order_by(Transaction.created_at.desc())
         .all()
     )
@@ -901,6 +1193,35 @@ def _require_publisher_auth():
     return pub_user
 
 
+def _publisher_all_time_stats(publisher_id):
+    """
+    All-time (unlocks, revenue_cents) for one publisher (or every publisher when None).
+
+    Reads settled payout statements and scans only transactions past the
+    settlement high-water mark, so cost stays flat as history grows. The tail
+    counts what publisher statements count: every transaction that has a
+    publisher, refunds included, at gross price.
+    """
+    from models import PayoutStatement
+    from services.settlement import high_water_mark
+
+    hwm = high_water_mark()
+    settled = db.session.query(
+        func.coalesce(func.sum(PayoutStatement.transaction_count), 0),
+        func.coalesce(func.sum(PayoutStatement.gross_cents), 0),
+    ).filter(PayoutStatement.payee_type == "publisher")
+    tail = db.session.query(
+        func.count(Transaction.id),
+        func.coalesce(func.sum(Transaction.price_cents), 0),
+    ).filter(Transaction.id > hwm, Transaction.publisher_id.isnot(None))
+    if publisher_id:
+        settled = settled.filter(PayoutStatement.payee_id == publisher_id)
+        tail = tail.filter(Transaction.publisher_id == publisher_id)
+    settled_count, settled_gross = settled.one()
+    tail_count, tail_gross = tail.one()
+    return int(settled_count) + int(tail_count), int(settled_gross) + int(tail_gross)
+
+
 @bp.route("/publisher/console/stats", methods=["GET"])
 @csrf.exempt
 def publisher_console_stats():
@@ -916,15 +1237,8 @@ def publisher_console_stats():
     # In production, this would handle multiple publishers for admin users
     
     if publisher_id:
-        # Get all-time stats
-        all_time_stats = (
-            db.session.query(
-                func.count(Transaction.id).label('total_unlocks'),
-                func.sum(Transaction.price_cents).label('total_revenue')
-            )
-            .filter(Transaction.publisher_id == publisher_id)
-            .first()
-        )
+        # All-time stats: settled statements plus the unsettled tail
+        total_unlocks, total_revenue = _publisher_all_time_stats(publisher_id)
         
         # Get 7-day stats
         since_7d = datetime.utcnow() - timedelta(days=7)
@@ -944,21 +1258,15 @@ def publisher_console_stats():
         total_articles = Article.query.filter_by(publisher_id=publisher_id).count()
         
         return jsonify({
-            "all_time_revenue_cents": all_time_stats.total_revenue or 0,
+            "all_time_revenue_cents": total_revenue,
             "seven_day_revenue_cents": seven_day_stats.revenue_7d or 0,
-            "total_unlocks": all_time_stats.total_unlocks or 0,
+            "total_unlocks": total_unlocks,
             "seven_day_unlocks": seven_day_stats.unlocks_7d or 0,
             "total_articles": total_articles
         })
     else:
         # Admin view - return aggregate stats
-        all_time_stats = (
-            db.session.query(
-                func.count(Transaction.id).label('total_unlocks'),
-                func.sum(Transaction.price_cents).label('total_revenue')
-            )
-            .first()
-        )
+        total_unlocks, total_revenue = _publisher_all_time_stats(None)
         
         since_7d = datetime.utcnow() - timedelta(days=7)
         seven_day_stats = (
@@ -973,9 +1281,9 @@ def publisher_console_stats():
         total_articles = Article.query.count()
         
         return jsonify({
-            "all_time_revenue_cents": all_time_stats.total_revenue or 0,
+            "all_time_revenue_cents": total_revenue,
             "seven_day_revenue_cents": seven_day_stats.revenue_7d or 0,
-            "total_unlocks": all_time_stats.total_unlocks or 0,
+            "total_unlocks": total_unlocks,
             "seven_day_unlocks": seven_day_stats.unlocks_7d or 0,
             "total_articles": total_articles
         })
@@ -1318,6 +1626,7 @@ def admin_splits_update(publisher_id: int):
         db.session.add(rule)
     
     db.session.commit()
+    invalidate_publisher_splits(publisher_id)
     
     # Validate total
     total = db.session.query(func.coalesce(func.sum(SplitRule.percent_bps), 0)).filter_by(publisher_id=publisher_id).scalar() or 0
@@ -1329,6 +1638,109 @@ def admin_splits_update(publisher_id: int):
     })
 
 
+@bp.route("/admin/splits/simulate", methods=["POST"])
+@csrf.exempt
+@limiter.limit("10/minute")
+def admin_splits_simulate():
+    """What-if totals for a candidate platform fee and publisher split terms."""
+    if not session.get("is_admin"):
+        return jsonify({"error": "Admin authentication required"}), 401
+    
+    from services.simulator import simulate
+    
+    payload = request.get_json(silent=True) or {}
+    data = SplitSimulationSchema().load(payload)
+    
+    # Stored timestamps are naive UTC
+    from datetime import timezone
+    start, end = [
+        d.astimezone(timezone.utc).replace(tzinfo=None) if d.tzinfo else d
+        for d in (data["start"], data["end"])
+    ]
+    
+    return jsonify(simulate(start, end, fee_bps=data.get("fee_bps"), publisher_overrides=data.get("publishers")))
+
+
+@bp.route("/admin/cache/stats", methods=["GET"])
+@csrf.exempt
+def admin_cache_stats():
+    """Hit/miss counters for the in-process caches."""
+    if not session.get("is_admin"):
+        return jsonify({"error": "Admin authentication required"}), 401
+    cache = get_response_cache()
+    return jsonify({
+        "response_cache": cache.stats() if cache else None,
+        "token_verifier": get_token_verifier().stats(),
+        "event_sink": get_event_sink().stats() if get_event_sink() else None,
+        "event_policy": get_event_policy().stats(),
+    })
+
+
+@bp.route("/admin/analytics/top-articles", methods=["GET"])
+@csrf.exempt
+def admin_top_articles():
+    """Most viewed (or bought, with ?event=pay) articles over the last ?days=7."""
+    from services.analytics import top_articles
+
+    if not session.get("is_admin"):
+        return jsonify({"error": "Admin authentication required"}), 401
+    event_name = request.args.get("event", "article_view")
+    try:
+        days = min(max(int(request.args.get("days", 7) or 7), 1), 365)
+        limit = min(max(int(request.args.get("limit", 10) or 10), 1), 100)
+    except Exception:
+        days, limit = 7, 10
+    return jsonify({"items": top_articles(event_name, days=days, limit=limit)})
+
+
+def _series_args(default_days: int = 30):
+    try:
+        return min(max(int(request.args.get("days", default_days) or default_days), 1), 366)
+    except Exception:
+        return default_days
+
+
+@bp.route("/admin/analytics/series", methods=["GET"])
+@csrf.exempt
+def admin_analytics_series():
+    """Daily counts of ?event= (default article_view), optionally for one ?publisher_id= or ?article_id=."""
+    from services.analytics import daily_series
+
+    if not session.get("is_admin"):
+        return jsonify({"error": "Admin authentication required"}), 401
+    return jsonify({"series": daily_series(
+        request.args.get("event", "article_view"),
+        days=_series_args(),
+        publisher_id=request.args.get("publisher_id", type=int),
+        article_id=request.args.get("article_id", type=int),
+    )})
+
+
+@bp.route("/publisher/console/views", methods=["GET"])
+@csrf.exempt
+def publisher_console_views():
+    """Daily article views for the publisher, or for one of its articles with ?article_id=."""
+    from services.analytics import daily_series
+
+    auth_result = _require_publisher_auth()
+    if isinstance(auth_result, tuple):
+        return auth_result
+    
+    publisher_id = session.get("publisher_id")
+    if not publisher_id:
+        return jsonify({"error": "Publisher ID required"}), 400
+    
+    article_id = request.args.get("article_id", type=int)
+    if article_id is not None:
+        owned = db.session.query(Article.id).filter(Article.id == article_id, Article.publisher_id == publisher_id).first()
+        if not owned:
+            return jsonify({"error": "Article not found"}), 404
+    
+    return jsonify({"series": daily_series(
+        "article_view", days=_series_args(), publisher_id=publisher_id, article_id=article_id,
+    )})
+
+
 @bp.route("/admin/users", methods=["GET"])
 @csrf.exempt
 def admin_users_list():
@@ -1336,9 +1748,10 @@ def admin_users_list():
     if not session.get("is_admin"):
         return jsonify({"error": "Admin authentication required"}), 401
     
-    # Get pagination params
+    # Get pagination params (cursor, or legacy page for old clients)
     page = int(request.args.get("page", 1))
     per_page = int(request.args.get("per_page", 50))
+    cursor = request.args.get("cursor")
     search = request.args.get("search", "").strip()
     
     # Build query
@@ -1348,16 +1761,32 @@ def admin_users_list():
         query = query.filter(User.email.ilike(f"%{search}%"))
     
     # Get paginated users
-    users = query.order_by(User.created_at.desc()).limit(per_page).offset((page - 1) * per_page).all()
-    total = query.count()
+    try:
+        users, next_cursor = keyset_page(
+            query, (User.created_at, User.id), per_page,
+            cursor=cursor, descending=True, offset=(page - 1) * per_page,
+        )
+    except InvalidCursor:
+        return jsonify({"error": "Invalid cursor"}), 400
+    # Count only on the first page; cursor requests skip the recount
+    total = None if cursor else query.count()
+    
+    # Transaction stats for the whole page in one grouped query
+    user_ids = [user.id for user in users]
+    stats = {
+        row[0]: (row[1], row[2])
+        for row in db.session.query(
+            Transaction.user_id,
+            db.func.count(Transaction.id),
+            db.func.coalesce(db.func.sum(Transaction.price_cents), 0),
+        ).filter(Transaction.user_id.in_(user_ids), Transaction.type == "debit")
+        .group_by(Transaction.user_id)
+        .all()
+    } if user_ids else {}
     
     items = []
     for user in users:
-        # Get transaction stats
-        txn_count = Transaction.query.filter_by(user_id=user.id, type="debit").count()
-        total_spent = db.session.query(
-            db.func.coalesce(db.func.sum(Transaction.price_cents), 0)
-        ).filter_by(user_id=user.id, type="debit").scalar() or 0
+        txn_count, total_spent = stats.get(user.id, (0, 0))
         
         items.append({
             "id": user.id,
@@ -1373,6 +1802,7 @@ def admin_users_list():
         "page": page,
         "per_page": per_page,
         "total": total,
+        "next_cursor": next_cursor,
     })
 
 
@@ -1388,7 +1818,7 @@ def admin_user_detail(user_id: int):
         return jsonify({"error": "User not found"}), 404
     
     # Get recent transactions
-    recent_txns = Transaction.query.filter_by(user_id=user.id).order_by(
+    recent_txns = transaction_listing_query().filter_by(user_id=user.id).order_by(
         Transaction.created_at.desc()
     ).limit(20).all()
     
@@ -1421,6 +1851,7 @@ def admin_user_detail(user_id: int):
 @bp.route("/admin/users/<int:user_id>/credit", methods=["POST"])
 @csrf.exempt
 @limiter.limit("20/minute")
+@idempotent()
 def admin_credit_user(user_id: int):
     """Manually credit user wallet (admin only)."""
     if not session.get("is_admin"):
@@ -1441,9 +1872,6 @@ def admin_credit_user(user_id: int):
     if amount_cents == 0:
         return jsonify({"error": "Amount cannot be zero"}), 400
     
-    # Update wallet
-    user.wallet_cents = (user.wallet_cents or 0) + amount_cents
-    
     # Create transaction record for audit trail
     txn = Transaction(
         user_id=user.id,
@@ -1457,6 +1885,9 @@ def admin_credit_user(user_id: int):
         user_agent=note[:300] if note else "Admin manual adjustment",  # Store note in user_agent field
     )
     db.session.add(txn)
+    db.session.flush()
+    # Update wallet
+    adjust_wallet(user.id, amount_cents, txn.type, transaction_id=txn.id)
     db.session.commit()
     
     return jsonify({
@@ -1498,6 +1929,7 @@ def author_register():
     
     db.session.add(author)
     db.session.commit()
+    get_suggest_index().put_author(author)
     
     return jsonify({
         "ok": True,
@@ -1554,7 +1986,7 @@ def author_profile_public(author_id: int):
         return jsonify({"error": "Author not found"}), 404
     
     # Get published articles
-    articles = Article.query.filter(
+    articles = with_publisher(listing_query()).filter(
         Article.author_id == author.id,
         Article.status == "published"
     ).order_by(Article.created_at.desc()).limit(20).all()
@@ -1577,14 +2009,8 @@ def author_profile_public(author_id: int):
         "article_count": len(articles),
         "total_earnings_cents": total_earnings if current_user.is_authenticated and current_user.id == author.user_id else None,
         "articles": [{
-            "id": a.id,
-            "slug": a.slug,
-            "title": a.title,
-            "dek": a.dek,
-            "price_cents": a.price_cents,
-            "cover_url": a.cover_url,
+            **article_summary(a),
             "publisher_name": a.publisher.name if a.publisher else None,
-            "created_at": a.created_at.isoformat() if a.created_at else None
         } for a in articles]
     })
 
@@ -1619,6 +2045,7 @@ def author_profile_update():
         author.accepts_publisher_requests = bool(payload["accepts_publisher_requests"])
     
     db.session.commit()
+    get_suggest_index().put_author(author)
     
     return jsonify({"ok": True})
 
@@ -1636,41 +2063,42 @@ def author_content_list():
     
     status_filter = request.args.get("status", "").strip()
     
-    query = Article.query.filter(Article.author_id == author.id)
+    query = with_publisher(listing_query()).filter(Article.author_id == author.id)
     
     if status_filter:
         query = query.filter(Article.status == status_filter)
     
     articles = query.order_by(Article.created_at.desc()).all()
+    article_ids = [a.id for a in articles]
+    
+    # Earnings and read counts for every listed article, one grouped query each
+    from models import AuthorEarnings
+    earnings_by_article = dict(
+        db.session.query(AuthorEarnings.article_id, func.sum(AuthorEarnings.amount_cents))
+        .filter(AuthorEarnings.article_id.in_(article_ids))
+        .group_by(AuthorEarnings.article_id)
+        .all()
+    ) if article_ids else {}
+    reads_by_article = dict(
+        db.session.query(Transaction.article_id, func.count(Transaction.id))
+        .filter(Transaction.article_id.in_(article_ids), Transaction.type == "debit")
+        .group_by(Transaction.article_id)
+        .all()
+    ) if article_ids else {}
     
     items = []
     for a in articles:
-        # Get earnings for this article
-        from models import AuthorEarnings
-        earnings = db.session.query(
-            func.coalesce(func.sum(AuthorEarnings.amount_cents), 0)
-        ).filter(AuthorEarnings.article_id == a.id).scalar() or 0
-        
-        # Get read count
-        reads = db.session.query(func.count(Transaction.id)).filter(
-            Transaction.article_id == a.id,
-            Transaction.type == "debit"
-        ).scalar() or 0
+        earnings = earnings_by_article.get(a.id) or 0
+        reads = reads_by_article.get(a.id) or 0
         
         items.append({
-            "id": a.id,
-            "slug": a.slug,
-            "title": a.title,
-            "dek": a.dek,
-            "price_cents": a.price_cents,
-            "cover_url": a.cover_url,
+            **article_summary(a),
             "status": a.status,
             "license_type": a.license_type,
             "publisher_name": a.publisher.name if a.publisher else None,
             "publisher_id": a.publisher_id,
             "earnings_cents": earnings,
             "reads": reads,
-            "created_at": a.created_at.isoformat() if a.created_at else None,
             "updated_at": a.updated_at.isoformat() if a.updated_at else None
         })
     
@@ -1722,7 +2150,10 @@ def author_content_submit():
     )
     
     db.session.add(article)
+    db.session.flush()
+    search_index.index_article(article, commit=False)
     db.session.commit()
+    catalog_changed()
     
     # If has publisher and license, create license record
     if article.publisher_id and article.license_type in ["revenue_share", "buyout"]:
@@ -1786,7 +2217,10 @@ def author_content_update(article_id: int):
     if "custom_splits" in payload:
         article.custom_splits = payload["custom_splits"]
     
+    search_index.index_article(article, commit=False)
     db.session.commit()
+    invalidate_article_splits(article.id)
+    catalog_changed()
     
     return jsonify({"ok": True})
 
@@ -1815,12 +2249,16 @@ def author_content_delete(article_id: int):
     if purchase_count > 0:
         # Don't delete, just unpublish
         article.status = "archived"
+        search_index.index_article(article, commit=False)
         db.session.commit()
+        catalog_changed()
         return jsonify({"ok": True, "message": "Article archived (has purchases)"})
     else:
         # Safe to delete
+        search_index.remove_document("article", article.id, commit=False)
         db.session.delete(article)
         db.session.commit()
+        catalog_changed()
         return jsonify({"ok": True, "message": "Article deleted"})
 
 
@@ -1835,10 +2273,10 @@ def author_earnings():
     if not author:
         return jsonify({"error": "Author profile not found"}), 404
     
-    # Total earnings
-    total_earnings = db.session.query(
-        func.coalesce(func.sum(AuthorEarnings.amount_cents), 0)
-    ).filter(AuthorEarnings.author_id == author.id).scalar() or 0
+    # Total earnings: settled payouts plus the unsettled tail, both net of refunds
+    from services.settlement import settled_totals, unsettled_amount
+    settled = settled_totals("author", author.id)
+    total_earnings = settled.amount_cents + unsettled_amount("author", author.id, settled.high_water_mark)
     
     # Last 30 days earnings
     since = datetime.utcnow() - timedelta(days=30)
@@ -1902,7 +2340,7 @@ def publisher_available_content():
     max_price = request.args.get("max_price")
     author_id = request.args.get("author_id")
     
-    query = Article.query.filter(
+    query = with_author_profile(listing_query()).filter(
         Article.status == "published",
         Article.license_type.in_(["independent", "revenue_share"])
     ).join(
@@ -1924,15 +2362,10 @@ def publisher_available_content():
     items = []
     for a in articles:
         items.append({
-            "id": a.id,
-            "title": a.title,
-            "dek": a.dek,
+            **article_summary(a),
             "author_name": a.author_profile.display_name if a.author_profile else a.author,
             "author_id": a.author_id,
-            "price_cents": a.price_cents,
-            "cover_url": a.cover_url,
             "license_type": a.license_type,
-            "created_at": a.created_at.isoformat() if a.created_at else None
         })
     
     return jsonify({"articles": items})
@@ -1970,7 +2403,10 @@ def publisher_add_content(article_id: int):
     if "custom_splits" in payload:
         article.custom_splits = payload["custom_splits"]
     
+    search_index.index_article(article, commit=False)
     db.session.commit()
+    invalidate_article_splits(article.id)
+    catalog_changed()
     
     # Create license record
     from models import ContentLicense
@@ -2012,6 +2448,7 @@ def publisher_configure_splits(article_id: int):
     # Store as JSON
     article.custom_splits = json.dumps(splits)
     db.session.commit()
+    invalidate_article_splits(article.id)
     
     # Update license record
     from models import ContentLicense
@@ -2160,6 +2597,78 @@ def publisher_update_settings():
     if "default_author_split_bps" in payload:
         publisher.default_author_split_bps = int(payload["default_author_split_bps"])
     
+    search_index.index_publisher(publisher, commit=False)
     db.session.commit()
+    invalidate_publisher_splits(publisher_id)
+    get_suggest_index().put_publisher(publisher)
+    catalog_changed()
     
     return jsonify({"ok": True, "message": "Settings updated successfully"})
+
+
+def _api_key_dict(key):
+    return {
+        "id": key.id,
+        "label": key.label,
+        "prefix": key.prefix,
+        "created_at": key.created_at.isoformat() if key.created_at else None,
+        "last_used_at": key.last_used_at.isoformat() if key.last_used_at else None,
+        "revoked": key.revoked_at is not None,
+    }
+
+
+@bp.route("/publisher/api-keys", methods=["GET"])
+@csrf.exempt
+def publisher_api_keys():
+    """List the publisher's API keys (never the secrets)."""
+    from models import PublisherApiKey
+
+    auth_result = _require_publisher_auth()
+    if isinstance(auth_result, tuple):
+        return auth_result
+    
+    publisher_id = session.get("publisher_id")
+    if not publisher_id:
+        return jsonify({"error": "Publisher ID required"}), 400
+    
+    keys = PublisherApiKey.query.filter_by(publisher_id=publisher_id).order_by(PublisherApiKey.id.desc()).all()
+    return jsonify({"keys": [_api_key_dict(k) for k in keys]})
+
+
+@bp.route("/publisher/api-keys", methods=["POST"])
+@csrf.exempt
+def publisher_create_api_key():
+    """Create an API key for server-to-server calls; the key is shown only in this response."""
+    from services.api_keys import create_key
+
+    auth_result = _require_publisher_auth()
+    if isinstance(auth_result, tuple):
+        return auth_result
+    
+    publisher_id = session.get("publisher_id")
+    if not publisher_id:
+        return jsonify({"error": "Publisher ID required"}), 400
+    
+    data = ApiKeyCreateSchema().load(request.get_json(silent=True) or {})
+    key, raw_key = create_key(publisher_id, label=data.get("label"))
+    return jsonify({**_api_key_dict(key), "api_key": raw_key}), 201
+
+
+@bp.route("/publisher/api-keys/<int:key_id>", methods=["DELETE"])
+@csrf.exempt
+def publisher_revoke_api_key(key_id: int):
+    """Revoke an API key."""
+    from models import PublisherApiKey
+    from services.api_keys import revoke_key
+
+    auth_result = _require_publisher_auth()
+    if isinstance(auth_result, tuple):
+        return auth_result
+    
+    publisher_id = session.get("publisher_id")
+    key = PublisherApiKey.query.filter_by(id=key_id, publisher_id=publisher_id).first()
+    if not key:
+        return jsonify({"error": "API key not found"}), 404
+    
+    revoke_key(key)
+    return jsonify({"ok": True})
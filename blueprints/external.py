@@ -1,6 +1,7 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 
-from services.tokens import verify_jwt
+from services.signing_keys import get_keyring
+from services.tokens import verify_jwt, revocations_since
 
 
 bp = Blueprint("external", __name__)
@@ -15,3 +16,29 @@ def external_unlock():
     if not claims:
         return jsonify({"valid": False}), 200
     return jsonify({"valid": True, "article_id": claims.get("article_id"), "publisher_id": claims.get("publisher_id")})
+
+
+def _public(response, max_age: int):
+    response.headers["Cache-Control"] = f"public, max-age={max_age}"
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+@bp.route("/.well-known/jwks.json")
+def jwks():
+    """Public keys for verifying access tokens offline (empty while tokens are HS256)."""
+    ring = get_keyring()
+    return _public(jsonify(ring.jwks() if ring else {"keys": []}),
+                   int(current_app.config.get("JWKS_MAX_AGE", 3600)))
+
+
+@bp.route("/.well-known/paypr-revocations.json")
+def revocations():
+    """SHA-256 hex digests of recently revoked tokens after ?since=<cursor>."""
+    try:
+        since = max(int(request.args.get("since", 0)), 0)
+    except ValueError:
+        return jsonify({"error": "since must be an integer"}), 400
+    revoked, cursor = revocations_since(since)
+    return _public(jsonify({"revoked": revoked, "next_since": cursor}),
+                   int(current_app.config.get("REVOCATION_FEED_MAX_AGE", 30)))
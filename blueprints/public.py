@@ -1,9 +1,11 @@
-from flask import Blueprint, render_template, abort, session, request, redirect, url_for, flash, send_file
+from flask import Blueprint, render_template, abort, request, redirect, url_for, flash, send_file
+from flask_login import current_user
 from sqlalchemy.orm import joinedload
 from sqlalchemy import func
 
 from extensions import db, csrf
 from models import Publisher, Article, ContactMessage
+from services.entitlements import is_entitled
 from services.events import track_event
 
 
@@ -207,7 +209,6 @@ def article_view(pub_slug: str, article_slug: str):
     if not article:
         abort(404)
 
-    unlocked_set = set(session.get("unlocked_articles", []))
-    unlocked = str(article.id) in unlocked_set
+    unlocked = is_entitled(current_user, article.id)
     track_event("article_view", article_id=article.id, publisher_id=article.publisher_id)
     return render_template("article.html", article=article, unlocked=unlocked)
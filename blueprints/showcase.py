@@ -5,6 +5,8 @@ from sqlalchemy import func
 from extensions import db, csrf
 from models import ShowcaseSite, Article, Publisher, AuthorProfile, Transaction
 from services.events import track_event
+from services.listings import listing_query, with_publisher, article_summary
+from services.pagination import keyset_page, InvalidCursor
 
 
 bp = Blueprint("showcase", __name__, url_prefix="/showcase")
@@ -71,17 +73,17 @@ def get_showcase_content(site_slug: str):
     
     # Build query based on owner type
     if site.owner_type == "author":
-        query = Article.query.filter(
+        query = listing_query().filter(
             Article.author_id == site.owner_id,
             Article.status == "published"
         )
     elif site.owner_type == "publisher":
-        query = Article.query.filter(
+        query = listing_query().filter(
             Article.publisher_id == site.owner_id,
             Article.status == "published"
         )
     else:
-        query = Article.query.filter(Article.status == "published")
+        query = listing_query().filter(Article.status == "published")
     
     # Apply filters
     if category:
@@ -91,20 +93,21 @@ def get_showcase_content(site_slug: str):
         query = query.filter(Article.media_type == media_type)
     
     # Get articles
-    articles = query.order_by(Article.created_at.desc()).offset(offset).limit(limit).all()
+    try:
+        articles, next_cursor = keyset_page(
+            with_publisher(query), (Article.created_at, Article.id), limit,
+            cursor=request.args.get("cursor"), descending=True, offset=offset,
+        )
+    except InvalidCursor:
+        return jsonify({"error": "Invalid cursor"}), 400
     
     items = []
     for a in articles:
         items.append({
-            "id": a.id,
-            "slug": a.slug,
-            "title": a.title,
-            "dek": a.dek,
+            **article_summary(a),
             "author": a.author,
             "media_type": a.media_type,
             "price_cents": a.price_cents or 99,
-            "cover_url": a.cover_url,
-            "created_at": a.created_at.isoformat() if a.created_at else None,
             "publisher_name": a.publisher.name if a.publisher else None,
         })
     
@@ -119,7 +122,8 @@ def get_showcase_content(site_slug: str):
     return jsonify({
         "items": items,
         "categories": categories,
-        "total": len(items)
+        "total": len(items),
+        "next_cursor": next_cursor,
     })
 
 
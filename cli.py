@@ -0,0 +1,151 @@
+"""Maintenance commands, run with `flask --app app <group> <command>`."""
+from __future__ import annotations
+
+import click
+from flask.cli import AppGroup
+
+
+wallet_cli = AppGroup("wallet", help="Wallet ledger maintenance.")
+idempotency_cli = AppGroup("idempotency", help="Idempotency-key store maintenance.")
+splits_cli = AppGroup("splits", help="Revenue split tools.")
+settlement_cli = AppGroup("settlement", help="Payout settlement.")
+search_cli = AppGroup("search", help="Full-text search index.")
+entitlements_cli = AppGroup("entitlements", help="Article entitlements.")
+analytics_cli = AppGroup("analytics", help="Analytics database.")
+
+
+@wallet_cli.command("reconcile")
+@click.option("--batch-size", default=500, show_default=True, help="Users per commit.")
+def wallet_reconcile(batch_size: int):
+    """Verify every wallet against its ledger since the last checkpoint."""
+    from services.ledger import reconcile_wallets
+
+    report = reconcile_wallets(batch_size=batch_size)
+    click.echo(
+        f"users={report.users_checked} entries={report.entries_checked} "
+        f"checkpoints={report.checkpoints_written} openings={report.openings_written} "
+        f"mismatches={len(report.mismatches)}"
+    )
+    for m in report.mismatches:
+        click.echo(
+            f"MISMATCH user={m['user_id']} entry={m['ledger_entry_id']} "
+            f"expected={m['expected_cents']} recorded={m['recorded_cents']}"
+            + (" (wallet)" if m.get("wallet") else "")
+        )
+    if report.mismatches:
+        raise SystemExit(1)
+
+
+@idempotency_cli.command("purge")
+def idempotency_purge():
+    """Delete expired idempotency keys."""
+    from services.idempotency import purge_expired
+
+    click.echo(f"purged={purge_expired()}")
+
+
+@splits_cli.command("simulate")
+@click.option("--start", required=True, type=click.DateTime(), help="Range start (UTC, inclusive).")
+@click.option("--end", required=True, type=click.DateTime(), help="Range end (UTC, exclusive).")
+@click.option("--fee-bps", type=int, default=None, help="Candidate PLATFORM_FEE_BPS.")
+@click.option("--author-bps", multiple=True, metavar="PUBLISHER_ID=BPS",
+              help="Candidate default_author_split_bps for a publisher; repeatable.")
+@click.option("--overrides", type=click.File("r"), default=None,
+              help="JSON file of publisher overrides, same shape as the admin API.")
+def splits_simulate(start, end, fee_bps, author_bps, overrides):
+    """Compare historical revenue under current and candidate split rules."""
+    import json
+    from services.simulator import simulate
+
+    publishers = {int(k): v for k, v in (json.load(overrides) if overrides else {}).items()}
+    for item in author_bps:
+        pid, _, bps = item.partition("=")
+        publishers.setdefault(int(pid), {})["default_author_split_bps"] = int(bps)
+
+    result = simulate(start, end, fee_bps=fee_bps, publisher_overrides=publishers)
+    click.echo(json.dumps(result, indent=2))
+
+
+@settlement_cli.command("run")
+@click.option("--period-end", type=click.DateTime(), default=None,
+              help="Settle transactions created before this time (UTC). Defaults to now.")
+@click.option("--batch-size", default=1000, show_default=True, help="Rows per fetch and line insert.")
+def settlement_run(period_end, batch_size: int):
+    """Settle transactions since the last run into payout statements."""
+    from services.settlement import SettlementConflict, run_settlement
+
+    try:
+        result = run_settlement(period_end=period_end, batch_size=batch_size)
+    except SettlementConflict as exc:
+        click.echo(f"Skipped: {exc}", err=True)
+        raise SystemExit(1)
+    click.echo(
+        f"run={result.run_id} transactions={result.transactions_processed} "
+        f"statements={result.statements} lines={result.lines} high_water_mark={result.to_transaction_id}"
+    )
+
+
+@search_cli.command("reindex")
+@click.option("--batch-size", default=500, show_default=True, help="Rows per fetch.")
+def search_reindex(batch_size: int):
+    """Rebuild the search index from every publisher and article."""
+    from services.search import rebuild_index
+
+    click.echo(f"documents={rebuild_index(batch_size=batch_size)}")
+
+
+@entitlements_cli.command("backfill")
+@click.option("--batch-size", default=1000, show_default=True, help="Rows per fetch and insert.")
+def entitlements_backfill(batch_size: int):
+    """Grant entitlements for purchases made before they were stored server-side."""
+    from services.entitlements import backfill
+
+    click.echo(f"granted={backfill(batch_size=batch_size)}")
+
+
+@analytics_cli.command("import-events")
+@click.option("--batch-size", default=5000, show_default=True, help="Rows per fetch and commit.")
+def analytics_import_events(batch_size: int):
+    """Copy events recorded in the main database into the analytics database."""
+    from services.analytics import import_legacy_events
+
+    click.echo(f"copied={import_legacy_events(batch_size=batch_size)}")
+
+
+@analytics_cli.command("compact-events")
+@click.option("--batch-size", default=2000, show_default=True, help="Rows per commit.")
+def analytics_compact_events(batch_size: int):
+    """Rewrite events stored with JSON metadata into the compact format."""
+    from services.event_encoding import compact_events
+
+    click.echo(f"rewritten={compact_events(batch_size=batch_size)}")
+
+
+@analytics_cli.command("rollup")
+@click.option("--batch-size", default=5000, show_default=True, help="Events per commit.")
+def analytics_rollup(batch_size: int):
+    """Fold events past the watermark into daily counts."""
+    from services.analytics import rollup_events
+
+    click.echo(f"events={rollup_events(batch_size=batch_size)}")
+
+
+@analytics_cli.command("prune")
+@click.option("--days", type=int, default=None, help="Keep this many days of raw events (default EVENT_RETENTION_DAYS).")
+@click.option("--batch-size", default=5000, show_default=True, help="Rows per delete.")
+def analytics_prune(days, batch_size: int):
+    """Delete raw events past retention that are already rolled up."""
+    from services.analytics import prune_events, rollup_events
+
+    rollup_events()
+    click.echo(f"deleted={prune_events(days=days, batch_size=batch_size)}")
+
+
+def register_cli(app) -> None:
+    app.cli.add_command(wallet_cli)
+    app.cli.add_command(idempotency_cli)
+    app.cli.add_command(splits_cli)
+    app.cli.add_command(settlement_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(entitlements_cli)
+    app.cli.add_command(analytics_cli)
@@ -8,20 +8,80 @@ def str_to_bool(value: str, default: bool = True) -> bool:
     return str(value).lower() in ("1", "true", "yes", "on")
 
 
+def analytics_database_url(main_url: str) -> str:
+    """Default analytics DB: a sibling file for file-backed SQLite, else the same server (own pool)."""
+    if main_url.startswith("sqlite:///") and ":memory:" not in main_url:
+        root, ext = os.path.splitext(main_url[len("sqlite:///"):])
+        return f"sqlite:///{root}_analytics{ext or '.db'}"
+    # In-memory SQLite gives every engine its own database
+    return main_url
+
+
 class BaseConfig:
     SECRET_KEY = os.environ.get("SECRET_KEY", "dev-secret-change-me")
     JWT_SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "dev-jwt-secret-change-me")
+    # HS256, or EdDSA/RS256 so partners can verify access tokens offline against /.well-known/jwks.json
+    JWT_ALGORITHM = os.environ.get("JWT_ALGORITHM", "HS256")
+    # Comma-separated PEM private keys; the first signs, the rest are retired but still verify
+    JWT_SIGNING_KEY_FILES = os.environ.get("JWT_SIGNING_KEY_FILES", "")
 
     SQLALCHEMY_DATABASE_URI = os.environ.get(
         "DATABASE_URL",
         f"sqlite:///{os.path.join(os.path.dirname(__file__), 'paypr.db')}"
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Events and other analytics tables use their own engine, so their writes never hold the payments DB lock
+    SQLALCHEMY_BINDS = {
+        "analytics": os.environ.get("ANALYTICS_DATABASE_URL") or analytics_database_url(SQLALCHEMY_DATABASE_URI),
+    }
 
     STRIPE_API_KEY = os.environ.get("STRIPE_API_KEY")
     STRIPE_PUBLISHABLE_KEY = os.environ.get("STRIPE_PUBLISHABLE_KEY")
     PLATFORM_FEE_BPS = int(os.environ.get("PLATFORM_FEE_BPS", 1000))  # 10%
     DAILY_SPEND_CAP_CENTS = int(os.environ.get("DAILY_SPEND_CAP_CENTS", 1500))
+    # In-process front cache for the hourly spend buckets (per worker)
+    SPEND_WINDOW_CACHE = str_to_bool(os.environ.get("SPEND_WINDOW_CACHE", "false"), False)
+    # How long Idempotency-Key responses are replayed for retried requests
+    IDEMPOTENCY_TTL_SECONDS = int(os.environ.get("IDEMPOTENCY_TTL_SECONDS", 86400))
+    # Upper bound on how long another worker may price with stale publisher split terms
+    SPLIT_PLAN_TTL_SECONDS = int(os.environ.get("SPLIT_PLAN_TTL_SECONDS", 300))
+    # How often the in-memory typeahead index is rebuilt to refresh popularity
+    SUGGEST_REBUILD_SECONDS = int(os.environ.get("SUGGEST_REBUILD_SECONDS", 600))
+    # Anonymous catalog response cache; 0 disables. Also bounds cross-worker staleness.
+    RESPONSE_CACHE_SECONDS = int(os.environ.get("RESPONSE_CACHE_SECONDS", 60))
+    RESPONSE_CACHE_MAXSIZE = int(os.environ.get("RESPONSE_CACHE_MAXSIZE", 2048))
+    # Browser/CDN lifetime of the public article document (/api/articles/<id>/public)
+    ARTICLE_PUBLIC_MAX_AGE = int(os.environ.get("ARTICLE_PUBLIC_MAX_AGE", 60))
+    # Days a purchase keeps an article unlocked; 0 means forever
+    ENTITLEMENT_DAYS = int(os.environ.get("ENTITLEMENT_DAYS", 0))
+    # Upper bound on how long another worker/device may see a stale entitlement snapshot
+    ENTITLEMENT_CACHE_SECONDS = int(os.environ.get("ENTITLEMENT_CACHE_SECONDS", 300))
+    # Verified access-token claims kept per worker, and how often revocations from other workers are pulled
+    TOKEN_CACHE_MAXSIZE = int(os.environ.get("TOKEN_CACHE_MAXSIZE", 10000))
+    TOKEN_REVOCATION_REFRESH_SECONDS = int(os.environ.get("TOKEN_REVOCATION_REFRESH_SECONDS", 5))
+    # Revoked-token hashes kept per worker (each for REVOCATION_FEED_WINDOW_MINUTES); past it misses hit the DB
+    TOKEN_REVOKED_MAXSIZE = int(os.environ.get("TOKEN_REVOKED_MAXSIZE", 100000))
+    # Cache lifetimes of the published key set and the revocation delta feed
+    JWKS_MAX_AGE = int(os.environ.get("JWKS_MAX_AGE", 3600))
+    REVOCATION_FEED_MAX_AGE = int(os.environ.get("REVOCATION_FEED_MAX_AGE", 30))
+    # Revocations older than this only cover expired tokens and drop out of the feed
+    REVOCATION_FEED_WINDOW_MINUTES = int(os.environ.get("REVOCATION_FEED_WINDOW_MINUTES", 60))
+    # Buffered analytics writer: queue bound (events beyond it are dropped), batch size and max batch delay
+    EVENT_BUFFER = str_to_bool(os.environ.get("EVENT_BUFFER", "true"), True)
+    EVENT_QUEUE_MAXSIZE = int(os.environ.get("EVENT_QUEUE_MAXSIZE", 10000))
+    EVENT_BATCH_SIZE = int(os.environ.get("EVENT_BATCH_SIZE", 500))
+    EVENT_FLUSH_SECONDS = float(os.environ.get("EVENT_FLUSH_SECONDS", 1.0))
+    # Fold each written batch into event_daily_counts; raw events older than the retention are pruned
+    EVENT_ROLLUP_ON_WRITE = str_to_bool(os.environ.get("EVENT_ROLLUP_ON_WRITE", "true"), True)
+    EVENT_RETENTION_DAYS = int(os.environ.get("EVENT_RETENTION_DAYS", 90))
+    # Rollups skip events younger than this, so ids committed out of order are not passed over.
+    # Must exceed the sink's queue delay plus the longest event transaction; unset means 0 on SQLite, else 60
+    EVENT_ROLLUP_SETTLE_SECONDS = os.environ.get("EVENT_ROLLUP_SETTLE_SECONDS")
+    # Settlement runs stop before transactions younger than this, for the same reason (unset: 0 on SQLite, else 60)
+    SETTLEMENT_SETTLE_SECONDS = os.environ.get("SETTLEMENT_SETTLE_SECONDS")
+    # Per-event dedup window / sample rate (JSON, merged over services.event_policy.DEFAULT_POLICIES)
+    EVENT_POLICIES = os.environ.get("EVENT_POLICIES", "")
+    EVENT_DEDUP_MAXSIZE = int(os.environ.get("EVENT_DEDUP_MAXSIZE", 100000))
 
     WTF_CSRF_TIME_LIMIT = 3600
     REMEMBER_COOKIE_DURATION = timedelta(days=7)
@@ -19,6 +19,10 @@ class User(UserMixin, db.Model):
 
     transactions = db.relationship("Transaction", backref="user", lazy=True)
 
+    __table_args__ = (
+        Index("ix_users_created_id", "created_at", "id"),
+    )
+
     def get_id(self) -> str:
         return str(self.id)
 
@@ -53,9 +57,14 @@ class Publisher(db.Model):
     default_author_split_bps = db.Column(db.Integer, default=6000)  # 60% to author by default
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     articles = db.relationship("Article", backref="publisher", lazy=True)
 
+    __table_args__ = (
+        Index("ix_publishers_name_id", "name", "id"),
+    )
+
 
 class Article(db.Model):
     __tablename__ = "articles"
@@ -87,7 +96,10 @@ class Article(db.Model):
 
     __table_args__ = (
         UniqueConstraint("publisher_id", "slug", name="uq_article_pub_slug"),
-        Index("ix_articles_created", "created_at"),
+        # Keyset pagination orders by (created_at, id)
+        Index("ix_articles_created_id", "created_at", "id"),
+        Index("ix_articles_publisher_created_id", "publisher_id", "created_at", "id"),
+        Index("ix_articles_author_created_id", "author_id", "created_at", "id"),
         Index("ix_articles_author", "author_id"),
         Index("ix_articles_status", "status"),
     )
@@ -124,25 +136,75 @@ class Transaction(db.Model):
 
 
 class Event(db.Model):
+    """
+    Analytics event, stored in the "analytics" bind. The ids refer to rows in
+    the main database, so there are no foreign keys or relationships;
+    resolve them with services.analytics lookups.
+
+    Compact encoding (see services.event_encoding): the name is a small
+    integer code, the user agent an id into user_agents, the IP packed
+    bytes, and known metadata has typed columns; other keys go to
+    extra_json. event_name/metadata_json hold the old format and are only
+    set on rows `flask analytics compact-events` has not rewritten yet.
+    """
     __tablename__ = "events"
+    __bind_key__ = "analytics"
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id"))
-    event_name = db.Column(db.String(100), nullable=False, index=True)
-    article_id = db.Column(db.Integer, db.ForeignKey("articles.id"))
-    publisher_id = db.Column(db.Integer, db.ForeignKey("publishers.id"))
-    metadata_json = db.Column(db.Text)
+    name_id = db.Column(db.SmallInteger)
+    user_id = db.Column(db.Integer)
+    article_id = db.Column(db.Integer)
+    publisher_id = db.Column(db.Integer)
+    user_agent_id = db.Column(db.BigInteger)
+    ip = db.Column(db.LargeBinary(16))
+    price_cents = db.Column(db.Integer)
+    extra_json = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    event_name = db.Column(db.String(100))
+    metadata_json = db.Column(db.Text)
+
+    __table_args__ = (
+        Index("ix_events_name_created", "name_id", "created_at"),
+    )
+
+
+class UserAgent(db.Model):
+    """Dictionary of User-Agent strings; id is derived from the string's hash."""
+    __tablename__ = "user_agents"
+    __bind_key__ = "analytics"
+
+    id = db.Column(db.BigInteger, primary_key=True, autoincrement=False)
+    value = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
-    user = db.relationship("User", lazy=True)
-    article = db.relationship("Article", lazy=True)
-    publisher = db.relationship("Publisher", lazy=True)
+
+class EventDailyCount(db.Model):
+    """Events per day, name, publisher and article (0 = none), rolled up from events."""
+    __tablename__ = "event_daily_counts"
+    __bind_key__ = "analytics"
+
+    day = db.Column(db.Date, primary_key=True)
+    event_name = db.Column(db.String(100), primary_key=True)
+    publisher_id = db.Column(db.Integer, primary_key=True, default=0)
+    article_id = db.Column(db.Integer, primary_key=True, default=0)
+    count = db.Column(db.Integer, nullable=False, default=0)
 
     __table_args__ = (
-        Index("ix_events_event_name_created", "event_name", "created_at"),
+        Index("ix_event_daily_article", "article_id", "event_name", "day"),
+        Index("ix_event_daily_publisher", "publisher_id", "event_name", "day"),
     )
 
 
+class AnalyticsWatermark(db.Model):
+    """Highest events.id a job (e.g. the daily rollup) has consumed."""
+    __tablename__ = "analytics_watermarks"
+    __bind_key__ = "analytics"
+
+    name = db.Column(db.String(50), primary_key=True)
+    last_id = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 class RevokedToken(db.Model):
     __tablename__ = "revoked_tokens"
 
@@ -219,6 +281,20 @@ class PublisherUser(db.Model):
     publisher = db.relationship("Publisher", lazy=True)
 
 
+class PublisherApiKey(db.Model):
+    """Server-to-server credential for a publisher; only a hash of the secret is stored."""
+    __tablename__ = "publisher_api_keys"
+
+    id = db.Column(db.Integer, primary_key=True)
+    publisher_id = db.Column(db.Integer, db.ForeignKey("publishers.id"), nullable=False, index=True)
+    label = db.Column(db.String(100))
+    prefix = db.Column(db.String(16), nullable=False, unique=True, index=True)
+    key_hash = db.Column(db.String(64), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_used_at = db.Column(db.DateTime)
+    revoked_at = db.Column(db.DateTime)
+
+
 class SiteSettings(db.Model):
     __tablename__ = "site_settings"
 
@@ -371,3 +447,163 @@ class AuthorEarnings(db.Model):
     article = db.relationship("Article", lazy=True)
     transaction = db.relationship("Transaction", lazy=True)
     publisher = db.relationship("Publisher", lazy=True)
+
+    __table_args__ = (
+        Index("ix_author_earnings_author_txn", "author_id", "transaction_id"),
+    )
+
+
+class SpendBucket(db.Model):
+    """Hourly per-user debit totals backing the daily spend cap."""
+    __tablename__ = "spend_buckets"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    bucket_start = db.Column(db.DateTime, nullable=False)  # truncated to the hour (UTC)
+    spent_cents = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "bucket_start", name="uq_spend_bucket_user_hour"),
+    )
+
+
+class WalletLedgerEntry(db.Model):
+    """Append-only record of every wallet balance change, with running balance."""
+    __tablename__ = "wallet_ledger"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    kind = db.Column(db.String(30), nullable=False)  # opening, signup, debit, refund, topup, admin_credit, admin_debit
+    delta_cents = db.Column(db.Integer, nullable=False)
+    balance_after_cents = db.Column(db.Integer, nullable=False)
+    transaction_id = db.Column(db.Integer, db.ForeignKey("transactions.id"), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("ix_wallet_ledger_user_id", "user_id", "id"),
+        Index("ix_wallet_ledger_user_created", "user_id", "created_at"),
+    )
+
+
+class WalletCheckpoint(db.Model):
+    """Verified balance of a wallet as of a given ledger entry."""
+    __tablename__ = "wallet_checkpoints"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    ledger_entry_id = db.Column(db.Integer, db.ForeignKey("wallet_ledger.id"), nullable=False)
+    balance_cents = db.Column(db.Integer, nullable=False)
+    as_of = db.Column(db.DateTime, nullable=False)  # created_at of the covered ledger entry
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("ix_wallet_checkpoints_user_entry", "user_id", "ledger_entry_id"),
+        Index("ix_wallet_checkpoints_user_as_of", "user_id", "as_of"),
+    )
+
+
+class IdempotencyKey(db.Model):
+    """Stored outcome of a money-moving request, replayed on client retries."""
+    __tablename__ = "idempotency_keys"
+
+    id = db.Column(db.Integer, primary_key=True)
+    scope = db.Column(db.String(64), nullable=False)  # e.g. user:42, admin, stripe-checkout
+    key = db.Column(db.String(200), nullable=False)
+    endpoint = db.Column(db.String(100))
+    request_hash = db.Column(db.String(64))
+    status_code = db.Column(db.Integer)  # None while the original request is in flight
+    response_body = db.Column(db.Text)
+    content_type = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = db.Column(db.DateTime, index=True)  # None = never expires
+
+    __table_args__ = (
+        UniqueConstraint("scope", "key", name="uq_idempotency_scope_key"),
+    )
+
+
+class SettlementRun(db.Model):
+    """One settlement pass over transactions (from_transaction_id, to_transaction_id]."""
+    __tablename__ = "settlement_runs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    period_start = db.Column(db.DateTime)
+    period_end = db.Column(db.DateTime, nullable=False)
+    # Unique: two runs starting from the same mark would settle the same transactions twice
+    from_transaction_id = db.Column(db.Integer, nullable=False, default=0, unique=True, index=True)
+    to_transaction_id = db.Column(db.Integer, nullable=False, index=True)  # high-water mark
+    transactions_processed = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class PayoutStatement(db.Model):
+    """Per-payee totals for one settlement run."""
+    __tablename__ = "payout_statements"
+
+    id = db.Column(db.Integer, primary_key=True)
+    run_id = db.Column(db.Integer, db.ForeignKey("settlement_runs.id"), nullable=False, index=True)
+    payee_type = db.Column(db.String(50), nullable=False)  # author, publisher, platform, or a SplitRule role
+    payee_id = db.Column(db.Integer)  # author_profiles.id / publishers.id; None for platform
+    transaction_count = db.Column(db.Integer, nullable=False, default=0)
+    gross_cents = db.Column(db.Integer, nullable=False, default=0)  # sum of price_cents attributed
+    amount_cents = db.Column(db.Integer, nullable=False, default=0)  # payee share, net of refunds
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    run = db.relationship("SettlementRun", lazy=True)
+
+    __table_args__ = (
+        Index("ix_payout_statements_payee", "payee_type", "payee_id"),
+    )
+
+
+class PayoutLine(db.Model):
+    """A single transaction's contribution to a payout statement."""
+    __tablename__ = "payout_lines"
+
+    id = db.Column(db.Integer, primary_key=True)
+    statement_id = db.Column(db.Integer, db.ForeignKey("payout_statements.id"), nullable=False, index=True)
+    transaction_id = db.Column(db.Integer, db.ForeignKey("transactions.id"), nullable=False, index=True)
+    article_id = db.Column(db.Integer, db.ForeignKey("articles.id"))
+    amount_cents = db.Column(db.Integer, nullable=False)
+
+
+class SearchDocument(db.Model):
+    """Searchable text for one publisher or article, indexed by services.search."""
+    __tablename__ = "search_documents"
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # publisher | article
+    ref_id = db.Column(db.Integer, nullable=False)
+    title = db.Column(db.String(300), nullable=False)  # publisher name / article title
+    subtitle = db.Column(db.String(600))  # strapline / dek
+    author = db.Column(db.String(200))
+    body = db.Column(db.Text)  # article body as plain text
+
+    # Filter columns, denormalised so searches need no joins
+    category = db.Column(db.String(50))
+    media_type = db.Column(db.String(50))
+    price_cents = db.Column(db.Integer)
+    is_public = db.Column(db.Boolean, nullable=False, default=True)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("kind", "ref_id", name="uq_search_documents_kind_ref"),
+        Index("ix_search_documents_filters", "kind", "category", "price_cents"),
+    )
+
+
+class Entitlement(db.Model):
+    """A user's right to read an article, granted by a purchase."""
+    __tablename__ = "entitlements"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    article_id = db.Column(db.Integer, db.ForeignKey("articles.id"), nullable=False)
+    transaction_id = db.Column(db.Integer, db.ForeignKey("transactions.id"))
+    granted_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = db.Column(db.DateTime)  # None = never expires
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "article_id", name="uq_entitlements_user_article"),
+    )
@@ -0,0 +1,248 @@
+"""
+Analytics queries, rollups and the lookup layer between the two databases.
+
+Event and rollup rows live in the "analytics" bind and reference users,
+articles and publishers only by id. A database cannot join across binds,
+so reads aggregate on the analytics side first and then resolve the ids
+they need against the main database with one IN query per model.
+
+Raw events are folded into event_daily_counts by rollup_events(), which
+consumes events past a watermark (analytics_watermarks) and advances it in
+the same transaction as the counts, so each event is counted once even if
+several workers run it at the same time. It runs after every batch the event
+sink writes and from `flask analytics rollup`. A sampled event counts as
+1/sample_rate (see services.event_policy). Once events are rolled up and
+older than EVENT_RETENTION_DAYS, prune_events() deletes them. Counts read
+from rollups therefore lag raw events by at most one sink batch.
+
+Watermarking by id assumes ids become visible in order. SQLite has one
+writer, so they do. On a server database, concurrent transactions can commit
+a lower id after a higher one, so the rollup only advances over a prefix of
+events older than EVENT_ROLLUP_SETTLE_SECONDS (60 by default off SQLite). By
+then every transaction that took a lower id has committed.
+"""
+from __future__ import annotations
+
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from flask import current_app
+from sqlalchemy import func, update
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import AnalyticsWatermark, Article, Event, EventDailyCount, Publisher
+from services import event_encoding
+
+
+ROLLUP_WATERMARK = "event_daily_counts"
+
+
+def lookup_articles(ids: Iterable[int]) -> Dict[int, Dict]:
+    """id -> {title, slug, publisher_id} for the given article ids (missing ids are omitted)."""
+    ids = {i for i in ids if i is not None}
+    if not ids:
+        return {}
+    rows = db.session.query(Article.id, Article.title, Article.slug, Article.publisher_id).filter(Article.id.in_(ids))
+    return {r.id: {"title": r.title, "slug": r.slug, "publisher_id": r.publisher_id} for r in rows}
+
+
+def lookup_publishers(ids: Iterable[int]) -> Dict[int, Dict]:
+    """id -> {name, slug} for the given publisher ids (missing ids are omitted)."""
+    ids = {i for i in ids if i is not None}
+    if not ids:
+        return {}
+    rows = db.session.query(Publisher.id, Publisher.name, Publisher.slug).filter(Publisher.id.in_(ids))
+    return {r.id: {"name": r.name, "slug": r.slug} for r in rows}
+
+
+def top_articles(event_name: str = "article_view", days: int = 7, limit: int = 10) -> List[Dict]:
+    """Most frequent articles for an event over the last `days`, with titles from the main database."""
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    total = func.sum(EventDailyCount.count)
+    counts = (
+        db.session.query(EventDailyCount.article_id, total.label("n"))
+        .filter(EventDailyCount.event_name == event_name, EventDailyCount.day >= since,
+                EventDailyCount.article_id != 0)
+        .group_by(EventDailyCount.article_id)
+        .order_by(total.desc(), EventDailyCount.article_id)
+        .limit(limit)
+        .all()
+    )
+    articles = lookup_articles(a for a, _ in counts)
+    publishers = lookup_publishers(a["publisher_id"] for a in articles.values())
+    out = []
+    for article_id, n in counts:
+        article = articles.get(article_id, {})
+        out.append({
+            "article_id": article_id,
+            "count": int(n),
+            "title": article.get("title"),
+            "publisher": publishers.get(article.get("publisher_id"), {}).get("name"),
+        })
+    return out
+
+
+def _watermark(name: str = ROLLUP_WATERMARK) -> AnalyticsWatermark:
+    mark = db.session.get(AnalyticsWatermark, name)
+    if mark is None:
+        try:
+            mark = AnalyticsWatermark(name=name, last_id=0)
+            db.session.add(mark)
+            db.session.commit()
+        except IntegrityError:  # created concurrently
+            db.session.rollback()
+            mark = db.session.get(AnalyticsWatermark, name)
+    return mark
+
+
+def _add_counts(counts: Counter) -> None:
+    """Add to existing rollup rows, inserting missing ones (upsert where the dialect has it)."""
+    rows = [
+        {"day": day, "event_name": name, "publisher_id": pub, "article_id": art, "count": n}
+        for (day, name, pub, art), n in counts.items()
+    ]
+    dialect = db.engines["analytics"].dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(EventDailyCount)
+        db.session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["day", "event_name", "publisher_id", "article_id"],
+                set_={"count": EventDailyCount.count + stmt.excluded["count"]},
+            ),
+            rows,
+        )
+        return
+    for row in rows:
+        existing = db.session.get(
+            EventDailyCount, (row["day"], row["event_name"], row["publisher_id"], row["article_id"]))
+        if existing is None:
+            db.session.add(EventDailyCount(**row))
+        else:
+            existing.count += row["count"]
+
+
+def _settle_seconds() -> float:
+    configured = current_app.config.get("EVENT_ROLLUP_SETTLE_SECONDS")
+    if configured not in (None, ""):
+        return float(configured)
+    return 0.0 if db.engines["analytics"].dialect.name == "sqlite" else 60.0
+
+
+def rollup_events(batch_size: int = 5000, max_batches: Optional[int] = None) -> int:
+    """Fold settled events past the watermark into daily counts; returns events consumed."""
+    settle = _settle_seconds()
+    consumed = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        last_id = _watermark().last_id
+        cutoff = datetime.utcnow() - timedelta(seconds=settle)
+        rows = (
+            db.session.query(Event.id, Event.created_at, Event.name_id, Event.extra_json, Event.event_name,
+                             Event.publisher_id, Event.article_id)
+            .filter(Event.id > last_id)
+            .order_by(Event.id)
+            .limit(batch_size)
+            .all()
+        )
+        if settle:
+            # Stop at the first unsettled event: everything after it waits for the next run
+            settled = next((i for i, r in enumerate(rows) if r.created_at >= cutoff), len(rows))
+            rows = rows[:settled]
+        if not rows:
+            break
+        counts = Counter()
+        for r in rows:
+            key = (r.created_at.date(), event_encoding.event_name(r.name_id, r.extra_json, r.event_name),
+                   r.publisher_id or 0, r.article_id or 0)
+            counts[key] += event_encoding.weight(r.extra_json)
+        _add_counts(counts)
+        # Compare-and-set: if another worker moved the watermark, drop this batch and retry
+        moved = db.session.execute(
+            update(AnalyticsWatermark)
+            .where(AnalyticsWatermark.name == ROLLUP_WATERMARK, AnalyticsWatermark.last_id == last_id)
+            .values(last_id=rows[-1].id, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        if moved.rowcount != 1:
+            db.session.rollback()
+            continue
+        db.session.commit()
+        consumed += len(rows)
+        batches += 1
+    return consumed
+
+
+def daily_series(event_name: str = "article_view", days: int = 30, publisher_id: Optional[int] = None,
+                 article_id: Optional[int] = None) -> List[Dict]:
+    """[{day, count}] for each of the last `days` days (oldest first, zero-filled)."""
+    start = datetime.utcnow().date() - timedelta(days=days - 1)
+    q = db.session.query(EventDailyCount.day, func.sum(EventDailyCount.count)).filter(
+        EventDailyCount.event_name == event_name, EventDailyCount.day >= start
+    )
+    if publisher_id is not None:
+        q = q.filter(EventDailyCount.publisher_id == publisher_id)
+    if article_id is not None:
+        q = q.filter(EventDailyCount.article_id == article_id)
+    counts = dict(q.group_by(EventDailyCount.day).all())
+    return [
+        {"day": (start + timedelta(days=i)).isoformat(), "count": int(counts.get(start + timedelta(days=i), 0))}
+        for i in range(days)
+    ]
+
+
+def prune_events(days: Optional[int] = None, batch_size: int = 5000) -> int:
+    """Delete raw events older than `days` (EVENT_RETENTION_DAYS) that are already rolled up."""
+    days = days if days is not None else int(current_app.config.get("EVENT_RETENTION_DAYS", 90))
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    rolled_up_to = _watermark().last_id
+    deleted = 0
+    while True:
+        ids = [
+            i for (i,) in db.session.query(Event.id)
+            .filter(Event.id <= rolled_up_to, Event.created_at < cutoff)
+            .order_by(Event.id)
+            .limit(batch_size)
+        ]
+        if not ids:
+            return deleted
+        Event.query.filter(Event.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        deleted += len(ids)
+
+
+def import_legacy_events(batch_size: int = 5000) -> int:
+    """
+    Copy events written to the main database before the analytics bind
+    existed. Rows get new ids (so they land past the rollup watermark) and the
+    last legacy id copied is kept as a watermark, so the job is resumable.
+    Returns rows copied. The old table is left for the operator to drop.
+    """
+    from sqlalchemy import MetaData, inspect, insert, select
+
+    main = db.engines[None]
+    if main.url == db.engines["analytics"].url or not inspect(main).has_table("events"):
+        return 0
+    legacy = Event.__table__.to_metadata(MetaData())
+    # The old table predates the compact columns; copy what it has and let compact_events() convert it
+    present = {c["name"] for c in inspect(main).get_columns("events")}
+    columns = [legacy.c[c.name] for c in Event.__table__.columns if c.name in present]
+    copied = 0
+    with main.connect() as conn:
+        while True:
+            mark = _watermark("legacy_events_import")
+            rows = conn.execute(
+                select(*columns).where(legacy.c.id > mark.last_id).order_by(legacy.c.id).limit(batch_size)
+            ).mappings().all()
+            if not rows:
+                break
+            db.session.execute(insert(Event), [{k: v for k, v in r.items() if k != "id"} for r in rows])
+            mark.last_id = rows[-1]["id"]
+            db.session.commit()
+            copied += len(rows)
+    return copied
@@ -0,0 +1,66 @@
+"""
+Publisher API keys for server-to-server calls.
+
+A key looks like `pk_<prefix>_<secret>`. The prefix is stored in clear and
+indexed for lookup; the full key only as a SHA-256 digest, compared in
+constant time. The plaintext is returned once, at creation. last_used_at
+is only as fresh as LAST_USED_RESOLUTION, so steady traffic does not add a
+write to every verification call.
+"""
+from __future__ import annotations
+
+import hashlib
+import hmac
+import secrets
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from extensions import db
+from models import PublisherApiKey
+
+
+LAST_USED_RESOLUTION = timedelta(minutes=1)
+
+
+def _digest(raw_key: str) -> str:
+    return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+
+def create_key(publisher_id: int, label: Optional[str] = None, commit: bool = True) -> Tuple[PublisherApiKey, str]:
+    """Returns (row, plaintext key)."""
+    prefix = secrets.token_hex(6)
+    raw_key = f"pk_{prefix}_{secrets.token_urlsafe(32)}"
+    row = PublisherApiKey(publisher_id=publisher_id, label=label, prefix=prefix, key_hash=_digest(raw_key))
+    db.session.add(row)
+    if commit:
+        db.session.commit()
+    return row, raw_key
+
+
+def authenticate(raw_key: Optional[str]) -> Optional[PublisherApiKey]:
+    """The active key matching raw_key, or None."""
+    parts = (raw_key or "").split("_", 2)
+    if len(parts) != 3 or parts[0] != "pk":
+        return None
+    row = PublisherApiKey.query.filter_by(prefix=parts[1]).first()
+    if row is None or row.revoked_at is not None:
+        return None
+    if not hmac.compare_digest(row.key_hash, _digest(raw_key)):
+        return None
+    return row
+
+
+def touch(row: PublisherApiKey, at: Optional[datetime] = None) -> bool:
+    """Record use of the key if last_used_at is older than LAST_USED_RESOLUTION; True if written."""
+    at = at or datetime.utcnow()
+    if row.last_used_at is not None and at - row.last_used_at < LAST_USED_RESOLUTION:
+        return False
+    row.last_used_at = at
+    db.session.commit()
+    return True
+
+
+def revoke_key(row: PublisherApiKey, commit: bool = True) -> None:
+    row.revoked_at = row.revoked_at or datetime.utcnow()
+    if commit:
+        db.session.commit()
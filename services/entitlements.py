@@ -0,0 +1,214 @@
+"""
+Server-side article entitlements.
+
+Purchases grant a (user_id, article_id) row in the same database transaction
+as the debit; refunds delete it. Reads go through a per-user in-process
+snapshot: the user's entitled article ids as a sorted array('q') with a
+parallel array of expiry timestamps, so a check is a bisect over a few
+machine words and touches no database and no cookie.
+
+Snapshots are per process. After a grant or revoke, the session stores only
+the time of the change (a fixed-size value, not a list), and any snapshot
+loaded before it is reloaded. Other devices see changes once their snapshot
+ages out (ENTITLEMENT_CACHE_SECONDS).
+"""
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from flask import current_app, has_request_context, session
+from sqlalchemy import or_
+
+from extensions import db
+from models import Entitlement, Transaction
+from services.lru import LRUCache
+
+
+SESSION_KEY = "entitlements_changed_at"
+_LEGACY_SESSION_KEY = "unlocked_articles"
+
+
+class EntitlementSet:
+    """Immutable, compact view of one user's entitlements."""
+
+    __slots__ = ("article_ids", "expires", "loaded_at")
+
+    def __init__(self, rows: Iterable[Tuple[int, Optional[datetime]]], loaded_at: float):
+        rows = sorted(rows)
+        self.article_ids = array("q", (r[0] for r in rows))
+        # Expiry as epoch seconds; 0 means never
+        self.expires = array("d", (r[1].timestamp() if r[1] else 0.0 for r in rows))
+        self.loaded_at = loaded_at
+
+    def __contains__(self, article_id: int) -> bool:
+        i = bisect_left(self.article_ids, article_id)
+        if i == len(self.article_ids) or self.article_ids[i] != article_id:
+            return False
+        expires = self.expires[i]
+        return not expires or expires > datetime.utcnow().timestamp()
+
+    def __len__(self) -> int:
+        return len(self.article_ids)
+
+
+_cache = LRUCache(maxsize=50000)
+
+
+def clear() -> None:
+    _cache.clear()
+
+
+def _ttl() -> float:
+    return float(current_app.config.get("ENTITLEMENT_CACHE_SECONDS", 300))
+
+
+def _load(user_id: int) -> EntitlementSet:
+    now = datetime.utcnow()
+    rows = (
+        db.session.query(Entitlement.article_id, Entitlement.expires_at)
+        .filter(
+            Entitlement.user_id == user_id,
+            or_(Entitlement.expires_at.is_(None), Entitlement.expires_at > now),
+        )
+        .all()
+    )
+    snapshot = EntitlementSet(rows, now.timestamp())
+    _cache.set(user_id, snapshot, ttl=_ttl())
+    return snapshot
+
+
+def entitlements_for(user_id: int) -> EntitlementSet:
+    """The user's snapshot, reloaded if this browser session changed it since."""
+    snapshot = _cache.get(user_id)
+    changed_at = session.get(SESSION_KEY, 0) if has_request_context() else 0
+    if snapshot is None or snapshot.loaded_at < changed_at:
+        snapshot = _load(user_id)
+    return snapshot
+
+
+def is_entitled(user, article_id: int) -> bool:
+    """Whether user (a User, or an anonymous current_user) may read article_id."""
+    if not getattr(user, "is_authenticated", False):
+        return False
+    if has_request_context() and _LEGACY_SESSION_KEY in session:
+        _migrate_legacy_unlocks(user.id, session.pop(_LEGACY_SESSION_KEY))
+    return int(article_id) in entitlements_for(user.id)
+
+
+def _migrate_legacy_unlocks(user_id: int, unlocked) -> None:
+    """
+    Grant the old cookie list's unlocks that the user's own purchases back
+    (a debit not followed by a refund), so buyers keep access whether or not
+    `flask entitlements backfill` has run yet.
+    """
+    article_ids = set()
+    for value in unlocked or ():
+        try:
+            article_ids.add(int(value))
+        except (TypeError, ValueError):
+            continue
+    if not article_ids:
+        return
+    rows = (
+        db.session.query(Transaction.id, Transaction.article_id, Transaction.type)
+        .filter(
+            Transaction.user_id == user_id,
+            Transaction.article_id.in_(article_ids),
+            Transaction.type.in_(("debit", "refund")),
+        )
+        .order_by(Transaction.id.asc())
+    )
+    latest = {}
+    for txn_id, aid, kind in rows:
+        latest[aid] = (txn_id, kind)
+    have = {aid for (aid,) in db.session.query(Entitlement.article_id).filter(
+        Entitlement.user_id == user_id, Entitlement.article_id.in_(article_ids))}
+    grants = [(aid, txn_id) for aid, (txn_id, kind) in latest.items() if kind == "debit" and aid not in have]
+    if grants:
+        grant(user_id, grants)
+        db.session.commit()
+        changed(user_id)
+
+
+def _expiry(at: datetime) -> Optional[datetime]:
+    days = int(current_app.config.get("ENTITLEMENT_DAYS", 0))
+    return at + timedelta(days=days) if days > 0 else None
+
+
+def grant(user_id: int, grants: Sequence[Tuple[int, int]], at: Optional[datetime] = None) -> None:
+    """
+    Stage entitlements for (article_id, transaction_id) pairs in the caller's
+    transaction; an existing (possibly expired) row is renewed.
+    """
+    at = at or datetime.utcnow()
+    article_ids = [aid for aid, _ in grants]
+    existing = {
+        e.article_id: e
+        for e in Entitlement.query.filter(
+            Entitlement.user_id == user_id, Entitlement.article_id.in_(article_ids)
+        )
+    }
+    for article_id, transaction_id in grants:
+        row = existing.get(article_id)
+        if row is None:
+            row = Entitlement(user_id=user_id, article_id=article_id)
+            db.session.add(row)
+        row.transaction_id = transaction_id
+        row.granted_at = at
+        row.expires_at = _expiry(at)
+
+
+def revoke(user_id: int, article_id: int) -> None:
+    """Stage removal of an entitlement (e.g. on refund)."""
+    Entitlement.query.filter_by(user_id=user_id, article_id=article_id).delete(synchronize_session=False)
+
+
+def changed(user_id: int) -> None:
+    """Call after committing a grant or revoke for user_id."""
+    _cache.pop(user_id)
+    if has_request_context():
+        session[SESSION_KEY] = datetime.utcnow().timestamp()
+
+
+def backfill(batch_size: int = 1000) -> int:
+    """Grant entitlements for purchases that predate the table; returns rows added."""
+    # A purchase stands unless a refund for the same article came after it
+    last_refund = {
+        (uid, aid): rid
+        for uid, aid, rid in db.session.query(
+            Transaction.user_id, Transaction.article_id, db.func.max(Transaction.id)
+        ).filter(Transaction.type == "refund").group_by(Transaction.user_id, Transaction.article_id)
+    }
+    have = set(db.session.query(Entitlement.user_id, Entitlement.article_id))
+    pending: List[dict] = []
+    added = 0
+    debits = (
+        db.session.query(Transaction.id, Transaction.user_id, Transaction.article_id, Transaction.created_at)
+        .filter(Transaction.type == "debit")
+        .order_by(Transaction.id.desc())
+        .yield_per(batch_size)
+    )
+    for txn_id, user_id, article_id, created_at in debits:
+        key = (user_id, article_id)
+        if key in have:
+            continue
+        have.add(key)  # debits arrive newest first, so later rows for key are older
+        if last_refund.get(key, 0) > txn_id:
+            continue
+        pending.append({
+            "user_id": user_id, "article_id": article_id, "transaction_id": txn_id,
+            "granted_at": created_at, "expires_at": _expiry(created_at),
+        })
+        if len(pending) >= batch_size:
+            db.session.bulk_insert_mappings(Entitlement, pending)
+            added += len(pending)
+            pending = []
+    if pending:
+        db.session.bulk_insert_mappings(Entitlement, pending)
+        added += len(pending)
+    db.session.commit()
+    _cache.clear()
+    return added
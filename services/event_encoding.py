@@ -0,0 +1,239 @@
+"""
+Compact storage format for analytics events.
+
+- Event names are small integer codes (EVENT_CODES). An unregistered name is
+  stored as OTHER with the name kept in extra_json, so adding an event never
+  needs a schema change; register it here to make it compact.
+- User-Agent strings go into the user_agents dictionary once. The id is the
+  first 8 bytes of the string's SHA-1, so writers can use it without a
+  round trip, and the dictionary insert is an idempotent
+  insert-if-missing that can share the caller's transaction.
+- IPs are stored packed (4 or 16 bytes).
+- Known metadata keys have typed columns (price_cents); anything else is
+  JSON in extra_json, which stays NULL when there is nothing extra.
+
+compact_events() rewrites rows still in the old format
+(event_name/metadata_json) in batches.
+"""
+from __future__ import annotations
+
+import hashlib
+import ipaddress
+import json
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import inspect, insert, text
+
+from extensions import db
+from models import Event, UserAgent
+from services.lru import LRUCache
+
+
+EVENT_CODES = {
+    "newsstand_view": 1,
+    "publisher_view": 2,
+    "article_view": 3,
+    "pay": 4,
+}
+EVENT_NAMES = {code: name for name, code in EVENT_CODES.items()}
+OTHER = 0
+
+_COLUMN_KEYS = ("ip", "user_agent", "price_cents")
+
+# User agents already known to be in the dictionary (per process)
+_stored_user_agents = LRUCache(maxsize=10000)
+
+
+def clear() -> None:
+    _stored_user_agents.clear()
+
+
+def user_agent_id(value: Optional[str]) -> Optional[int]:
+    if not value:
+        return None
+    return int.from_bytes(hashlib.sha1(value.encode("utf-8")).digest()[:8], "big", signed=True)
+
+
+def pack_ip(value: Optional[str]) -> Optional[bytes]:
+    try:
+        return ipaddress.ip_address(value).packed if value else None
+    except ValueError:
+        return None
+
+
+def unpack_ip(value: Optional[bytes]) -> Optional[str]:
+    return str(ipaddress.ip_address(bytes(value))) if value else None
+
+
+def encode(row: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[Tuple[int, str]]]:
+    """
+    Turn {event_name, metadata, user_id, article_id, publisher_id, created_at}
+    into events column values, plus the (id, string) user-agent entry it needs.
+    """
+    meta = dict(row.get("metadata") or {})
+    name = row["event_name"]
+    code = EVENT_CODES.get(name, OTHER)
+    extra = {k: v for k, v in meta.items() if k not in _COLUMN_KEYS}
+    if code == OTHER:
+        extra["event"] = name
+    price = meta.get("price_cents")
+    if price is not None and not isinstance(price, int):
+        extra["price_cents"] = price  # keep odd values rather than coerce them
+        price = None
+    ua = meta.get("user_agent")
+    ua_id = user_agent_id(ua)
+    values = {
+        "name_id": code,
+        "user_id": row.get("user_id"),
+        "article_id": row.get("article_id"),
+        "publisher_id": row.get("publisher_id"),
+        "user_agent_id": ua_id,
+        "ip": pack_ip(meta.get("ip")),
+        "price_cents": price,
+        "extra_json": json.dumps(extra, separators=(",", ":")) if extra else None,
+    }
+    if row.get("created_at") is not None:
+        values["created_at"] = row["created_at"]
+    return values, ((ua_id, ua) if ua_id is not None else None)
+
+
+def event_name(name_id: Optional[int], extra_json: Optional[str] = None, legacy_name: Optional[str] = None) -> str:
+    """The event's name from whichever format the row is in."""
+    if name_id is None:
+        return legacy_name
+    if name_id == OTHER:
+        return json.loads(extra_json or "{}").get("event", "")
+    return EVENT_NAMES.get(name_id, "")
+
+
+def weight(extra_json: Optional[str]) -> int:
+    """How many events a stored row stands for (more than one when it was sampled)."""
+    if not extra_json or "sample_rate" not in extra_json:
+        return 1
+    rate = json.loads(extra_json).get("sample_rate") or 1
+    return max(1, round(1 / float(rate)))
+
+
+def _store_user_agents(entries: Iterable[Tuple[int, str]]) -> List[int]:
+    """Insert dictionary entries not known to exist; returns the ids written."""
+    pending = {ua_id: value for ua_id, value in entries if _stored_user_agents.get(ua_id) is None}
+    if not pending:
+        return []
+    dialect = db.engines["analytics"].dialect.name
+    rows = [{"id": k, "value": v} for k, v in pending.items()]
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        db.session.execute(dialect_insert(UserAgent).on_conflict_do_nothing(index_elements=["id"]), rows)
+    else:
+        existing = {i for (i,) in db.session.query(UserAgent.id).filter(UserAgent.id.in_(pending))}
+        missing = [r for r in rows if r["id"] not in existing]
+        if missing:
+            db.session.execute(insert(UserAgent), missing)
+    return list(pending)
+
+
+def write_events(rows: List[Dict[str, Any]]) -> List[int]:
+    """
+    Stage encoded events (and their user agents) in the current session.
+    Returns the user-agent ids written; pass them to mark_stored() after commit.
+    """
+    encoded = [encode(r) for r in rows]
+    ua_ids = _store_user_agents(ua for _, ua in encoded if ua)
+    db.session.execute(insert(Event), [values for values, _ in encoded])
+    return ua_ids
+
+
+def mark_stored(ua_ids: Iterable[int]) -> None:
+    for ua_id in ua_ids:
+        _stored_user_agents.set(ua_id, True)
+
+
+def ensure_compact_schema() -> None:
+    """Bring an events table created in the old format up to the compact columns."""
+    engine = db.engines["analytics"]
+    insp = inspect(engine)
+    if not insp.has_table("events"):
+        return
+    cols = {c["name"]: c for c in insp.get_columns("events")}
+    if "name_id" in cols:
+        return
+    old_indexes = [ix["name"] for ix in insp.get_indexes("events")]
+    with engine.begin() as conn:
+        if engine.dialect.name == "sqlite":
+            # SQLite cannot relax NOT NULL in place: rebuild, keeping ids so the rollup watermark holds
+            for name in old_indexes:
+                conn.execute(text(f'DROP INDEX IF EXISTS "{name}"'))
+            conn.execute(text("ALTER TABLE events RENAME TO events_old"))
+            Event.__table__.create(conn)
+            conn.execute(text(
+                "INSERT INTO events (id, user_id, event_name, article_id, publisher_id, metadata_json, created_at) "
+                "SELECT id, user_id, event_name, article_id, publisher_id, metadata_json, created_at FROM events_old"
+            ))
+            conn.execute(text("DROP TABLE events_old"))
+            return
+        if engine.dialect.name != "postgresql":
+            raise RuntimeError(f"Migrate the events table by hand on {engine.dialect.name}")
+        for name, type_ in (("name_id", "SMALLINT"), ("user_agent_id", "BIGINT"), ("ip", "BYTEA"),
+                            ("price_cents", "INTEGER"), ("extra_json", "TEXT")):
+            conn.execute(text(f"ALTER TABLE events ADD COLUMN {name} {type_}"))
+        conn.execute(text("ALTER TABLE events ALTER COLUMN event_name DROP NOT NULL"))
+        for name in old_indexes:
+            if name != "ix_events_created_at":
+                conn.execute(text(f"DROP INDEX {name}"))
+        conn.execute(text("CREATE INDEX ix_events_name_created ON events (name_id, created_at)"))
+
+
+def compact_events(batch_size: int = 2000) -> int:
+    """Rewrite old-format rows in place, a batch per commit; returns rows rewritten."""
+    ensure_compact_schema()
+    rewritten = 0
+    while True:
+        rows = Event.query.filter(Event.name_id.is_(None)).order_by(Event.id).limit(batch_size).all()
+        if not rows:
+            return rewritten
+        user_agents = []
+        for evt in rows:
+            try:
+                meta = json.loads(evt.metadata_json or "{}")
+            except ValueError:
+                meta = {"raw_metadata": evt.metadata_json}
+            values, ua = encode({
+                "event_name": evt.event_name or "",
+                "metadata": meta if isinstance(meta, dict) else {"raw_metadata": meta},
+            })
+            for column in ("name_id", "user_agent_id", "ip", "price_cents", "extra_json"):
+                setattr(evt, column, values[column])
+            evt.event_name = None
+            evt.metadata_json = None
+            if ua:
+                user_agents.append(ua)
+        ua_ids = _store_user_agents(user_agents)
+        db.session.commit()
+        mark_stored(ua_ids)
+        rewritten += len(rows)
+
+
+def decode(evt: Event) -> Dict[str, Any]:
+    """A row in either format as {name, user_id, article_id, publisher_id, metadata, created_at}."""
+    if evt.name_id is None:
+        metadata = json.loads(evt.metadata_json or "{}")
+    else:
+        metadata = {k: v for k, v in json.loads(evt.extra_json or "{}").items() if k != "event"}
+        if evt.ip is not None:
+            metadata["ip"] = unpack_ip(evt.ip)
+        if evt.user_agent_id is not None:
+            ua = db.session.get(UserAgent, evt.user_agent_id)
+            metadata["user_agent"] = ua.value if ua else None
+        if evt.price_cents is not None:
+            metadata["price_cents"] = evt.price_cents
+    return {
+        "name": event_name(evt.name_id, evt.extra_json, evt.event_name),
+        "user_id": evt.user_id,
+        "article_id": evt.article_id,
+        "publisher_id": evt.publisher_id,
+        "metadata": metadata,
+        "created_at": evt.created_at,
+    }
@@ -0,0 +1,107 @@
+"""
+Per-event-name recording policy, applied by track_event() before a row is
+written.
+
+- dedup_seconds: record an event once per (visitor, event, article,
+  publisher) within the window. The visitor is the logged-in user, else a
+  hash of IP and User-Agent, so anonymous views need no cookie. The window
+  is held in a per-worker TTL cache, so with several workers a visitor can be
+  counted once per worker; unique-view counts are bounded by that, not by
+  reloads.
+- sample: keep this fraction of the events that pass dedup. It must be 1/n
+  (1, 0.5, 0.25, 0.1, ...) so the rollup's whole-number count of n per kept
+  row (sample_rate is stored on it) is unbiased.
+- Names in ALWAYS_KEEP (money events) ignore the policy entirely.
+
+EVENT_POLICIES (JSON) is merged over DEFAULT_POLICIES, e.g.
+{"article_view": {"dedup_seconds": 600, "sample": 0.5}}.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import random
+from typing import Dict, Optional
+
+from flask import current_app
+
+from services.lru import LRUCache
+
+
+ALWAYS_KEEP = frozenset({"pay"})
+
+DEFAULT_POLICIES: Dict[str, Dict] = {
+    "article_view": {"dedup_seconds": 1800},
+    "publisher_view": {"dedup_seconds": 300},
+    "newsstand_view": {"dedup_seconds": 60},
+}
+
+
+def visitor_key(user_id: Optional[int], ip: Optional[str], user_agent: Optional[str]) -> str:
+    if user_id is not None:
+        return f"u{user_id}"
+    digest = hashlib.sha1(f"{ip or ''}|{user_agent or ''}".encode("utf-8")).hexdigest()[:16]
+    return f"a{digest}"
+
+
+class EventPolicy:
+    def __init__(self, policies: Dict[str, Dict], maxsize: int = 100000):
+        self.policies = policies
+        self._seen = LRUCache(maxsize=maxsize)
+        self.kept = 0
+        self.deduped = 0
+        self.sampled_out = 0
+
+    def admit(self, name: str, visitor: str, article_id: Optional[int] = None,
+              publisher_id: Optional[int] = None) -> Optional[float]:
+        """The sample rate to record the event with, or None to skip it."""
+        policy = None if name in ALWAYS_KEEP else self.policies.get(name)
+        if not policy:
+            self.kept += 1
+            return 1.0
+        window = float(policy.get("dedup_seconds") or 0)
+        if window > 0:
+            key = (visitor, name, article_id, publisher_id)
+            if self._seen.get(key) is not None:
+                self.deduped += 1
+                return None
+            self._seen.set(key, True, ttl=window)
+        rate = float(policy.get("sample", 1.0))
+        if rate < 1.0 and random.random() >= rate:
+            self.sampled_out += 1
+            return None
+        self.kept += 1
+        return rate
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "kept": self.kept,
+            "deduped": self.deduped,
+            "sampled_out": self.sampled_out,
+            "dedup_keys": len(self._seen),
+        }
+
+
+def load_policies(raw) -> Dict[str, Dict]:
+    """DEFAULT_POLICIES with EVENT_POLICIES (a dict or JSON string) merged over it per name."""
+    overrides = json.loads(raw) if isinstance(raw, str) and raw.strip() else (raw or {})
+    if not isinstance(overrides, dict):
+        raise ValueError("EVENT_POLICIES must be a JSON object of event name -> policy")
+    policies = {name: dict(policy) for name, policy in DEFAULT_POLICIES.items()}
+    for name, policy in overrides.items():
+        rate = float((policy or {}).get("sample", 1.0))
+        if not 0 < rate <= 1 or abs(1 / rate - round(1 / rate)) > 1e-9:
+            raise ValueError(f"EVENT_POLICIES[{name!r}].sample must be 1/n, e.g. 1, 0.5, 0.25 or 0.1")
+        policies[name] = {**policies.get(name, {}), **(policy or {})}
+    return policies
+
+
+def get_policy(app=None) -> EventPolicy:
+    app = app or current_app._get_current_object()
+    policy = app.extensions.get("event_policy")
+    if policy is None:
+        policy = app.extensions["event_policy"] = EventPolicy(
+            load_policies(app.config.get("EVENT_POLICIES")),
+            int(app.config.get("EVENT_DEDUP_MAXSIZE", 100000)),
+        )
+    return policy
@@ -0,0 +1,192 @@
+"""
+Buffered, asynchronous writer for analytics events.
+
+track_event() hands rows to an EventSink instead of committing inside the
+request. The sink is a bounded in-process queue drained by one background
+thread, which bulk-inserts a batch whenever EVENT_BATCH_SIZE rows are
+waiting or EVENT_FLUSH_SECONDS have passed since the batch began. So page
+views cost a queue put rather than a write transaction, and analytics no
+longer contend with payments for the SQLite writer lock. After each batch
+the daily rollups are advanced (EVENT_ROLLUP_ON_WRITE; see services.analytics).
+
+When the queue is full, new events are dropped and counted rather than
+blocking the request (see stats()). Whatever is queued is flushed at
+interpreter exit. A crash loses at most the queued rows. Events about a
+money write (pay) are queued only after that write commits, so a payment
+never waits on, or spans, the analytics database.
+
+The thread is started lazily in the process that first enqueues, so a
+sink created before a pre-forking server forks still works in each worker.
+"""
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
+
+from flask import current_app
+
+from extensions import db
+from services.event_encoding import mark_stored, write_events
+
+
+log = logging.getLogger(__name__)
+
+
+class EventSink:
+    def __init__(self, app, maxsize: int = 10000, batch_size: int = 500, flush_seconds: float = 1.0,
+                 rollup: bool = False):
+        self.app = app
+        self.rollup = rollup
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._queue: "queue.Queue[Dict]" = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._stopping = threading.Event()
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    def put(self, row: Dict) -> bool:
+        """Queue one event (see event_encoding.encode for the keys); False if it was dropped."""
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    def _ensure_worker(self) -> None:
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._stopping.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="event-sink", daemon=True)
+            self._thread.start()
+
+    def _next_batch(self) -> List[Dict]:
+        """Block for the first row, then collect until the batch is full or flush_seconds pass."""
+        try:
+            batch = [self._queue.get(timeout=self.flush_seconds)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_seconds
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch: List[Dict]) -> None:
+        try:
+            with self.app.app_context():
+                stored = write_events(batch)
+                db.session.commit()
+            mark_stored(stored)
+            self.written += len(batch)
+            self.batches += 1
+            if self.rollup:
+                self._rollup()
+        except Exception:
+            self.failed += len(batch)
+            log.exception("Dropping %d analytics events after a failed insert", len(batch))
+            try:
+                with self.app.app_context():
+                    db.session.rollback()
+            except Exception:
+                pass
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def _rollup(self) -> None:
+        from services.analytics import rollup_events
+
+        try:
+            with self.app.app_context():
+                rollup_events()
+        except Exception:
+            # The watermark did not move; the next batch or the CLI job picks these events up
+            log.exception("Event rollup failed")
+
+    def flush(self) -> None:
+        """Block until every event queued so far has been written (or failed)."""
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self._queue.join()
+            return
+        # No worker in this process: drain inline
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            self._write(batch)
+
+    def close(self) -> None:
+        self.flush()
+        self._stopping.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout=self.flush_seconds + 1)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self._queue.qsize(),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "batches": self.batches,
+        }
+
+
+def _in_memory_sqlite(uri: str) -> bool:
+    return uri in ("sqlite://", "sqlite:///:memory:") or ":memory:" in uri
+
+
+def init_event_sink(app) -> Optional[EventSink]:
+    """Create the app's sink, unless buffering is disabled or unsafe for this database."""
+    uri = (app.config.get("SQLALCHEMY_BINDS") or {}).get("analytics") or app.config.get("SQLALCHEMY_DATABASE_URI", "")
+    # An in-memory SQLite database is one shared connection; a second thread must not write to it
+    if not app.config.get("EVENT_BUFFER", True) or _in_memory_sqlite(uri):
+        return None
+    sink = app.extensions["event_sink"] = EventSink(
+        app,
+        maxsize=int(app.config.get("EVENT_QUEUE_MAXSIZE", 10000)),
+        batch_size=int(app.config.get("EVENT_BATCH_SIZE", 500)),
+        flush_seconds=float(app.config.get("EVENT_FLUSH_SECONDS", 1.0)),
+        rollup=bool(app.config.get("EVENT_ROLLUP_ON_WRITE", True)),
+    )
+    atexit.register(sink.close)
+    return sink
+
+
+def get_sink(app=None) -> Optional[EventSink]:
+    app = app or current_app._get_current_object()
+    return app.extensions.get("event_sink")
@@ -1,29 +1,64 @@
 from __future__ import annotations
 
-import json
+import logging
+from datetime import datetime
 from typing import Optional, Dict, Any
 
 from flask_login import current_user
-from flask import request
+from flask import has_request_context, request
 from extensions import db
-from models import Event
+from services.event_encoding import mark_stored, write_events
+from services.event_policy import get_policy, visitor_key
+from services.event_sink import get_sink
 
 
-def track_event(name: str, *, article_id: Optional[int] = None, publisher_id: Optional[int] = None, metadata: Optional[Dict[str, Any]] = None) -> None:
+log = logging.getLogger(__name__)
+
+
+def track_event(name: str, *, article_id: Optional[int] = None, publisher_id: Optional[int] = None, metadata: Optional[Dict[str, Any]] = None, commit: bool = True) -> None:
+    """
+    Record an analytics event. With commit=False the row joins the caller's
+    transaction; otherwise it goes to the buffered event sink when one is
+    running, and is committed immediately when not. Repeats and sampled-out
+    events are skipped per the event's policy (services.event_policy).
+
+    Failures with commit=False propagate so the caller can roll back its
+    transaction; a self-committed event is logged and dropped instead. Events
+    live in the analytics database, so never stage one inside a transaction
+    on the main database (record it after that commits).
+    """
     try:
         meta = dict(metadata or {})
+        in_request = has_request_context()  # also called from CLI jobs
         if 'ip' not in meta:
-            meta['ip'] = request.remote_addr
+            meta['ip'] = request.remote_addr if in_request else None
         if 'user_agent' not in meta:
-            meta['user_agent'] = request.headers.get('User-Agent')
-        evt = Event(
-            user_id=(current_user.id if getattr(current_user, 'is_authenticated', False) else None),
+            meta['user_agent'] = request.headers.get('User-Agent') if in_request else None
+        user_id = current_user.id if getattr(current_user, 'is_authenticated', False) else None
+        rate = get_policy().admit(name, visitor_key(user_id, meta['ip'], meta['user_agent']),
+                                  article_id, publisher_id)
+        if rate is None:
+            return
+        if rate < 1.0:
+            meta['sample_rate'] = rate
+        row = dict(
+            user_id=user_id,
             event_name=name,
             article_id=article_id,
             publisher_id=publisher_id,
-            metadata_json=json.dumps(meta),
+            metadata=meta,
+            created_at=datetime.utcnow(),
         )
-        db.session.add(evt)
-        db.session.commit()
+        sink = get_sink() if commit else None
+        if sink is not None:
+            sink.put(row)
+            return
+        stored = write_events([row])
+        if commit:
+            db.session.commit()
+            mark_stored(stored)
     except Exception:
+        if not commit:
+            raise
+        log.exception("Dropping analytics event %r", name)
         db.session.rollback()
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from datetime import datetime, timedelta
+from functools import wraps
+from typing import Optional
+
+from flask import Response, current_app, jsonify, make_response, request, session
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import IdempotencyKey
+
+
+HEADER = "Idempotency-Key"
+
+
+def _scope() -> str:
+    if getattr(current_user, "is_authenticated", False):
+        return f"user:{current_user.id}"
+    if session.get("is_admin"):
+        return "admin"
+    return f"ip:{request.remote_addr}"
+
+
+def _request_hash() -> str:
+    h = hashlib.sha256()
+    h.update(request.method.encode())
+    h.update(request.path.encode())
+    h.update(request.get_data() or b"")
+    return h.hexdigest()
+
+
+def lookup(scope: str, key: str) -> Optional[IdempotencyKey]:
+    """Fetch a live key by its unique (scope, key) index; expired keys are dropped."""
+    row = IdempotencyKey.query.filter_by(scope=scope, key=key).first()
+    if row is not None and row.expires_at is not None and row.expires_at <= datetime.utcnow():
+        db.session.delete(row)
+        db.session.commit()
+        return None
+    return row
+
+
+def _replay(row: IdempotencyKey) -> Response:
+    resp = Response(row.response_body or "", status=row.status_code, content_type=row.content_type)
+    resp.headers["Idempotent-Replayed"] = "true"
+    return resp
+
+
+def idempotent(ttl_seconds: Optional[int] = None):
+    """
+    Make a view safe to retry with an Idempotency-Key header.
+
+    The key row is flushed before the view runs, so it commits in the same
+    transaction as the view's writes and a concurrent duplicate fails on the
+    unique index instead of writing twice. Completed responses (anything
+    below 500) are stored and returned verbatim to retries; requests without
+    the header run as before. A view that fails after committing has already
+    made its writes, so its key is kept with a 500 that retries replay
+    rather than running the view again.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = (request.headers.get(HEADER) or "").strip()
+            if not key:
+                return view(*args, **kwargs)
+            if len(key) > 200:
+                return jsonify({"error": f"{HEADER} too long"}), 400
+
+            scope = _scope()
+            req_hash = _request_hash()
+            existing = lookup(scope, key)
+            if existing is not None:
+                if existing.request_hash != req_hash:
+                    return jsonify({"error": f"{HEADER} reused with a different request"}), 422
+                if existing.status_code is None:
+                    return jsonify({"error": "Request with this key is in progress"}), 409
+                return _replay(existing)
+
+            ttl = ttl_seconds or int(current_app.config.get("IDEMPOTENCY_TTL_SECONDS", 86400))
+            record = IdempotencyKey(
+                scope=scope,
+                key=key,
+                endpoint=request.endpoint,
+                request_hash=req_hash,
+                expires_at=datetime.utcnow() + timedelta(seconds=ttl),
+            )
+            db.session.add(record)
+            try:
+                db.session.flush()
+            except IntegrityError:
+                db.session.rollback()
+                existing = lookup(scope, key)
+                if existing is not None and existing.status_code is not None and existing.request_hash == req_hash:
+                    return _replay(existing)
+                return jsonify({"error": "Request with this key is in progress"}), 409
+
+            commits = []
+
+            def _committed(session):
+                commits.append(session)
+
+            event.listen(db.session, "after_commit", _committed)
+            try:
+                resp = make_response(view(*args, **kwargs))
+            except Exception:
+                db.session.rollback()
+                _fail(scope, key, committed=bool(commits))
+                raise
+            finally:
+                event.remove(db.session, "after_commit", _committed)
+
+            if resp.status_code >= 500:
+                db.session.rollback()
+                _fail(scope, key, committed=bool(commits))
+                return resp
+
+            # The view may have rolled back (e.g. insufficient balance), detaching the row
+            record = db.session.merge(record)
+            record.status_code = resp.status_code
+            record.response_body = resp.get_data(as_text=True)
+            record.content_type = resp.content_type
+            db.session.commit()
+            return resp
+        return wrapper
+    return decorator
+
+
+def _fail(scope: str, key: str, committed: bool) -> None:
+    """
+    Settle an in-flight key after the view failed: drop it if the view's
+    writes rolled back (a retry may run again), else record the failure so
+    a retry replays it instead of repeating committed writes.
+    """
+    try:
+        pending = IdempotencyKey.query.filter_by(scope=scope, key=key, status_code=None)
+        if committed:
+            pending.update({
+                "status_code": 500,
+                "response_body": json.dumps({"error": "Request failed after it was applied; do not retry"}),
+                "content_type": "application/json",
+            }, synchronize_session=False)
+        else:
+            pending.delete(synchronize_session=False)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+
+
+def purge_expired(now: Optional[datetime] = None) -> int:
+    """Delete expired keys (indexed on expires_at); returns rows removed."""
+    now = now or datetime.utcnow()
+    removed = IdempotencyKey.query.filter(
+        IdempotencyKey.expires_at.isnot(None), IdempotencyKey.expires_at <= now
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return removed
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import update
+
+from extensions import db
+from models import User, WalletCheckpoint, WalletLedgerEntry
+
+
+def _last_entry(user_id: int) -> Optional[WalletLedgerEntry]:
+    return (
+        WalletLedgerEntry.query.filter_by(user_id=user_id)
+        .order_by(WalletLedgerEntry.id.desc())
+        .first()
+    )
+
+
+def append_entry(user_id: int, delta_cents: int, kind: str, transaction_id: Optional[int] = None,
+                 at: Optional[datetime] = None) -> WalletLedgerEntry:
+    """
+    Stage a ledger entry in the current transaction.
+
+    Call after the wallet row has been updated, so the caller holds the row's
+    write lock and entries for one user cannot interleave. A wallet with no
+    ledger history yet gets an "opening" entry for its prior balance first.
+    """
+    return append_entries(user_id, [(delta_cents, kind, transaction_id)], at=at)[0]
+
+
+def append_entries(user_id: int, items: List[Tuple[int, str, Optional[int]]],
+                   at: Optional[datetime] = None) -> List[WalletLedgerEntry]:
+    """
+    Stage (delta_cents, kind, transaction_id) entries for one wallet update
+    that applied all of their deltas at once, e.g. a batch purchase.
+    """
+    at = at or datetime.utcnow()
+    prev = _last_entry(user_id)
+    if prev is None:
+        # The wallet already includes every delta in the batch
+        wallet = db.session.query(User.wallet_cents).filter(User.id == user_id).scalar() or 0
+        opening_balance = wallet - sum(delta for delta, _, _ in items)
+        balance = opening_balance
+        if opening_balance:
+            db.session.add(WalletLedgerEntry(
+                user_id=user_id, kind="opening", delta_cents=opening_balance,
+                balance_after_cents=opening_balance, created_at=at,
+            ))
+    else:
+        balance = prev.balance_after_cents
+    entries = []
+    for delta_cents, kind, transaction_id in items:
+        balance += delta_cents
+        entries.append(WalletLedgerEntry(
+            user_id=user_id,
+            kind=kind,
+            delta_cents=delta_cents,
+            balance_after_cents=balance,
+            transaction_id=transaction_id,
+            created_at=at,
+        ))
+    db.session.add_all(entries)
+    return entries
+
+
+def adjust_wallet(user_id: int, delta_cents: int, kind: str, transaction_id: Optional[int] = None) -> WalletLedgerEntry:
+    """Atomically change a wallet balance and stage its ledger entry; the caller commits."""
+    db.session.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(wallet_cents=db.func.coalesce(User.wallet_cents, 0) + delta_cents)
+        .execution_options(synchronize_session=False)
+    )
+    return append_entry(user_id, delta_cents, kind, transaction_id=transaction_id)
+
+
+def balance_as_of(user_id: int, at: datetime) -> int:
+    """Balance recorded by the last ledger entry at or before `at` (one indexed lookup)."""
+    value = (
+        db.session.query(WalletLedgerEntry.balance_after_cents)
+        .filter(WalletLedgerEntry.user_id == user_id, WalletLedgerEntry.created_at <= at)
+        .order_by(WalletLedgerEntry.created_at.desc(), WalletLedgerEntry.id.desc())
+        .limit(1)
+        .scalar()
+    )
+    return value or 0
+
+
+def rebuild_balance(user_id: int, at: Optional[datetime] = None) -> int:
+    """
+    Recompute a balance from deltas rather than stored running balances.
+
+    Starts at the latest checkpoint at or before `at` and sums only the
+    entries after it, so cost is O(entries since last checkpoint).
+    """
+    at = at or datetime.utcnow()
+    cp = (
+        WalletCheckpoint.query.filter(WalletCheckpoint.user_id == user_id, WalletCheckpoint.as_of <= at)
+        .order_by(WalletCheckpoint.ledger_entry_id.desc())
+        .first()
+    )
+    start_id = cp.ledger_entry_id if cp else 0
+    base = cp.balance_cents if cp else 0
+    tail = (
+        db.session.query(db.func.coalesce(db.func.sum(WalletLedgerEntry.delta_cents), 0))
+        .filter(
+            WalletLedgerEntry.user_id == user_id,
+            WalletLedgerEntry.id > start_id,
+            WalletLedgerEntry.created_at <= at,
+        )
+        .scalar()
+    )
+    return base + (tail or 0)
+
+
+@dataclass
+class ReconcileReport:
+    users_checked: int = 0
+    entries_checked: int = 0
+    checkpoints_written: int = 0
+    openings_written: int = 0
+    mismatches: List[dict] = field(default_factory=list)
+
+
+def reconcile_user(user: User, report: ReconcileReport) -> None:
+    """Verify one wallet's ledger since its last checkpoint and checkpoint it if clean."""
+    cp = (
+        WalletCheckpoint.query.filter_by(user_id=user.id)
+        .order_by(WalletCheckpoint.ledger_entry_id.desc())
+        .first()
+    )
+    start_id = cp.ledger_entry_id if cp else 0
+    balance = cp.balance_cents if cp else 0
+    entries = (
+        WalletLedgerEntry.query.filter(WalletLedgerEntry.user_id == user.id, WalletLedgerEntry.id > start_id)
+        .order_by(WalletLedgerEntry.id.asc())
+        .all()
+    )
+    wallet = user.wallet_cents or 0
+    report.users_checked += 1
+
+    if cp is None and not entries:
+        # Legacy wallet that predates the ledger: adopt its balance
+        if wallet:
+            db.session.add(WalletLedgerEntry(
+                user_id=user.id, kind="opening", delta_cents=wallet, balance_after_cents=wallet,
+            ))
+            report.openings_written += 1
+        return
+
+    for e in entries:
+        report.entries_checked += 1
+        balance += e.delta_cents
+        if e.balance_after_cents != balance:
+            report.mismatches.append({
+                "user_id": user.id, "ledger_entry_id": e.id,
+                "expected_cents": balance, "recorded_cents": e.balance_after_cents,
+            })
+            return
+
+    if balance != wallet:
+        report.mismatches.append({
+            "user_id": user.id, "ledger_entry_id": entries[-1].id if entries else start_id,
+            "expected_cents": balance, "recorded_cents": wallet, "wallet": True,
+        })
+        return
+
+    if entries:
+        last = entries[-1]
+        db.session.add(WalletCheckpoint(
+            user_id=user.id, ledger_entry_id=last.id, balance_cents=balance, as_of=last.created_at,
+        ))
+        report.checkpoints_written += 1
+
+
+def reconcile_wallets(batch_size: int = 500) -> ReconcileReport:
+    """Check every wallet incrementally from its last checkpoint, committing per batch."""
+    report = ReconcileReport()
+    last_id = 0
+    while True:
+        users = User.query.filter(User.id > last_id).order_by(User.id.asc()).limit(batch_size).all()
+        if not users:
+            break
+        for user in users:
+            reconcile_user(user, report)
+        last_id = users[-1].id
+        db.session.commit()
+    return report
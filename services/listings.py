@@ -0,0 +1,81 @@
+"""
+Article listing projections.
+
+Catalog and dashboard list endpoints never return article bodies, so they
+load Article rows through listing_query(), which fetches only the listing
+columns and raises if body_html, body_preview or custom_splits are touched.
+article_summary() builds the fields every listing shares; endpoints add
+their own keys on top.
+
+Related rows a listing shows (publisher, author profile, a transaction's
+article) are joined into the same SELECT with the with_*() helpers, so a
+page costs the same number of queries whatever its size.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict
+
+from sqlalchemy.orm import joinedload, load_only
+
+from models import Article, AuthorProfile, Publisher, Transaction
+
+
+LISTING_COLUMNS = (
+    Article.id,
+    Article.publisher_id,
+    Article.author_id,
+    Article.slug,
+    Article.title,
+    Article.dek,
+    Article.author,
+    Article.media_type,
+    Article.price_cents,
+    Article.cover_url,
+    Article.license_type,
+    Article.status,
+    Article.created_at,
+    Article.updated_at,
+)
+
+
+def listing_query(query=None):
+    """Restrict an Article query to listing columns; other columns raise on access."""
+    query = Article.query if query is None else query
+    return query.options(load_only(*LISTING_COLUMNS, raiseload=True))
+
+
+def with_publisher(query):
+    """Eager-load the publisher fields listings show."""
+    return query.options(
+        joinedload(Article.publisher).load_only(
+            Publisher.id, Publisher.slug, Publisher.name, Publisher.default_price_cents
+        )
+    )
+
+
+def with_author_profile(query):
+    """Eager-load the author profile's display name."""
+    return query.options(
+        joinedload(Article.author_profile).load_only(AuthorProfile.id, AuthorProfile.display_name)
+    )
+
+
+def transaction_listing_query(query=None):
+    """Transactions with the article title and publisher name joined in."""
+    query = Transaction.query if query is None else query
+    return query.options(
+        joinedload(Transaction.article).load_only(Article.id, Article.title, raiseload=True),
+        joinedload(Transaction.publisher).load_only(Publisher.id, Publisher.name),
+    )
+
+
+def article_summary(a: Article) -> Dict[str, Any]:
+    return {
+        "id": a.id,
+        "slug": a.slug,
+        "title": a.title,
+        "dek": a.dek,
+        "price_cents": a.price_cents,
+        "cover_url": a.cover_url,
+        "created_at": a.created_at.isoformat() if a.created_at else None,
+    }
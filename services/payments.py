@@ -1,8 +1,17 @@
-from typing import Tuple, Dict, Optional
+from typing import NamedTuple, Tuple, Dict, List, Optional
 from flask import current_app
 import json
 
 
+class Purchase(NamedTuple):
+    """Plain record of a committed purchase (safe to read after commit expiry)."""
+    transaction_id: int
+    article_id: int
+    publisher_id: Optional[int]
+    price_cents: int
+    split: Dict[str, int]
+
+
 def calculate_fees_cents(price_cents: int) -> Tuple[int, int]:
     bps = int(current_app.config.get("PLATFORM_FEE_BPS", 1000))
     fee = (price_cents * bps + 9999) // 10000  # round up
@@ -14,20 +23,20 @@ def calculate_fees_cents(price_cents: int) -> Tuple[int, int]:
 
 def apply_split_rules(net_cents: int, rules: Dict[str, int]) -> Dict[str, int]:
     """
-    rules: mapping role->bps (basis points). Ensures sum to <= 10000; any remainder stays as 'publisher'.
-    Returns cents per role.
+    rules: mapping role->bps (basis points). Shares are rounded down (rules over
+    10000 bps in total are scaled to fit) and the remainder stays as 'publisher',
+    so the result always sums to net_cents. Returns cents per role.
     """
     total_bps = sum(int(b) for b in rules.values()) if rules else 0
-    total_bps = min(total_bps, 10000)
+    divisor = max(total_bps, 10000)
     allocated: Dict[str, int] = {}
     allocated_sum = 0
     for role, bps in (rules or {}).items():
-        amt = (net_cents * int(bps) + 9999) // 10000
-        allocated[role] = amt
+        amt = (net_cents * int(bps)) // divisor
+        allocated[role] = allocated.get(role, 0) + amt
         allocated_sum += amt
-    remainder = max(net_cents - allocated_sum, 0)
     allocated.setdefault("publisher", 0)
-    allocated["publisher"] += remainder
+    allocated["publisher"] += net_cents - allocated_sum
     return allocated
 
 
@@ -35,93 +44,33 @@ def get_article_splits(article) -> Dict[str, int]:
     """
     Get revenue split configuration for an article.
     Returns dict of role->basis_points (bps).
-    
+
     Priority:
     1. Article custom_splits (per-article override)
     2. Default splits based on license type
     3. Platform default (90% publisher, 10% platform)
     """
-    # Check for custom splits on article
-    if article.custom_splits:
-        try:
-            return json.loads(article.custom_splits)
-        except (json.JSONDecodeError, TypeError):
-            pass
-    
-    # Default splits based on license type
-    if article.license_type == "independent":
-        # Independent author: 90% author, 10% platform
-        return {"author": 9000, "platform": 1000}
-    
-    elif article.license_type == "revenue_share":
-        # Revenue share: default 60% author, 30% publisher, 10% platform
-        # Can be overridden by publisher
-        if article.publisher_id:
-            from models import Publisher
-            pub = Publisher.query.get(article.publisher_id)
-            if pub and pub.default_author_split_bps:
-                author_bps = pub.default_author_split_bps
-                platform_bps = 1000  # Always 10% platform
-                publisher_bps = 10000 - author_bps - platform_bps
-                return {
-                    "author": author_bps,
-                    "publisher": publisher_bps,
-                    "platform": platform_bps
-                }
-        return {"author": 6000, "publisher": 3000, "platform": 1000}
-    
-    elif article.license_type == "buyout":
-        # Buyout: 90% publisher, 10% platform (author already paid)
-        return {"publisher": 9000, "platform": 1000}
-    
-    else:
-        # Default: 90% publisher, 10% platform
-        return {"publisher": 9000, "platform": 1000}
+    from services.splits import resolve_plan
+    return resolve_plan(article).as_dict()
 
 
 def calculate_article_split(price_cents: int, article) -> Dict[str, int]:
     """
     Calculate revenue distribution for article purchase.
     Returns dict of role->cents.
+
+    Uses the article's cached SplitPlan, so the hot path does no JSON parsing
+    and no database reads once the plan is compiled.
     """
-    # Get platform fee first
-    fee_cents, net_cents = calculate_fees_cents(price_cents)
-    
-    # Get split configuration
-    splits_bps = get_article_splits(article)
-    
-    # Calculate amounts
-    result = {
-        "platform": fee_cents
-    }
-    
-    # Distribute net amount according to splits
-    remaining = net_cents
-    for role, bps in splits_bps.items():
-        if role == "platform":
-            # Already calculated
-            continue
-        
-        amount = (net_cents * bps) // 10000
-        result[role] = amount
-        remaining -= amount
-    
-    # Add any remainder to publisher or author
-    if remaining > 0:
-        if "publisher" in result:
-            result["publisher"] += remaining
-        elif "author" in result:
-            result["author"] += remaining
-        else:
-            result["platform"] += remaining
-    
-    return result
+    from services.splits import resolve_plan
+    return resolve_plan(article).apply(price_cents)
 
 
-def record_author_earnings(article, transaction, split_amounts: Dict[str, int]):
+def record_author_earnings(article, transaction, split_amounts: Dict[str, int], commit: bool = True):
     """
     Record author earnings from a transaction.
     Creates AuthorEarnings record if article has an author.
+    Pass commit=False to stage the row in the caller's database transaction.
     """
     if not article.author_id:
         return
@@ -146,4 +95,99 @@ def record_author_earnings(article, transaction, split_amounts: Dict[str, int]):
     )
     
     db.session.add(earning)
-    db.session.commit()
+    if commit:
+        db.session.commit()
+
+
+def purchase_article(user_id: int, article, price_cents: int, ip_address: Optional[str] = None,
+                     user_agent: Optional[str] = None):
+    """
+    Charge a user for an article in a single database transaction.
+
+    Returns a Purchase, or None if the balance is insufficient.
+    See purchase_articles for the transactional guarantees.
+    """
+    result = purchase_articles(user_id, [(article, price_cents)], ip_address=ip_address, user_agent=user_agent)
+    return result[0] if result else None
+
+
+def purchase_articles(user_id: int, items: List[Tuple[object, int]], ip_address: Optional[str] = None,
+                      user_agent: Optional[str] = None):
+    """
+    Charge a user for one or more (article, price_cents) pairs at once.
+
+    The wallet debit is a single conditional UPDATE (balance >= total), so
+    concurrent purchases cannot overdraw the wallet or lose each other's
+    writes, and a short balance charges nothing. Every Transaction,
+    AuthorEarnings row and wallet ledger entry, the spend-window bucket and the
+    entitlements are staged in the same transaction and committed once; on any
+    failure everything is rolled back. The pay events live in the analytics
+    database, so they are recorded only after that commit and never hold up
+    or fail a payment.
+
+    Returns a list of Purchase records in input order, or None if the
+    balance is insufficient.
+    """
+    from datetime import datetime
+    from sqlalchemy import update
+    from extensions import db
+    from models import User, Transaction
+    from services.entitlements import grant
+    from services.events import track_event
+    from services.spend import record_spend, spend_committed
+    from services.ledger import append_entries
+
+    total_cents = sum(price for _, price in items)
+    now = datetime.utcnow()
+
+    try:
+        debited = db.session.execute(
+            update(User)
+            .where(User.id == user_id, User.wallet_cents >= total_cents)
+            .values(wallet_cents=User.wallet_cents - total_cents)
+            .execution_options(synchronize_session=False)
+        )
+        if debited.rowcount != 1:
+            db.session.rollback()
+            return None
+
+        staged = []
+        for article, price_cents in items:
+            split_amounts = calculate_article_split(price_cents, article)
+            # Legacy fee/net calculation for backward compatibility
+            fee, net = calculate_fees_cents(price_cents)
+            txn = Transaction(
+                user_id=user_id,
+                article_id=article.id,
+                publisher_id=article.publisher_id,
+                price_cents=price_cents,
+                fee_cents=fee,
+                net_cents=net,
+                type="debit",
+                ip_address=ip_address,
+                user_agent=user_agent,
+                split_breakdown_json=json.dumps(split_amounts),
+                created_at=now,
+            )
+            db.session.add(txn)
+            staged.append((article, txn, split_amounts))
+        db.session.flush()  # assigns txn ids for the earnings and ledger rows
+        append_entries(user_id, [(-txn.price_cents, "debit", txn.id) for _, txn, _ in staged], at=now)
+
+        bucket_start = record_spend(user_id, total_cents, at=now)
+        purchases = []
+        for article, txn, split_amounts in staged:
+            record_author_earnings(article, txn, split_amounts, commit=False)
+            purchases.append(Purchase(txn.id, article.id, article.publisher_id, txn.price_cents, split_amounts))
+        grant(user_id, [(article.id, txn.id) for article, txn, _ in staged], at=now)
+
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    spend_committed(user_id, bucket_start, total_cents)
+    for p in purchases:
+        track_event("pay", article_id=p.article_id, publisher_id=p.publisher_id,
+                    metadata={"price_cents": p.price_cents})
+    return purchases
@@ -0,0 +1,96 @@
+"""
+Response cache for anonymous catalog endpoints.
+
+@cached_response stores a view's 200 response body and validators (ETag,
+Last-Modified) keyed by endpoint, view arguments, normalised query args and
+the catalog version; hits still answer conditional requests with 304.
+Writes that change publishers or articles call catalog_changed(), which
+bumps the version so every cached catalog response is bypassed and ages out
+of the LRU.
+
+The cache is per process: a bump in one worker does not reach the others,
+so RESPONSE_CACHE_SECONDS bounds how stale another worker's copy can be.
+Setting it to 0 disables caching.
+"""
+from __future__ import annotations
+
+import threading
+from functools import wraps
+from typing import Callable, Optional
+
+from flask import current_app, request
+
+from services.lru import LRUCache
+
+
+_KEPT_HEADERS = ("ETag", "Last-Modified", "Cache-Control", "Vary")
+
+
+class ResponseCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.entries = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.version = 0
+        self._lock = threading.Lock()
+
+    def bump(self) -> None:
+        with self._lock:
+            self.version += 1
+
+    def stats(self) -> dict:
+        return {**self.entries.stats(), "version": self.version}
+
+
+def get_cache(app=None) -> Optional[ResponseCache]:
+    app = app or current_app._get_current_object()
+    ttl = float(app.config.get("RESPONSE_CACHE_SECONDS", 60))
+    if ttl <= 0:
+        return None
+    cache = app.extensions.get("response_cache")
+    if cache is None:
+        cache = app.extensions["response_cache"] = ResponseCache(
+            int(app.config.get("RESPONSE_CACHE_MAXSIZE", 2048)), ttl
+        )
+    return cache
+
+
+def catalog_changed() -> None:
+    """Invalidate every cached catalog response in this process."""
+    cache = get_cache()
+    if cache is not None:
+        cache.bump()
+
+
+def _normalized_args() -> tuple:
+    """Query args sorted by name, values stripped, empty values dropped."""
+    return tuple(sorted(
+        (name, tuple(v.strip() for v in values if v.strip()))
+        for name, values in request.args.lists()
+        if any(v.strip() for v in values)
+    ))
+
+
+def cached_response(when: Optional[Callable[[], bool]] = None):
+    """Cache a GET view's successful responses; `when` limits caching to some requests."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = get_cache()
+            if cache is None or request.method != "GET" or (when is not None and not when()):
+                return view(*args, **kwargs)
+
+            key = (request.endpoint, tuple(sorted(kwargs.items())), _normalized_args(), cache.version)
+            hit = cache.entries.get(key)
+            if hit is not None:
+                body, mimetype, headers = hit
+                response = current_app.response_class(body, status=200, mimetype=mimetype, headers=headers)
+                response.headers["X-Cache"] = "HIT"
+                return response.make_conditional(request)
+
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.direct_passthrough:
+                headers = [(h, response.headers[h]) for h in _KEPT_HEADERS if h in response.headers]
+                cache.entries.set(key, (response.get_data(), response.mimetype, headers))
+            response.headers["X-Cache"] = "MISS"
+            return response
+        return wrapper
+    return decorator
@@ -1,15 +1,48 @@
-from marshmallow import Schema, fields, validates, ValidationError
+from marshmallow import Schema, fields, validates, validates_schema, validate, ValidationError
 
 
 class PayRequestSchema(Schema):
     article_id = fields.Int(required=True)
 
 
+class BatchPayRequestSchema(Schema):
+    article_ids = fields.List(fields.Int(), required=True)
+
+    @validates("article_ids")
+    def validate_article_ids(self, value, **kwargs):
+        if not value:
+            raise ValidationError("At least one article_id is required")
+        if len(value) > 50:
+            raise ValidationError("At most 50 articles per batch")
+        if len(set(value)) != len(value):
+            raise ValidationError("Duplicate article_id")
+
+
 class VerifyRequestSchema(Schema):
     access_token = fields.Str(required=True)
     article_id = fields.Int(required=True)
 
 
+class VerifyItemSchema(Schema):
+    token = fields.Str(required=True)
+    article_id = fields.Int(required=True)
+
+
+class BatchVerifyRequestSchema(Schema):
+    items = fields.List(fields.Nested(VerifyItemSchema), required=True)
+
+    @validates("items")
+    def validate_items(self, value, **kwargs):
+        if not value:
+            raise ValidationError("At least one item is required")
+        if len(value) > 500:
+            raise ValidationError("At most 500 items per batch")
+
+
+class ApiKeyCreateSchema(Schema):
+    label = fields.Str(required=False, allow_none=True, validate=validate.Length(max=100))
+
+
 class RefundRequestSchema(Schema):
     transaction_id = fields.Int(required=True)
 
@@ -76,3 +109,23 @@ class SiteUpdateSchema(Schema):
 
 class SplitRulesUpdateSchema(Schema):
     rules = fields.List(fields.Dict(), required=True)
+
+
+class SplitSimulationSchema(Schema):
+    start = fields.DateTime(required=True)
+    end = fields.DateTime(required=True)
+    fee_bps = fields.Int(required=False, allow_none=True, validate=validate.Range(min=0, max=10000))
+    # publisher_id -> {"default_author_split_bps": int, "rules": [{"role": str, "percent_bps": int}]}
+    publishers = fields.Dict(keys=fields.Int(), values=fields.Dict(), required=False)
+
+    @validates_schema
+    def validate_range(self, data, **kwargs):
+        if data["end"] <= data["start"]:
+            raise ValidationError("end must be after start", "end")
+        for pid, terms in (data.get("publishers") or {}).items():
+            bps = terms.get("default_author_split_bps")
+            if bps is not None and not (isinstance(bps, int) and 0 <= bps <= 9000):
+                raise ValidationError(f"Invalid default_author_split_bps for publisher {pid}", "publishers")
+            for rule in terms.get("rules", []):
+                if not isinstance(rule, dict) or not rule.get("role") or not isinstance(rule.get("percent_bps"), int):
+                    raise ValidationError(f"Invalid rule for publisher {pid}", "publishers")
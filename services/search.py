@@ -0,0 +1,257 @@
+"""
+Full-text search over publishers and articles.
+
+Searchable text lives in search_documents, one row per publisher or
+article, refreshed by index_article()/index_publisher() wherever content is
+written. On SQLite an FTS5 external-content table (search_fts) mirrors it
+through triggers and ranks with bm25; on Postgres a GIN expression index on
+the weighted tsvector serves websearch_to_tsquery with ts_rank. Any other
+database falls back to LIKE.
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from html import unescape
+from typing import List, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import column, false, func, literal_column, or_, select, table, text, update
+
+from extensions import db
+from models import Article, Publisher, SearchDocument
+
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+_SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5("
+    "title, subtitle, author, body, content='search_documents', content_rowid='id', "
+    "tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS search_documents_ai AFTER INSERT ON search_documents BEGIN "
+    "INSERT INTO search_fts(rowid, title, subtitle, author, body) "
+    "VALUES (new.id, new.title, new.subtitle, new.author, new.body); END",
+    "CREATE TRIGGER IF NOT EXISTS search_documents_ad AFTER DELETE ON search_documents BEGIN "
+    "INSERT INTO search_fts(search_fts, rowid, title, subtitle, author, body) "
+    "VALUES ('delete', old.id, old.title, old.subtitle, old.author, old.body); END",
+    "CREATE TRIGGER IF NOT EXISTS search_documents_au AFTER UPDATE ON search_documents BEGIN "
+    "INSERT INTO search_fts(search_fts, rowid, title, subtitle, author, body) "
+    "VALUES ('delete', old.id, old.title, old.subtitle, old.author, old.body); "
+    "INSERT INTO search_fts(rowid, title, subtitle, author, body) "
+    "VALUES (new.id, new.title, new.subtitle, new.author, new.body); END",
+)
+
+# Must match the index expression exactly for Postgres to use it
+_PG_VECTOR = (
+    "(setweight(to_tsvector('english', coalesce(search_documents.title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(search_documents.subtitle, '') || ' ' || "
+    "coalesce(search_documents.author, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(search_documents.body, '')), 'C'))"
+)
+_PG_DDL = (
+    f"CREATE INDEX IF NOT EXISTS ix_search_documents_tsv ON search_documents USING GIN ({_PG_VECTOR})",
+)
+
+_fts = table("search_fts", column("rowid"))
+
+
+def ensure_schema(app) -> str:
+    """Create the backend's index structures; records and returns the backend name."""
+    dialect = db.engine.dialect.name
+    backend = "like"
+    try:
+        if dialect == "sqlite":
+            for stmt in _SQLITE_DDL:
+                db.session.execute(text(stmt))
+            backend = "fts5"
+        elif dialect == "postgresql":
+            for stmt in _PG_DDL:
+                db.session.execute(text(stmt))
+            backend = "postgres"
+        db.session.commit()
+    except Exception:
+        # e.g. SQLite built without FTS5
+        db.session.rollback()
+        backend = "like"
+    app.extensions["search_backend"] = backend
+    _backfill(backend)
+    return backend
+
+
+def _backfill(backend: str) -> None:
+    """
+    Index rows written before the index existed (deploys, seed scripts), and
+    load an FTS table created after its documents were.
+    """
+    documents = db.session.query(func.count(SearchDocument.id)).scalar() or 0
+    sources = (db.session.query(func.count(Publisher.id)).scalar() or 0) + (
+        db.session.query(func.count(Article.id)).scalar() or 0)
+    if documents < sources:
+        rebuild_index()
+    elif backend == "fts5" and documents and not db.session.execute(text("SELECT 1 FROM search_fts LIMIT 1")).first():
+        db.session.execute(text("INSERT INTO search_fts(search_fts) VALUES ('rebuild')"))
+        db.session.commit()
+
+
+def _backend() -> str:
+    return current_app.extensions.get("search_backend", "like")
+
+
+def _plain_text(html: Optional[str]) -> str:
+    return re.sub(r"\s+", " ", unescape(_TAG_RE.sub(" ", html or ""))).strip()
+
+
+def _upsert(kind: str, ref_id: int, **fields) -> SearchDocument:
+    doc = SearchDocument.query.filter_by(kind=kind, ref_id=ref_id).first()
+    if doc is None:
+        doc = SearchDocument(kind=kind, ref_id=ref_id)
+        db.session.add(doc)
+    for name, value in fields.items():
+        setattr(doc, name, value)
+    return doc
+
+
+def index_article(article: Article, commit: bool = True) -> None:
+    pub = article.publisher
+    _upsert(
+        "article", article.id,
+        title=article.title,
+        subtitle=article.dek,
+        author=article.author,
+        body=_plain_text(article.body_html),
+        category=pub.category if pub else None,
+        media_type=article.media_type,
+        price_cents=article.price_cents or (pub.default_price_cents if pub else 25),
+        is_public=(article.status or "published") == "published",
+    )
+    if commit:
+        db.session.commit()
+
+
+def index_publisher(publisher: Publisher, commit: bool = True) -> None:
+    _upsert(
+        "publisher", publisher.id,
+        title=publisher.name,
+        subtitle=publisher.strapline,
+        category=publisher.category,
+        price_cents=publisher.default_price_cents,
+        is_public=True,
+    )
+    # Article documents carry their publisher's category for filtering
+    db.session.execute(
+        update(SearchDocument)
+        .where(
+            SearchDocument.kind == "article",
+            SearchDocument.ref_id.in_(select(Article.id).where(Article.publisher_id == publisher.id)),
+        )
+        .values(category=publisher.category)
+        .execution_options(synchronize_session=False)
+    )
+    if commit:
+        db.session.commit()
+
+
+def remove_document(kind: str, ref_id: int, commit: bool = True) -> None:
+    SearchDocument.query.filter_by(kind=kind, ref_id=ref_id).delete(synchronize_session=False)
+    if commit:
+        db.session.commit()
+
+
+def rebuild_index(batch_size: int = 500) -> int:
+    """Re-index every publisher and article; returns the number of documents."""
+    SearchDocument.query.delete(synchronize_session=False)
+    count = 0
+    for pub in Publisher.query.yield_per(batch_size):
+        index_publisher(pub, commit=False)
+        count += 1
+    for art in Article.query.yield_per(batch_size):
+        index_article(art, commit=False)
+        count += 1
+    db.session.commit()
+    return count
+
+
+def _fts_expression(q: str) -> Optional[str]:
+    """Quote each word (so user input is never FTS syntax); the last word matches as a prefix."""
+    words = _WORD_RE.findall(q or "")
+    if not words:
+        return None
+    return " ".join(f'"{w}"' for w in words[:-1]) + (" " if len(words) > 1 else "") + f'"{words[-1]}"*'
+
+
+def _match(q: str):
+    """(where clause, score column; higher is better) for the active backend, or None for an empty query."""
+    backend = _backend()
+    if backend == "fts5":
+        expr = _fts_expression(q)
+        if expr is None:
+            return None
+        # bm25 is lower-is-better; negate it. Column weights favour titles.
+        score = literal_column("-bm25(search_fts, 10.0, 4.0, 2.0, 1.0)")
+        return text("search_fts MATCH :fts_query").bindparams(fts_query=expr), score
+    if not (q or "").strip():
+        return None
+    if backend == "postgres":
+        tsq = func.websearch_to_tsquery("english", q)
+        vector = literal_column(_PG_VECTOR)
+        return vector.op("@@")(tsq), func.ts_rank(vector, tsq)
+    like = f"%{q.strip()}%"
+    clause = or_(
+        SearchDocument.title.ilike(like),
+        SearchDocument.subtitle.ilike(like),
+        SearchDocument.author.ilike(like),
+        SearchDocument.body.ilike(like),
+    )
+    return clause, literal_column("0")
+
+
+def _base(stmt):
+    if _backend() == "fts5":
+        return stmt.join(_fts, _fts.c.rowid == SearchDocument.id)
+    return stmt
+
+
+def matching_ids(q: str, kind: str):
+    """Subquery of ref_ids of the given kind matching q, for use in IN filters."""
+    match = _match(q)
+    stmt = _base(select(SearchDocument.ref_id).select_from(SearchDocument)).where(SearchDocument.kind == kind)
+    if match is None:
+        return stmt.where(false())
+    return stmt.where(match[0])
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    kind: str
+    ref_id: int
+    score: float
+
+
+def search(q: str, kind: Optional[str] = None, category: Optional[str] = None,
+           media_type: Optional[str] = None, min_price: Optional[int] = None,
+           max_price: Optional[int] = None, limit: int = 20, offset: int = 0) -> Tuple[List[SearchHit], bool]:
+    """Ranked hits (best first) and whether more follow."""
+    match = _match(q)
+    if match is None:
+        return [], False
+    clause, score = match
+
+    stmt = _base(
+        select(SearchDocument.kind, SearchDocument.ref_id, score.label("score")).select_from(SearchDocument)
+    ).where(clause, SearchDocument.is_public.is_(True))
+    if kind:
+        stmt = stmt.where(SearchDocument.kind == kind)
+    if category:
+        stmt = stmt.where(SearchDocument.category == category)
+    if media_type:
+        stmt = stmt.where(SearchDocument.media_type == media_type)
+    if min_price is not None:
+        stmt = stmt.where(SearchDocument.price_cents >= min_price)
+    if max_price is not None:
+        stmt = stmt.where(SearchDocument.price_cents <= max_price)
+    stmt = stmt.order_by(literal_column("score").desc(), SearchDocument.id).offset(offset).limit(limit + 1)
+
+    rows = db.session.execute(stmt).all()
+    hits = [SearchHit(r.kind, r.ref_id, float(r.score or 0)) for r in rows[:limit]]
+    return hits, len(rows) > limit
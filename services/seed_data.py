@@ -104,5 +104,12 @@ def reseed_demo(
             art_count += 1
     db.session.commit()
 
+    from services.search import rebuild_index
+    from services.suggest import get_index as get_suggest_index
+    from services.response_cache import catalog_changed
+    rebuild_index()
+    get_suggest_index().build()
+    catalog_changed()
+
     sample = [{"name": p.name, "slug": p.slug, "default_price_cents": p.default_price_cents} for p in pub_entities[:5]]
     return {"publishers": len(pub_entities), "articles": art_count, "sample_publishers": sample}
@@ -0,0 +1,275 @@
+"""
+Batch payout settlement.
+
+Each run streams transactions after the previous run's high-water mark in
+id order, turns every transaction's split_breakdown_json into payout lines
+for its author, publisher, platform and any SplitRule roles, and writes one
+statement per payee. Refunds reverse the split of the debit they refund.
+Dashboards read settled totals plus the live tail past the high-water mark.
+
+Runs are serialised by the unique from_transaction_id: of two runs starting
+at the same mark, the second fails with SettlementConflict and writes
+nothing. A run only covers a prefix of transactions older than
+SETTLEMENT_SETTLE_SECONDS (60 by default off SQLite), so a transaction that
+took a lower id but commits late is not passed over for good.
+"""
+from __future__ import annotations
+
+import json
+from bisect import bisect_left
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import Article, PayoutLine, PayoutStatement, SettlementRun, Transaction
+
+
+PayeeKey = Tuple[str, Optional[int]]
+
+
+class SettlementConflict(RuntimeError):
+    """Another run settled (or is settling) from the same high-water mark."""
+
+
+def _settle_seconds() -> float:
+    configured = current_app.config.get("SETTLEMENT_SETTLE_SECONDS")
+    if configured not in (None, ""):
+        return float(configured)
+    return 0.0 if db.engine.dialect.name == "sqlite" else 60.0
+
+
+def _settled_end(start_id: int, cutoff: datetime) -> Optional[int]:
+    """Last id of the run of transactions after start_id that are all older than cutoff."""
+    first_unsettled = (
+        db.session.query(db.func.min(Transaction.id))
+        .filter(Transaction.id > start_id, Transaction.created_at >= cutoff)
+        .scalar()
+    )
+    q = db.session.query(db.func.max(Transaction.id)).filter(Transaction.id > start_id, Transaction.created_at < cutoff)
+    if first_unsettled is not None:
+        q = q.filter(Transaction.id < first_unsettled)
+    return q.scalar()
+
+
+def high_water_mark() -> int:
+    """Last transaction id covered by a settlement run (0 if none has run)."""
+    return db.session.query(db.func.coalesce(db.func.max(SettlementRun.to_transaction_id), 0)).scalar() or 0
+
+
+def _refunded_splits(rows) -> Dict[int, Dict[str, int]]:
+    """refund id -> negated split of the debit it reverses, with one query for the batch."""
+    refunds = [r for r in rows if r.type == "refund"]
+    if not refunds:
+        return {}
+    debits = (
+        db.session.query(Transaction.id, Transaction.user_id, Transaction.article_id, Transaction.split_breakdown_json)
+        .filter(
+            Transaction.type == "debit",
+            Transaction.user_id.in_({r.user_id for r in refunds}),
+            Transaction.article_id.in_({r.article_id for r in refunds}),
+            Transaction.id < max(r.id for r in refunds),
+        )
+        .order_by(Transaction.id.asc())
+        .all()
+    )
+    by_key: Dict[Tuple, List] = {}
+    for d in debits:
+        by_key.setdefault((d.user_id, d.article_id), []).append(d)
+    out = {}
+    for r in refunds:
+        candidates = by_key.get((r.user_id, r.article_id), [])
+        ids = [d.id for d in candidates]
+        i = bisect_left(ids, r.id)
+        orig = candidates[i - 1].split_breakdown_json if i else None
+        out[r.id] = {role: -amount for role, amount in _parse_split(orig).items()}
+    return out
+
+
+def _with_splits(rows) -> Iterator[Tuple[object, Dict[str, int]]]:
+    """(row, payout split) for a chunk of transaction rows; refunds reverse their debit."""
+    refunded = _refunded_splits(rows)
+    for row in rows:
+        if row.type == "debit":
+            yield row, _parse_split(row.split_breakdown_json)
+        elif row.type == "refund":
+            yield row, refunded[row.id]
+        else:
+            yield row, {}  # top-ups and admin adjustments carry no revenue share
+
+
+def _transaction_rows():
+    return select(
+        Transaction.id, Transaction.user_id, Transaction.article_id, Transaction.publisher_id,
+        Transaction.price_cents, Transaction.type, Transaction.split_breakdown_json, Article.author_id,
+    ).outerjoin(Article, Article.id == Transaction.article_id)
+
+
+def _parse_split(raw) -> Dict[str, int]:
+    try:
+        return {str(k): int(v) for k, v in json.loads(raw).items()} if raw else {}
+    except (json.JSONDecodeError, TypeError, ValueError, AttributeError):
+        return {}
+
+
+def _payee(role: str, publisher_id: Optional[int], author_id: Optional[int]) -> Optional[PayeeKey]:
+    if role == "platform":
+        return ("platform", None)
+    if role == "author":
+        return ("author", author_id) if author_id else None
+    if role == "publisher":
+        return ("publisher", publisher_id) if publisher_id else None
+    # SplitRule roles (editor, partner, ...) are paid out through their publisher
+    return (role, publisher_id)
+
+
+@dataclass
+class SettlementResult:
+    run_id: Optional[int]
+    transactions_processed: int
+    statements: int
+    lines: int
+    to_transaction_id: int
+
+
+def run_settlement(period_end: Optional[datetime] = None, batch_size: int = 1000) -> SettlementResult:
+    """
+    Settle transactions after the high-water mark created before period_end
+    (and before the settle delay), stopping at the first one that is not.
+
+    Streams rows with a server-side cursor where the driver supports it and
+    inserts lines in batches; the whole run commits at once, so a failed
+    run leaves the high-water mark where it was. Raises SettlementConflict
+    if a concurrent run claimed the same starting mark.
+    """
+    period_end = period_end or datetime.utcnow()
+    start_id = high_water_mark()
+    cutoff = min(period_end, datetime.utcnow() - timedelta(seconds=_settle_seconds()))
+    end_id = _settled_end(start_id, cutoff)
+    if not end_id:
+        return SettlementResult(None, 0, 0, 0, start_id)
+
+    last_run = SettlementRun.query.order_by(SettlementRun.to_transaction_id.desc()).first()
+    run = SettlementRun(
+        period_start=last_run.period_end if last_run else None,
+        period_end=period_end,
+        from_transaction_id=start_id,
+        to_transaction_id=end_id,
+    )
+    db.session.add(run)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        db.session.rollback()
+        raise SettlementConflict(f"a settlement run from transaction {start_id} already exists")
+
+    statements: Dict[PayeeKey, PayoutStatement] = {}
+    pending: List[dict] = []
+    line_count = 0
+    processed = 0
+
+    def statement_for(key: PayeeKey) -> PayoutStatement:
+        st = statements.get(key)
+        if st is None:
+            st = PayoutStatement(run_id=run.id, payee_type=key[0], payee_id=key[1],
+                                 transaction_count=0, gross_cents=0, amount_cents=0)
+            db.session.add(st)
+            db.session.flush()
+            statements[key] = st
+        return st
+
+    stmt = (
+        _transaction_rows()
+        .where(Transaction.id > start_id, Transaction.id <= end_id)
+        .order_by(Transaction.id.asc())
+        .execution_options(stream_results=True, yield_per=batch_size)
+    )
+    for chunk in db.session.execute(stmt).partitions(batch_size):
+        for row, split in _with_splits(chunk):
+            processed += 1
+            touched = set()
+            # Publisher statements carry the console's unlock/revenue totals, which
+            # count every transaction type, so attribute gross before the split.
+            if row.publisher_id:
+                pub_key = ("publisher", row.publisher_id)
+                st = statement_for(pub_key)
+                st.transaction_count += 1
+                st.gross_cents += row.price_cents or 0
+                touched.add(pub_key)
+
+            for role, amount in split.items():
+                key = _payee(role, row.publisher_id, row.author_id)
+                if key is None or not amount:
+                    continue
+                st = statement_for(key)
+                if key not in touched:
+                    st.transaction_count += 1
+                    st.gross_cents += row.price_cents or 0
+                    touched.add(key)
+                st.amount_cents += amount
+                pending.append({
+                    "statement_id": st.id,
+                    "transaction_id": row.id,
+                    "article_id": row.article_id,
+                    "amount_cents": amount,
+                })
+
+            if len(pending) >= batch_size:
+                db.session.execute(insert(PayoutLine), pending)
+                line_count += len(pending)
+                pending = []
+
+    if pending:
+        db.session.execute(insert(PayoutLine), pending)
+        line_count += len(pending)
+
+    run.transactions_processed = processed
+    db.session.commit()
+    return SettlementResult(run.id, processed, len(statements), line_count, end_id)
+
+
+@dataclass
+class SettledTotals:
+    transaction_count: int
+    gross_cents: int
+    amount_cents: int
+    high_water_mark: int
+
+
+def settled_totals(payee_type: str, payee_id: Optional[int]) -> SettledTotals:
+    """Sum of a payee's statements across all runs, with the mark the tail starts after."""
+    count, gross, amount = (
+        db.session.query(
+            db.func.coalesce(db.func.sum(PayoutStatement.transaction_count), 0),
+            db.func.coalesce(db.func.sum(PayoutStatement.gross_cents), 0),
+            db.func.coalesce(db.func.sum(PayoutStatement.amount_cents), 0),
+        )
+        .filter(PayoutStatement.payee_type == payee_type, PayoutStatement.payee_id == payee_id)
+        .one()
+    )
+    return SettledTotals(int(count), int(gross), int(amount), high_water_mark())
+
+
+def unsettled_amount(payee_type: str, payee_id: Optional[int], after_id: Optional[int] = None) -> int:
+    """
+    A payee's share of transactions past the high-water mark, computed the
+    way run_settlement will compute it (refunds reverse their debit), so
+    settled + unsettled does not move when a run completes.
+    """
+    after_id = high_water_mark() if after_id is None else after_id
+    stmt = _transaction_rows().where(Transaction.id > after_id, Transaction.type.in_(("debit", "refund")))
+    if payee_type == "author":
+        stmt = stmt.where(Article.author_id == payee_id)
+    elif payee_type != "platform":
+        stmt = stmt.where(Transaction.publisher_id == payee_id)
+    rows = db.session.execute(stmt.order_by(Transaction.id.asc())).all()
+    total = 0
+    for row, split in _with_splits(rows):
+        for role, amount in split.items():
+            if _payee(role, row.publisher_id, row.author_id) == (payee_type, payee_id):
+                total += amount
+    return total
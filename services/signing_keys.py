@@ -0,0 +1,121 @@
+"""
+Asymmetric signing keys for access tokens.
+
+With JWT_ALGORITHM set to EdDSA (Ed25519) or RS256, tokens are signed with
+the first PEM private key in JWT_SIGNING_KEY_FILES and carry its kid (the
+RFC 7638 JWK thumbprint). The remaining files are retired keys: no longer
+used to sign, but still published in the JWKS and accepted by verify_jwt
+until tokens signed with them have expired. To rotate, put the new key
+first and keep the old one listed for at least one token lifetime.
+
+If no key files are configured and ENV is "development", a throwaway key is
+generated at startup, which is only suitable for a single-process dev
+server; in any other environment startup fails instead.
+
+Requires the `cryptography` package; HS256 deployments do not need it.
+"""
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from flask import current_app
+
+ASYMMETRIC_ALGORITHMS = ("EdDSA", "RS256")
+
+# RFC 7638 required members per key type
+_THUMBPRINT_MEMBERS = {"OKP": ("crv", "kty", "x"), "RSA": ("e", "kty", "n")}
+
+
+@dataclass(frozen=True)
+class SigningKey:
+    kid: str
+    algorithm: str
+    private_key: object
+    public_key: object
+    public_jwk: Dict[str, str]
+
+
+class KeyRing:
+    def __init__(self, keys: List[SigningKey]):
+        self.keys = keys
+        self._by_kid = {k.kid: k for k in keys}
+
+    @property
+    def active(self) -> SigningKey:
+        return self.keys[0]
+
+    def get(self, kid: Optional[str]) -> Optional[SigningKey]:
+        return self._by_kid.get(kid) if kid else None
+
+    def jwks(self) -> Dict[str, List[Dict[str, str]]]:
+        return {"keys": [k.public_jwk for k in self.keys]}
+
+
+def _thumbprint(jwk: Dict[str, str]) -> str:
+    members = {m: jwk[m] for m in _THUMBPRINT_MEMBERS[jwk["kty"]]}
+    digest = hashlib.sha256(json.dumps(members, sort_keys=True, separators=(",", ":")).encode()).digest()
+    return base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+
+def _signing_key(algorithm: str, private_key) -> SigningKey:
+    from jwt.algorithms import get_default_algorithms
+
+    public_key = private_key.public_key()
+    jwk = get_default_algorithms()[algorithm].to_jwk(public_key, as_dict=True)
+    kid = _thumbprint(jwk)
+    jwk.update({"kid": kid, "alg": algorithm, "use": "sig"})
+    return SigningKey(kid, algorithm, private_key, public_key, jwk)
+
+
+def _generate(algorithm: str):
+    if algorithm == "EdDSA":
+        from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+        return Ed25519PrivateKey.generate()
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def load_keyring(algorithm: str, key_files: List[str], allow_ephemeral: bool = False) -> KeyRing:
+    if algorithm not in ASYMMETRIC_ALGORITHMS:
+        raise ValueError(f"Unsupported JWT_ALGORITHM {algorithm!r}")
+    try:
+        from cryptography.hazmat.primitives.serialization import load_pem_private_key
+    except ImportError as e:
+        raise RuntimeError(f"JWT_ALGORITHM={algorithm} requires the 'cryptography' package") from e
+
+    keys = []
+    for path in key_files:
+        with open(path, "rb") as fh:
+            keys.append(_signing_key(algorithm, load_pem_private_key(fh.read(), password=None)))
+    if not keys:
+        if not allow_ephemeral:
+            raise RuntimeError(
+                f"JWT_ALGORITHM={algorithm} requires JWT_SIGNING_KEY_FILES outside development "
+                "(a temporary key differs per worker and changes on restart)"
+            )
+        logging.getLogger(__name__).warning(
+            "JWT_SIGNING_KEY_FILES is empty; using a temporary %s key (tokens will not survive a restart)",
+            algorithm,
+        )
+        keys.append(_signing_key(algorithm, _generate(algorithm)))
+    return KeyRing(keys)
+
+
+def get_keyring(app=None) -> Optional[KeyRing]:
+    """The app's key ring, or None when tokens are HS256."""
+    app = app or current_app._get_current_object()
+    algorithm = app.config.get("JWT_ALGORITHM", "HS256")
+    if algorithm == "HS256":
+        return None
+    ring = app.extensions.get("jwt_keyring")
+    if ring is None:
+        files = [p.strip() for p in (app.config.get("JWT_SIGNING_KEY_FILES") or "").split(",") if p.strip()]
+        ring = app.extensions["jwt_keyring"] = load_keyring(
+            algorithm, files, allow_ephemeral=app.config.get("ENV") == "development"
+        )
+    return ring
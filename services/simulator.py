@@ -0,0 +1,249 @@
+"""
+What-if revenue split simulation over historical transactions.
+
+Transactions in a date range are loaded into integer columns and the
+current and candidate fee/split rules are applied column-wise, using the
+same integer rounding as calculate_fees_cents, SplitPlan.apply and
+apply_split_rules. NumPy (a requirement) does the column maths; the row-by-row
+path is kept as a reference that the tests replay against, and as a fallback
+for environments without NumPy.
+"""
+from __future__ import annotations
+
+from array import array
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from flask import current_app
+
+from extensions import db
+from models import Article, Transaction
+from services.splits import PublisherTerms, SplitPlan, compile_plan, load_publisher_terms
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without numpy
+    np = None
+
+
+@dataclass
+class TransactionColumns:
+    price: array = field(default_factory=lambda: array("q"))
+    publisher_id: array = field(default_factory=lambda: array("q"))
+    article_id: array = field(default_factory=lambda: array("q"))
+
+    def __len__(self) -> int:
+        return len(self.price)
+
+
+def load_transactions(start: datetime, end: datetime, batch_size: int = 50000) -> TransactionColumns:
+    """Stream debit transactions in [start, end) into integer columns."""
+    cols = TransactionColumns()
+    rows = (
+        db.session.query(Transaction.price_cents, Transaction.publisher_id, Transaction.article_id)
+        .filter(Transaction.type == "debit", Transaction.created_at >= start, Transaction.created_at < end)
+        .execution_options(yield_per=batch_size)
+    )
+    for price, publisher_id, article_id in rows:
+        cols.price.append(price or 0)
+        cols.publisher_id.append(publisher_id or 0)
+        cols.article_id.append(article_id or 0)
+    return cols
+
+
+def _chunks(values: List[int], size: int = 500) -> Iterable[List[int]]:
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+class _Orphan:
+    """Stand-in for transactions whose article no longer exists."""
+    custom_splits = None
+    license_type = None
+
+
+def _override_terms(terms: PublisherTerms, override: Dict[str, Any]) -> PublisherTerms:
+    default_bps = override.get("default_author_split_bps", terms.default_author_split_bps)
+    rules = terms.rules
+    if "rules" in override:
+        rules = tuple((str(r["role"]), int(r["percent_bps"])) for r in override["rules"])
+    return PublisherTerms(default_bps, rules)
+
+
+def build_plans(article_ids: Iterable[int], overrides: Optional[Dict[int, Dict[str, Any]]] = None
+                ) -> Tuple[List[SplitPlan], Dict[int, int]]:
+    """Compile one plan per article; returns (unique plans, article_id -> plan index)."""
+    overrides = overrides or {}
+    ids = sorted(set(article_ids))
+    articles = []
+    for chunk in _chunks(ids):
+        articles.extend(
+            db.session.query(Article.id, Article.publisher_id, Article.license_type, Article.custom_splits)
+            .filter(Article.id.in_(chunk))
+            .all()
+        )
+
+    terms: Dict[int, PublisherTerms] = {}
+    for pid in {a.publisher_id for a in articles if a.publisher_id}:
+        t = load_publisher_terms(pid)
+        if pid in overrides:
+            t = _override_terms(t, overrides[pid])
+        terms[pid] = t
+
+    plans: List[SplitPlan] = []
+    index: Dict[SplitPlan, int] = {}
+    article_plan: Dict[int, int] = {}
+    for a in articles:
+        plan = compile_plan(a, terms.get(a.publisher_id))
+        if plan not in index:
+            index[plan] = len(plans)
+            plans.append(plan)
+        article_plan[a.id] = index[plan]
+    # Transactions whose article has since been deleted price as publisher-owned
+    fallback = compile_plan(_Orphan(), None)
+    if fallback not in index:
+        index[fallback] = len(plans)
+        plans.append(fallback)
+    article_plan[0] = index[fallback]
+    return plans, article_plan
+
+
+def _distribute(fee, net, plan: SplitPlan, maximum: Callable) -> Dict[str, Any]:
+    """
+    SplitPlan.apply expressed with operators that work on ints and arrays alike.
+    Keep in step with SplitPlan.apply and apply_split_rules.
+    """
+    result = {"platform": fee}
+    remaining = net
+    for role, bps in plan.bps:
+        if role == "platform":
+            continue
+        amount = (net * bps) // 10000
+        result[role] = amount
+        remaining = remaining - amount
+    extra = maximum(remaining, 0)
+    if "publisher" in result:
+        result["publisher"] = result["publisher"] + extra
+    elif "author" in result:
+        result["author"] = result["author"] + extra
+    else:
+        result["platform"] = result["platform"] + extra
+
+    if plan.rules and "publisher" in result:
+        pub = result.pop("publisher")
+        divisor = max(sum(bps for _, bps in plan.rules), 10000)
+        allocated_sum = 0
+        carved = {}
+        for role, bps in plan.rules:
+            amt = (pub * bps) // divisor
+            carved[role] = carved.get(role, 0) + amt
+            allocated_sum = allocated_sum + amt
+        carved["publisher"] = carved.get("publisher", 0) + (pub - allocated_sum)
+        for role, amt in carved.items():
+            result[role] = result.get(role, 0) + amt
+    return result
+
+
+def _fees(price, fee_bps: int, maximum: Callable):
+    fee = (price * fee_bps + 9999) // 10000  # round up, as calculate_fees_cents
+    return fee, maximum(price - fee, 0)
+
+
+def _run_numpy(cols: TransactionColumns, fee_bps: int, plans: List[SplitPlan], article_plan: Dict[int, int]):
+    price = np.frombuffer(cols.price, dtype=np.int64)
+    pubs = np.frombuffer(cols.publisher_id, dtype=np.int64)
+    arts = np.frombuffer(cols.article_id, dtype=np.int64)
+
+    uniq_articles, art_inv = np.unique(arts, return_inverse=True)
+    fallback = article_plan[0]
+    plan_of_article = np.array([article_plan.get(int(a), fallback) for a in uniq_articles], dtype=np.int64)
+    row_plan = plan_of_article[art_inv]
+
+    fee, net = _fees(price, fee_bps, np.maximum)
+    roles: Dict[str, Any] = {}
+    for k, plan in enumerate(plans):
+        mask = row_plan == k
+        if not mask.any():
+            continue
+        amounts = _distribute(fee[mask], net[mask], plan, np.maximum)
+        for role, values in amounts.items():
+            if role not in roles:
+                roles[role] = np.zeros(len(price), dtype=np.int64)
+            roles[role][mask] += values
+
+    uniq_pubs, pub_inv = np.unique(pubs, return_inverse=True)
+    totals: Dict[str, int] = {}
+    by_publisher: Dict[int, Dict[str, int]] = {int(p): {} for p in uniq_pubs}
+    for role, column in roles.items():
+        totals[role] = int(column.sum())
+        sums = np.zeros(len(uniq_pubs), dtype=np.int64)
+        np.add.at(sums, pub_inv, column)
+        for p, v in zip(uniq_pubs.tolist(), sums.tolist()):
+            if v:
+                by_publisher[p][role] = v
+    return totals, by_publisher
+
+
+def _run_python(cols: TransactionColumns, fee_bps: int, plans: List[SplitPlan], article_plan: Dict[int, int]):
+    fallback = article_plan[0]
+    totals: Dict[str, int] = {}
+    by_publisher: Dict[int, Dict[str, int]] = {}
+    for price, pid, aid in zip(cols.price, cols.publisher_id, cols.article_id):
+        fee, net = _fees(price, fee_bps, max)
+        amounts = _distribute(fee, net, plans[article_plan.get(aid, fallback)], max)
+        pub_totals = by_publisher.setdefault(pid, {})
+        for role, v in amounts.items():
+            totals[role] = totals.get(role, 0) + v
+            if v:
+                pub_totals[role] = pub_totals.get(role, 0) + v
+    return totals, by_publisher
+
+
+def apply_scenario(cols: TransactionColumns, fee_bps: int, plans: List[SplitPlan], article_plan: Dict[int, int]):
+    if not len(cols):
+        return {}, {}
+    if np is not None:
+        return _run_numpy(cols, fee_bps, plans, article_plan)
+    return _run_python(cols, fee_bps, plans, article_plan)
+
+
+def _delta(a: Dict[str, int], b: Dict[str, int]) -> Dict[str, int]:
+    return {role: b.get(role, 0) - a.get(role, 0) for role in sorted(set(a) | set(b))}
+
+
+def simulate(start: datetime, end: datetime, fee_bps: Optional[int] = None,
+             publisher_overrides: Optional[Dict[int, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    Compare current rules with a candidate fee and per-publisher split terms.
+
+    publisher_overrides maps publisher_id -> {"default_author_split_bps": int,
+    "rules": [{"role": str, "percent_bps": int}, ...]}; omitted keys keep the
+    publisher's current terms.
+    """
+    current_fee = int(current_app.config.get("PLATFORM_FEE_BPS", 1000))
+    candidate_fee = current_fee if fee_bps is None else int(fee_bps)
+
+    cols = load_transactions(start, end)
+    article_ids = set(cols.article_id)
+    cur_plans, cur_index = build_plans(article_ids)
+    cand_plans, cand_index = build_plans(article_ids, publisher_overrides)
+
+    cur_totals, cur_by_pub = apply_scenario(cols, current_fee, cur_plans, cur_index)
+    cand_totals, cand_by_pub = apply_scenario(cols, candidate_fee, cand_plans, cand_index)
+
+    publishers = {}
+    for pid in sorted(set(cur_by_pub) | set(cand_by_pub)):
+        cur = cur_by_pub.get(pid, {})
+        cand = cand_by_pub.get(pid, {})
+        publishers[str(pid)] = {"current": cur, "candidate": cand, "delta": _delta(cur, cand)}
+
+    return {
+        "rows": len(cols),
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "engine": "numpy" if np is not None else "python",
+        "fee_bps": {"current": current_fee, "candidate": candidate_fee},
+        "totals": {"current": cur_totals, "candidate": cand_totals, "delta": _delta(cur_totals, cand_totals)},
+        "by_publisher": publishers,
+    }
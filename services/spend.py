@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from flask import current_app
+from sqlalchemy import update
+
+from extensions import db
+from models import SpendBucket
+
+
+WINDOW_HOURS = 24
+
+
+def hour_bucket(at: datetime) -> datetime:
+    return at.replace(minute=0, second=0, microsecond=0)
+
+
+def _window_start(now: datetime) -> datetime:
+    # The current hour plus the 23 before it
+    return hour_bucket(now) - timedelta(hours=WINDOW_HOURS - 1)
+
+
+class SpendWindowCache:
+    """
+    Optional in-process front cache of each user's hourly buckets.
+
+    Only updated after a successful commit, so it never holds rolled-back
+    spend. It is per process; enable it (SPEND_WINDOW_CACHE) only where one
+    worker serves a given user or a slightly stale cap is acceptable.
+    """
+
+    def __init__(self, max_users: int = 10000):
+        self.max_users = max_users
+        self._buckets: Dict[int, Dict[datetime, int]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int, now: datetime) -> Optional[int]:
+        with self._lock:
+            buckets = self._buckets.get(user_id)
+            if buckets is None:
+                return None
+            start = _window_start(now)
+            for b in [b for b in buckets if b < start]:
+                del buckets[b]
+            return sum(buckets.values())
+
+    def load(self, user_id: int, buckets: Dict[datetime, int]) -> None:
+        with self._lock:
+            if len(self._buckets) >= self.max_users and user_id not in self._buckets:
+                self._buckets.pop(next(iter(self._buckets)))
+            self._buckets[user_id] = dict(buckets)
+
+    def apply(self, user_id: int, bucket_start: datetime, delta_cents: int) -> None:
+        with self._lock:
+            buckets = self._buckets.get(user_id)
+            if buckets is not None:
+                buckets[bucket_start] = max(buckets.get(bucket_start, 0) + delta_cents, 0)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+spend_cache = SpendWindowCache()
+
+
+def _cache_enabled() -> bool:
+    return bool(current_app.config.get("SPEND_WINDOW_CACHE", False))
+
+
+def spent_in_window(user_id: int, now: Optional[datetime] = None) -> int:
+    """Total debits in the rolling 24h window; reads at most 24 bucket rows."""
+    now = now or datetime.utcnow()
+    if _cache_enabled():
+        cached = spend_cache.get(user_id, now)
+        if cached is not None:
+            return cached
+    rows = (
+        db.session.query(SpendBucket.bucket_start, SpendBucket.spent_cents)
+        .filter(SpendBucket.user_id == user_id, SpendBucket.bucket_start >= _window_start(now))
+        .all()
+    )
+    if _cache_enabled():
+        spend_cache.load(user_id, {r[0]: r[1] for r in rows})
+    return sum(r[1] for r in rows)
+
+
+def record_spend(user_id: int, delta_cents: int, at: Optional[datetime] = None) -> datetime:
+    """
+    Stage a change to the user's bucket for `at` in the current transaction.
+
+    Negative deltas (refunds) decrement the bucket the original debit landed
+    in. Callers hold the user's wallet row lock from the debit UPDATE, so the
+    update-then-insert below cannot race for the same user. Buckets that
+    have left the window are pruned on the way. Returns the bucket start for
+    `spend_committed`.
+    """
+    at = at or datetime.utcnow()
+    bucket_start = hour_bucket(at)
+    updated = db.session.execute(
+        update(SpendBucket)
+        .where(SpendBucket.user_id == user_id, SpendBucket.bucket_start == bucket_start)
+        .values(spent_cents=SpendBucket.spent_cents + delta_cents)
+        .execution_options(synchronize_session=False)
+    )
+    if updated.rowcount == 0 and delta_cents > 0:
+        db.session.add(SpendBucket(user_id=user_id, bucket_start=bucket_start, spent_cents=delta_cents))
+    db.session.query(SpendBucket).filter(
+        SpendBucket.user_id == user_id,
+        SpendBucket.bucket_start < _window_start(datetime.utcnow()),
+    ).delete(synchronize_session=False)
+    return bucket_start
+
+
+def spend_committed(user_id: int, bucket_start: datetime, delta_cents: int) -> None:
+    """Mirror a committed bucket change into the front cache."""
+    if _cache_enabled():
+        spend_cache.apply(user_id, bucket_start, delta_cents)
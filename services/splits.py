@@ -0,0 +1,180 @@
+"""
+Compiled revenue-split plans.
+
+An article's effective split (custom_splits, license defaults, the
+publisher's default_author_split_bps and its SplitRule rows) is compiled
+once into an immutable SplitPlan and cached by article id and version, so
+pricing a purchase does no JSON parsing and touches no database.
+"""
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from flask import current_app
+
+from services.lru import LRUCache
+
+
+PLATFORM_BPS = 1000  # Always 10% platform in the license defaults
+
+
+@dataclass(frozen=True)
+class PublisherTerms:
+    default_author_split_bps: Optional[int]
+    rules: Tuple[Tuple[str, int], ...]  # SplitRule (role, bps), carved from the publisher share
+
+
+@dataclass(frozen=True)
+class SplitPlan:
+    bps: Tuple[Tuple[str, int], ...]  # role -> basis points, as configured (may include platform)
+    rules: Tuple[Tuple[str, int], ...] = ()
+
+    def as_dict(self) -> Dict[str, int]:
+        return dict(self.bps)
+
+    def apply(self, price_cents: int) -> Dict[str, int]:
+        """Distribute a sale price; returns role -> cents."""
+        from services.payments import calculate_fees_cents, apply_split_rules
+
+        fee_cents, net_cents = calculate_fees_cents(price_cents)
+        result = {"platform": fee_cents}
+
+        # Distribute net amount according to splits (platform already taken as the fee)
+        remaining = net_cents
+        for role, bps in self.bps:
+            if role == "platform":
+                continue
+            amount = (net_cents * bps) // 10000
+            result[role] = amount
+            remaining -= amount
+
+        # Add any remainder to publisher or author
+        if remaining > 0:
+            if "publisher" in result:
+                result["publisher"] += remaining
+            elif "author" in result:
+                result["author"] += remaining
+            else:
+                result["platform"] += remaining
+
+        # Publisher SplitRules subdivide the publisher's share; remainder stays with publisher
+        if self.rules and result.get("publisher"):
+            carved = apply_split_rules(result.pop("publisher"), dict(self.rules))
+            for role, amount in carved.items():
+                result[role] = result.get(role, 0) + amount
+
+        return result
+
+
+_publisher_terms = LRUCache(maxsize=2048)
+_plans = LRUCache(maxsize=20000)
+_publisher_generation: Dict[int, int] = {}
+
+
+def _ttl() -> float:
+    return float(current_app.config.get("SPLIT_PLAN_TTL_SECONDS", 300))
+
+
+def load_publisher_terms(publisher_id: int) -> PublisherTerms:
+    from extensions import db
+    from models import Publisher, SplitRule
+
+    default_bps = db.session.query(Publisher.default_author_split_bps).filter(Publisher.id == publisher_id).scalar()
+    rules = (
+        db.session.query(SplitRule.role, SplitRule.percent_bps)
+        .filter(SplitRule.publisher_id == publisher_id)
+        .order_by(SplitRule.id.asc())
+        .all()
+    )
+    return PublisherTerms(default_bps, tuple((r, int(b or 0)) for r, b in rules))
+
+
+def publisher_terms(publisher_id: Optional[int]) -> Optional[PublisherTerms]:
+    if not publisher_id:
+        return None
+    terms = _publisher_terms.get(publisher_id)
+    if terms is None:
+        terms = load_publisher_terms(publisher_id)
+        _publisher_terms.set(publisher_id, terms, ttl=_ttl())
+    return terms
+
+
+def _parse_custom_splits(raw) -> Optional[Tuple[Tuple[str, int], ...]]:
+    if not raw:
+        return None
+    try:
+        data = json.loads(raw)
+        return tuple((str(role), int(bps)) for role, bps in data.items())
+    except (json.JSONDecodeError, TypeError, ValueError, AttributeError):
+        return None
+
+
+def compile_plan(article, terms: Optional[PublisherTerms]) -> SplitPlan:
+    """
+    Build an article's plan.
+
+    Priority:
+    1. Article custom_splits (per-article override)
+    2. Default splits based on license type
+    3. Platform default (90% publisher, 10% platform)
+    Publisher SplitRule rows then subdivide whatever share the publisher gets.
+    """
+    rules = terms.rules if terms else ()
+
+    custom = _parse_custom_splits(article.custom_splits)
+    if custom is not None:
+        return SplitPlan(custom, rules)
+
+    if article.license_type == "independent":
+        # Independent author: 90% author, 10% platform
+        return SplitPlan((("author", 9000), ("platform", PLATFORM_BPS)), rules)
+
+    if article.license_type == "revenue_share":
+        # Revenue share: default 60% author, 30% publisher, 10% platform
+        # Can be overridden by publisher
+        if terms and terms.default_author_split_bps:
+            author_bps = terms.default_author_split_bps
+            publisher_bps = 10000 - author_bps - PLATFORM_BPS
+            return SplitPlan((("author", author_bps), ("publisher", publisher_bps), ("platform", PLATFORM_BPS)), rules)
+        return SplitPlan((("author", 6000), ("publisher", 3000), ("platform", PLATFORM_BPS)), rules)
+
+    # Buyout (author already paid) and default: 90% publisher, 10% platform
+    return SplitPlan((("publisher", 9000), ("platform", PLATFORM_BPS)), rules)
+
+
+def _version(article) -> tuple:
+    return (
+        article.updated_at,
+        article.publisher_id,
+        article.license_type,
+        _publisher_generation.get(article.publisher_id, 0),
+    )
+
+
+def resolve_plan(article) -> SplitPlan:
+    """Cached plan for an article; recompiled when the article's version changes."""
+    cached = _plans.get(article.id)
+    version = _version(article)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    plan = compile_plan(article, publisher_terms(article.publisher_id))
+    _plans.set(article.id, (version, plan), ttl=_ttl())
+    return plan
+
+
+def invalidate_article(article_id: int) -> None:
+    _plans.pop(article_id)
+
+
+def invalidate_publisher(publisher_id: int) -> None:
+    """Drop a publisher's terms; its articles recompile against fresh terms on next use."""
+    _publisher_generation[publisher_id] = _publisher_generation.get(publisher_id, 0) + 1
+    _publisher_terms.pop(publisher_id)
+
+
+def clear() -> None:
+    _plans.clear()
+    _publisher_terms.clear()
+    _publisher_generation.clear()
@@ -0,0 +1,234 @@
+"""
+Typeahead suggestions for publishers and authors.
+
+An in-memory prefix index over normalised publisher names, slugs and author
+display names, ranked by popularity (debit transactions). Keys live in a
+sorted array searched with bisect; the top-k for every short prefix is
+precomputed because those match the most entries. Lookups never touch the
+database. The index is built at startup, patched in place when publishers or
+authors are written, and rebuilt from the database every
+SUGGEST_REBUILD_SECONDS so popularity and other workers' writes catch up.
+Only one request rebuilds at a time; the rest keep serving the current
+snapshot meanwhile.
+"""
+from __future__ import annotations
+
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import func
+
+from extensions import db
+
+
+TOP_K = 10
+PRECOMPUTED_PREFIX_LEN = 2
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text: Optional[str]) -> str:
+    """Lowercase, strip accents and punctuation, collapse whitespace."""
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode()
+    return _NON_ALNUM.sub(" ", text.lower()).strip()
+
+
+@dataclass(frozen=True)
+class Suggestion:
+    kind: str  # publisher | author
+    ref_id: int
+    label: str
+    slug: Optional[str]
+    popularity: int
+
+    def to_dict(self) -> Dict:
+        return {"type": self.kind, "id": self.ref_id, "name": self.label,
+                "slug": self.slug, "popularity": self.popularity}
+
+
+def _keys(s: Suggestion) -> Iterable[str]:
+    """The full name, each later word onwards ("new york times" -> "york times", "times"), and the slug."""
+    name = normalize(s.label)
+    words = name.split()
+    for i in range(len(words)):
+        yield " ".join(words[i:])
+    if s.slug:
+        yield normalize(s.slug)
+
+
+def _rank(items: Iterable[Suggestion]) -> List[Suggestion]:
+    return sorted(items, key=lambda s: (-s.popularity, s.label.lower(), s.ref_id))
+
+
+class _Snapshot:
+    """Lookup structures for one set of suggestions, patched in place on writes."""
+
+    def __init__(self, items: Dict[Tuple[str, int], Suggestion]):
+        # (key, ident) pairs, sorted; bisect with (prefix,) to find a prefix's first key
+        self.pairs = sorted({(key, ident) for ident, s in items.items() for key in _keys(s) if key})
+        self.items = dict(items)
+        short: Dict[str, set] = {}
+        for key, ident in self.pairs:
+            for p in _short_prefixes(key):
+                short.setdefault(p, set()).add(ident)
+        self.top = {p: _rank(self.items[i] for i in idents)[:TOP_K] for p, idents in short.items()}
+
+    def _matching(self, prefix: str) -> set:
+        seen = set()
+        pos = bisect_left(self.pairs, (prefix,))
+        while pos < len(self.pairs) and self.pairs[pos][0].startswith(prefix):
+            seen.add(self.pairs[pos][1])
+            pos += 1
+        return seen
+
+    def lookup(self, prefix: str, limit: int) -> List[Suggestion]:
+        if len(prefix) <= PRECOMPUTED_PREFIX_LEN and limit <= TOP_K:
+            return self.top.get(prefix, [])[:limit]
+        return _rank(self.items[i] for i in self._matching(prefix))[:limit]
+
+    def remove(self, ident: Tuple[str, int]) -> None:
+        old = self.items.pop(ident, None)
+        if old is None:
+            return
+        stale = set()
+        for key in {k for k in _keys(old) if k}:
+            pos = bisect_left(self.pairs, (key, ident))
+            if pos < len(self.pairs) and self.pairs[pos] == (key, ident):
+                del self.pairs[pos]
+            stale.update(_short_prefixes(key))
+        for p in stale:
+            if any(s.kind == old.kind and s.ref_id == old.ref_id for s in self.top.get(p, ())):
+                self.top[p] = _rank(self.items[i] for i in self._matching(p))[:TOP_K]
+
+    def add(self, ident: Tuple[str, int], item: Suggestion) -> None:
+        self.remove(ident)
+        self.items[ident] = item
+        prefixes = set()
+        for key in {k for k in _keys(item) if k}:
+            insort(self.pairs, (key, ident))
+            prefixes.update(_short_prefixes(key))
+        for p in prefixes:
+            self.top[p] = _rank([*self.top.get(p, ()), item])[:TOP_K]
+
+
+def _short_prefixes(key: str) -> Iterable[str]:
+    return (key[:n] for n in range(1, min(PRECOMPUTED_PREFIX_LEN, len(key)) + 1))
+
+
+class SuggestIndex:
+    def __init__(self):
+        self._lock = threading.Lock()  # guards the snapshot
+        self._build_lock = threading.Lock()  # one rebuild at a time
+        self._snapshot = _Snapshot({})
+        self._built_at: Optional[float] = None
+        self._patched_during_build: Optional[List] = None
+
+    def build(self) -> int:
+        """Load every publisher and author with their popularity; returns the entry count."""
+        with self._build_lock:
+            return self._build()
+
+    def _build(self) -> int:
+        from models import Article, AuthorProfile, Publisher, Transaction
+
+        with self._lock:
+            self._patched_during_build = []
+        pub_pop = dict(
+            db.session.query(Transaction.publisher_id, func.count(Transaction.id))
+            .filter(Transaction.type == "debit")
+            .group_by(Transaction.publisher_id)
+            .all()
+        )
+        author_pop = dict(
+            db.session.query(Article.author_id, func.count(Transaction.id))
+            .join(Transaction, Transaction.article_id == Article.id)
+            .filter(Transaction.type == "debit", Article.author_id.isnot(None))
+            .group_by(Article.author_id)
+            .all()
+        )
+        items: Dict[Tuple[str, int], Suggestion] = {}
+        for pid, name, slug in db.session.query(Publisher.id, Publisher.name, Publisher.slug):
+            items[("publisher", pid)] = Suggestion("publisher", pid, name, slug, pub_pop.get(pid, 0))
+        for aid, name in db.session.query(AuthorProfile.id, AuthorProfile.display_name):
+            items[("author", aid)] = Suggestion("author", aid, name, None, author_pop.get(aid, 0))
+
+        snapshot = _Snapshot(items)
+        with self._lock:
+            # Writes that landed while the database was being read may be missing from it
+            for ident, item in self._patched_during_build:
+                self._apply(snapshot, ident, item)
+            self._patched_during_build = None
+            self._snapshot = snapshot
+            self._built_at = time.monotonic()
+        return len(snapshot.items)
+
+    @staticmethod
+    def _apply(snapshot: _Snapshot, ident: Tuple[str, int], item: Optional[Suggestion]) -> None:
+        if item is None:
+            snapshot.remove(ident)
+            return
+        old = snapshot.items.get(ident)
+        # Keep the popularity learned at build time
+        snapshot.add(ident, item if old is None else Suggestion(
+            item.kind, item.ref_id, item.label, item.slug, old.popularity))
+
+    def _patch(self, ident: Tuple[str, int], item: Optional[Suggestion]) -> None:
+        with self._lock:
+            self._apply(self._snapshot, ident, item)
+            if self._patched_during_build is not None:
+                self._patched_during_build.append((ident, item))
+
+    def put_publisher(self, publisher) -> None:
+        self._patch(("publisher", publisher.id),
+                    Suggestion("publisher", publisher.id, publisher.name, publisher.slug, 0))
+
+    def put_author(self, author) -> None:
+        self._patch(("author", author.id), Suggestion("author", author.id, author.display_name, None, 0))
+
+    def remove(self, kind: str, ref_id: int) -> None:
+        self._patch((kind, ref_id), None)
+
+    def is_stale(self, max_age: float) -> bool:
+        return self._built_at is None or time.monotonic() - self._built_at > max_age
+
+    def refresh_if_stale(self, max_age: float) -> bool:
+        """
+        Rebuild when stale, unless another request already is; callers that
+        do not get to rebuild keep serving the current snapshot.
+        """
+        if not self.is_stale(max_age) or not self._build_lock.acquire(blocking=False):
+            return False
+        try:
+            if self.is_stale(max_age):
+                self._build()
+                return True
+            return False
+        finally:
+            self._build_lock.release()
+
+    def suggest(self, q: str, limit: int = TOP_K) -> List[Suggestion]:
+        prefix = normalize(q)
+        if not prefix:
+            return []
+        with self._lock:
+            return self._snapshot.lookup(prefix, limit)
+
+
+def get_index(app=None) -> SuggestIndex:
+    app = app or current_app._get_current_object()
+    index = app.extensions.get("suggest_index")
+    if index is None:
+        index = app.extensions["suggest_index"] = SuggestIndex()
+    return index
+
+
+def suggest(q: str, limit: int = TOP_K) -> List[Suggestion]:
+    index = get_index()
+    index.refresh_if_stale(float(current_app.config.get("SUGGEST_REBUILD_SECONDS", 600)))
+    return index.suggest(q, limit)
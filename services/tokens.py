@@ -1,7 +1,32 @@
+"""
+Access tokens (JWTs) for unlocked articles.
+
+Tokens are HS256 by default. With JWT_ALGORITHM=EdDSA or RS256 they are
+signed by the active key in services.signing_keys and carry its kid, so
+publishers can verify them offline against /.well-known/jwks.json and
+poll revocations_since() (served as a feed) for refunds.
+
+verify_jwt() is on the hot path of /api/verify and /paypr/unlock, where the
+same token is often checked many times. Verified claims are cached in an LRU
+keyed by the token's SHA-256 until the token's own exp, and revocation is
+checked against an in-memory set of revoked hashes, so a repeat check of a
+valid token touches neither the database nor signature verification.
+
+The revoked set is per process: revoke_token() updates it immediately in
+this worker, and every worker pulls rows added elsewhere at most every
+TOKEN_REVOCATION_REFRESH_SECONDS (one indexed query for new ids only).
+Entries are dropped after REVOCATION_FEED_WINDOW_MINUTES, by when the token
+has expired anyway, so the first refresh seeds only that window (the same
+rows revocations_since() serves) and then follows new ids from the current
+maximum. The set holds at most TOKEN_REVOKED_MAXSIZE hashes; for one window
+after that bound evicts anything, a miss is confirmed in the database.
+"""
 from __future__ import annotations
 
+import threading
+import time
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Sequence, Tuple
 
 import hashlib
 import jwt
@@ -9,12 +34,89 @@ from flask import current_app
 
 from extensions import db
 from models import RevokedToken
+from services.lru import LRUCache
+from services.signing_keys import get_keyring
 
 
 def _hash_token(token: str) -> str:
     return hashlib.sha256(token.encode('utf-8')).hexdigest()
 
 
+class TokenVerifier:
+    """Verified-claims cache plus the revoked-hash set for one app."""
+
+    def __init__(self, maxsize: int, refresh_seconds: float, revoked_maxsize: int = 100000,
+                 revoked_ttl: float = 3600):
+        self.claims = LRUCache(maxsize=maxsize)
+        self.refresh_seconds = refresh_seconds
+        self._revoked = LRUCache(maxsize=revoked_maxsize, ttl=revoked_ttl)
+        self._revoked_ttl = revoked_ttl
+        # An evicted hash would have expired by then, so misses are exact again
+        self._overflowed_until: Optional[float] = None
+        self._last_id = 0
+        self._refreshed_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def refresh(self, force: bool = False) -> None:
+        """Pull revocations recorded since the last refresh (by any worker)."""
+        now = time.monotonic()
+        if not force and self._refreshed_at is not None and now - self._refreshed_at < self.refresh_seconds:
+            return
+        with self._lock:
+            query = db.session.query(RevokedToken.id, RevokedToken.token_hash)
+            if self._refreshed_at is None:
+                # Older revocations have expired; don't load the whole history
+                cutoff = datetime.utcnow() - timedelta(seconds=self._revoked_ttl)
+                max_id = db.session.query(db.func.max(RevokedToken.id)).scalar() or 0
+                query = query.filter(RevokedToken.created_at >= cutoff, RevokedToken.id <= max_id)
+                self._last_id = max_id
+            else:
+                query = query.filter(RevokedToken.id > self._last_id)
+            rows = query.order_by(RevokedToken.id).all()
+            for row_id, token_hash in rows:
+                self._remember(token_hash)
+                self._last_id = max(self._last_id, row_id)
+            self._refreshed_at = now
+        for _, token_hash in rows:
+            self.claims.pop(token_hash)
+
+    def _remember(self, token_hash: str) -> None:
+        if len(self._revoked) >= self._revoked.maxsize and self._revoked.get(token_hash) is None:
+            self._overflowed_until = time.monotonic() + self._revoked_ttl
+        self._revoked.set(token_hash, True)
+
+    @property
+    def _overflowed(self) -> bool:
+        return self._overflowed_until is not None and time.monotonic() < self._overflowed_until
+
+    def is_revoked(self, token_hash: str) -> bool:
+        if self._revoked.get(token_hash) is not None:
+            return True
+        if not self._overflowed:
+            return False
+        return db.session.query(RevokedToken.id).filter_by(token_hash=token_hash).first() is not None
+
+    def revoked(self, token_hash: str) -> None:
+        self._remember(token_hash)
+        self.claims.pop(token_hash)
+
+    def stats(self) -> dict:
+        return {**self.claims.stats(), "revoked": len(self._revoked), "revoked_overflowed": self._overflowed}
+
+
+def get_verifier(app=None) -> TokenVerifier:
+    app = app or current_app._get_current_object()
+    verifier = app.extensions.get("token_verifier")
+    if verifier is None:
+        verifier = app.extensions["token_verifier"] = TokenVerifier(
+            int(app.config.get("TOKEN_CACHE_MAXSIZE", 10000)),
+            float(app.config.get("TOKEN_REVOCATION_REFRESH_SECONDS", 5)),
+            int(app.config.get("TOKEN_REVOKED_MAXSIZE", 100000)),
+            60 * float(app.config.get("REVOCATION_FEED_WINDOW_MINUTES", 60)),
+        )
+    return verifier
+
+
 def issue_jwt(user_id: int, article_id: int, publisher_id: int, exp_minutes: int = 10) -> str:
     now = datetime.now(tz=timezone.utc)
     payload = {
@@ -24,29 +126,97 @@ def issue_jwt(user_id: int, article_id: int, publisher_id: int, exp_minutes: int
         "iat": int(now.timestamp()),
         "exp": int((now + timedelta(minutes=exp_minutes)).timestamp()),
     }
+    ring = get_keyring()
+    if ring is not None:
+        key = ring.active
+        return jwt.encode(payload, key.private_key, algorithm=key.algorithm, headers={"kid": key.kid})
     secret = current_app.config.get("JWT_SECRET_KEY")
     token = jwt.encode(payload, secret, algorithm="HS256")
     return token
 
 
+def _decode(token: str) -> Dict[str, Any]:
+    """Verify with the key named by the token's kid, else as a (legacy) HS256 token."""
+    ring = get_keyring()
+    if ring is not None:
+        key = ring.get(jwt.get_unverified_header(token).get("kid"))
+        if key is not None:
+            # Pin the key's own algorithm so a header cannot pick another
+            return jwt.decode(token, key.public_key, algorithms=[key.algorithm])
+    secret = current_app.config.get("JWT_SECRET_KEY")
+    return jwt.decode(token, secret, algorithms=["HS256"])  # type: ignore
+
+
+def _claims(verifier: TokenVerifier, token: str, token_hash: str) -> Optional[Dict[str, Any]]:
+    """Claims of an unrevoked token, from the cache or by verifying the signature."""
+    try:
+        cached = verifier.claims.get(token_hash)
+        if cached is not None:
+            # Entries expire with the token, but exp is checked again at second precision
+            if cached.get("exp", 0) > time.time():
+                return dict(cached)
+            verifier.claims.pop(token_hash)
+            return None
+        payload = _decode(token)
+        ttl = payload.get("exp", 0) - time.time()
+        if ttl > 0:
+            verifier.claims.set(token_hash, dict(payload), ttl=ttl)
+        return payload
+    except Exception:
+        return None
+
+
 def verify_jwt(token: str) -> Optional[Dict[str, Any]]:
     try:
-        # Check revocation
         token_hash = _hash_token(token)
-        if db.session.query(RevokedToken.id).filter_by(token_hash=token_hash).first():
+        verifier = get_verifier()
+        verifier.refresh()
+        if verifier.is_revoked(token_hash):
             return None
-        secret = current_app.config.get("JWT_SECRET_KEY")
-        payload = jwt.decode(token, secret, algorithms=["HS256"])  # type: ignore
-        return payload
+        return _claims(verifier, token, token_hash)
     except Exception:
         return None
 
 
+def verify_many(tokens: Sequence[str]) -> List[Optional[Dict[str, Any]]]:
+    """
+    verify_jwt for a batch, in input order. Revocation is checked exactly,
+    with one IN query over the batch's hashes rather than the periodically
+    refreshed in-memory set.
+    """
+    verifier = get_verifier()
+    hashes = [_hash_token(t) for t in tokens]
+    revoked = {
+        h for (h,) in db.session.query(RevokedToken.token_hash).filter(RevokedToken.token_hash.in_(set(hashes)))
+    }
+    for h in revoked:
+        verifier.revoked(h)
+    return [None if h in revoked else _claims(verifier, t, h) for t, h in zip(tokens, hashes)]
+
+
 def revoke_token(token: str) -> None:
     try:
         token_hash = _hash_token(token)
         if not db.session.query(RevokedToken.id).filter_by(token_hash=token_hash).first():
             db.session.add(RevokedToken(token_hash=token_hash))
             db.session.commit()
+        get_verifier().revoked(token_hash)
     except Exception:
         db.session.rollback()
+
+
+def revocations_since(since_id: int = 0, limit: int = 1000) -> Tuple[List[str], int]:
+    """
+    Token hashes revoked after since_id within REVOCATION_FEED_WINDOW_MINUTES,
+    oldest first, and the cursor to pass next time.
+    """
+    window = int(current_app.config.get("REVOCATION_FEED_WINDOW_MINUTES", 60))
+    cutoff = datetime.utcnow() - timedelta(minutes=window)
+    rows = (
+        db.session.query(RevokedToken.id, RevokedToken.token_hash)
+        .filter(RevokedToken.id > since_id, RevokedToken.created_at >= cutoff)
+        .order_by(RevokedToken.id)
+        .limit(limit)
+        .all()
+    )
+    return [h for _, h in rows], (rows[-1][0] if rows else since_id)
@@ -73,6 +73,10 @@ class APIClient {
     return this.get(`/publishers${query ? '?' + query : ''}`);
   }
 
+  async suggest(q) {
+    return this.get(`/suggest?q=${encodeURIComponent(q)}`);
+  }
+
   async getPublisher(slug) {
     return this.get(`/publishers/${slug}`);
   }
@@ -82,8 +86,13 @@ class APIClient {
     return this.get(`/articles${query ? '?' + query : ''}`);
   }
 
+  // Shared document (cacheable) and the caller's entitlement, fetched in parallel
   async getArticle(id) {
-    return this.get(`/articles/${id}`);
+    const [article, entitlement] = await Promise.all([
+      this.get(`/articles/${id}/public`),
+      this.get(`/articles/${id}/entitlement`),
+    ]);
+    return { ...article, ...entitlement, id: article.id };
   }
 
   async getCategories() {
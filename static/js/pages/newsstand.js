@@ -52,7 +52,10 @@ export async function renderNewsstand() {
               id="search-input"
               class="form-input"
               placeholder="Search publishers..."
+              list="search-suggestions"
+              autocomplete="off"
             />
+            <datalist id="search-suggestions"></datalist>
             <button class="btn btn-secondary" id="search-btn">Search</button>
           </div>
         </div>
@@ -172,6 +175,21 @@ function setupSearch() {
     }
   };
 
+  // Typeahead: suggestions come from an in-memory index, so per-keystroke calls are cheap
+  const suggestions = document.getElementById('search-suggestions');
+  searchInput.addEventListener('input', async () => {
+    const query = searchInput.value.trim();
+    if (!query) { suggestions.innerHTML = ''; return; }
+    try {
+      const data = await api.suggest(query);
+      suggestions.innerHTML = (data.items || [])
+        .map(s => `<option value="${s.name.replace(/"/g, '&quot;')}"></option>`)
+        .join('');
+    } catch (error) {
+      suggestions.innerHTML = '';
+    }
+  });
+
   searchBtn.addEventListener('click', performSearch);
   searchInput.addEventListener('keypress', (e) => {
     if (e.key === 'Enter') {
@@ -185,13 +185,14 @@
     if(!shelf) return;
     btn.className = 'pay-btn'; btn.textContent = 'Load more';
     btn.style.margin = '12px auto';
-    let offset = shelf.children.length;
+    let offset = shelf.children.length; let cursor = null;
     const params = new URLSearchParams(location.search);
     const q = params.get('q')||''; const category = params.get('category')||'';
     const load = async ()=>{
       btn.disabled = true; const orig = btn.textContent; btn.textContent = 'Loading…';
       try{
-        const u = `/api/publishers?offset=${offset}&limit=12&q=${encodeURIComponent(q)}&category=${encodeURIComponent(category)}`;
+        const page = cursor ? `cursor=${encodeURIComponent(cursor)}` : `offset=${offset}`;
+        const u = `/api/publishers?${page}&limit=12&q=${encodeURIComponent(q)}&category=${encodeURIComponent(category)}`;
         const res = await fetch(u, {credentials:'same-origin'});
         const data = await res.json();
         (data.items||[]).forEach(p=>{
@@ -200,8 +201,8 @@
           a.innerHTML = `<div class="mag-spine"></div><img class="mag-cover" src="${p.hero_url||''}" alt="${p.name}"><div class="mag-title">${p.name}</div>${p.category?`<div class=\"chip\" style=\"margin-top:6px\">${p.category}</div>`:''}`;
           shelf.appendChild(a);
         });
-        offset += (data.items||[]).length;
-        if(!data.items || !data.items.length){ btn.remove(); }
+        offset += (data.items||[]).length; cursor = data.next_cursor || null;
+        if(!data.items || !data.items.length || !cursor){ btn.remove(); }
       }catch(e){ toast('Nothing more to load'); btn.remove(); }
       finally{ if(btn){ btn.disabled = false; btn.textContent = orig; } }
     };
@@ -7,12 +7,20 @@ PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
+# Run the suite against a throwaway in-memory database, never paypr.db
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
 from app import create_app  # noqa: E402
 
 
 @pytest.fixture
 def app():
     application = create_app()
+    # In-process caches are keyed by row ids, which every fresh database reuses
+    from services import entitlements, event_encoding, splits
+    splits.clear()
+    entitlements.clear()
+    event_encoding.clear()
     yield application
 
 
@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta
+
+from extensions import db
+from models import Article, Event, EventDailyCount, Publisher
+from services.analytics import _watermark, daily_series, prune_events, rollup_events, top_articles
+
+
+def _seed(app):
+    with app.app_context():
+        pub = Publisher(name="City Ledger", slug="city-ledger")
+        db.session.add(pub)
+        db.session.flush()
+        arts = [Article(publisher_id=pub.id, slug=f"s{i}", title=f"Story {i}", body_html="<p>x</p>") for i in range(2)]
+        db.session.add_all(arts)
+        db.session.commit()
+        return [a.id for a in arts]
+
+
+def test_events_live_in_analytics_bind(app):
+    with app.app_context():
+        assert db.engines["analytics"] is not db.engine
+        assert Event.__table__.name in db.inspect(db.engines["analytics"]).get_table_names()
+        assert Event.__table__.name not in db.inspect(db.engine).get_table_names()
+
+
+def test_top_articles_resolves_ids_through_lookup(app):
+    first, second = _seed(app)
+    with app.app_context():
+        db.session.add_all(
+            [Event(event_name="article_view", article_id=second) for _ in range(3)]
+            + [Event(event_name="article_view", article_id=first)]
+        )
+        db.session.commit()
+        rollup_events()
+
+        items = top_articles("article_view", days=1)
+    assert [(i["article_id"], i["count"], i["title"], i["publisher"]) for i in items] == [
+        (second, 3, "Story 1", "City Ledger"),
+        (first, 1, "Story 0", "City Ledger"),
+    ]
+
+
+def test_rollup_is_incremental(app):
+    first, second = _seed(app)
+    today = datetime.utcnow()
+    with app.app_context():
+        db.session.add_all([
+            Event(event_name="article_view", article_id=first, publisher_id=1, created_at=today),
+            Event(event_name="article_view", article_id=first, publisher_id=1, created_at=today - timedelta(days=1)),
+            Event(event_name="pay", article_id=first, publisher_id=1, created_at=today),
+        ])
+        db.session.commit()
+        assert rollup_events(batch_size=2) == 3
+        assert rollup_events() == 0
+
+        db.session.add(Event(event_name="article_view", article_id=second, publisher_id=1, created_at=today))
+        db.session.commit()
+        assert rollup_events() == 1
+
+        series = daily_series("article_view", days=3, publisher_id=1)
+        assert [p["count"] for p in series] == [0, 1, 2]
+        assert series[-1]["day"] == today.date().isoformat()
+        assert [p["count"] for p in daily_series("article_view", days=2, article_id=first)] == [1, 1]
+        assert EventDailyCount.query.count() == 4
+
+
+def test_prune_keeps_unrolled_and_recent_events(app):
+    with app.app_context():
+        old = datetime.utcnow() - timedelta(days=120)
+        db.session.add_all([Event(event_name="article_view", created_at=old) for _ in range(3)])
+        db.session.commit()
+        rollup_events()
+        db.session.add(Event(event_name="article_view", created_at=old))  # not rolled up yet
+        db.session.add(Event(event_name="article_view"))
+        db.session.commit()
+
+        assert prune_events(days=90, batch_size=2) == 3
+        assert Event.query.count() == 2
+        # Counts survive the raw rows
+        assert db.session.query(db.func.sum(EventDailyCount.count)).scalar() == 3
+
+
+def test_publisher_views_endpoint(app, client):
+    first, _ = _seed(app)
+    with app.app_context():
+        from models import PublisherUser
+        pub_id = Publisher.query.one().id
+        db.session.add(PublisherUser(email="desk@example.com", publisher_id=pub_id))
+        db.session.add(Event(event_name="article_view", article_id=first, publisher_id=pub_id))
+        db.session.commit()
+        rollup_events()
+    with client.session_transaction() as sess:
+        sess["publisher_user"] = "desk@example.com"
+        sess["publisher_id"] = pub_id
+
+    rv = client.get("/api/publisher/console/views?days=7")
+    assert rv.status_code == 200
+    assert rv.get_json()["series"][-1]["count"] == 1
+    assert client.get(f"/api/publisher/console/views?article_id={first}").get_json()["series"][-1]["count"] == 1
+    assert client.get("/api/publisher/console/views?article_id=999").status_code == 404
+
+
+def test_rollup_waits_for_events_to_settle(app):
+    app.config["EVENT_ROLLUP_SETTLE_SECONDS"] = 60
+    now = datetime.utcnow()
+    with app.app_context():
+        db.session.add_all([
+            Event(event_name="article_view", created_at=now - timedelta(minutes=5)),
+            Event(event_name="article_view", created_at=now),  # a lower id may still be in flight
+            Event(event_name="article_view", created_at=now - timedelta(minutes=5)),
+        ])
+        db.session.commit()
+        assert rollup_events() == 1
+        assert _watermark().last_id == Event.query.order_by(Event.id).first().id
+
+        app.config["EVENT_ROLLUP_SETTLE_SECONDS"] = 0
+        assert rollup_events() == 2
@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta
+
+from extensions import db
+from models import Article, Entitlement, Publisher, Transaction, User
+from services import entitlements
+
+
+def _seed(app, n=2):
+    with app.app_context():
+        pub = Publisher(name="City Ledger", slug="city-ledger", default_price_cents=25)
+        db.session.add(pub)
+        db.session.flush()
+        ids = []
+        for i in range(n):
+            art = Article(publisher_id=pub.id, slug=f"story-{i}", title=f"Story {i}",
+                          body_html=f"<p>Body {i}</p>", price_cents=50)
+            db.session.add(art)
+            db.session.flush()
+            ids.append(art.id)
+        db.session.commit()
+        return ids
+
+
+def _login(client, email="reader@example.com"):
+    rv = client.post("/api/auth/login", json={"email": email})
+    assert rv.status_code == 200
+    return rv.get_json()["user"]["id"]
+
+
+def test_purchase_unlocks_without_cookie_list(app, client):
+    article_id, other_id = _seed(app)
+    _login(client)
+
+    rv = client.post("/api/pay", json={"article_id": article_id})
+    assert rv.status_code == 200
+
+    with client.session_transaction() as sess:
+        assert "unlocked_articles" not in sess
+        assert entitlements.SESSION_KEY in sess
+
+    assert client.get(f"/api/articles/{article_id}/entitlement").get_json()["unlocked"] is True
+    assert client.get(f"/api/articles/{other_id}/entitlement").get_json()["unlocked"] is False
+    assert client.get(f"/api/articles/{article_id}").get_json()["body_html"] == "<p>Body 0</p>"
+
+
+def test_entitlement_follows_user_across_sessions(app, client):
+    article_id, _ = _seed(app)
+    _login(client)
+    client.post("/api/pay", json={"article_id": article_id})
+
+    other_device = app.test_client()
+    _login(other_device)
+    assert other_device.get(f"/api/articles/{article_id}/entitlement").get_json()["unlocked"] is True
+
+
+def test_refund_revokes(app, client):
+    article_id, _ = _seed(app)
+    _login(client)
+    txn_id = client.post("/api/pay", json={"article_id": article_id}).get_json()["transaction_id"]
+    assert client.get(f"/api/articles/{article_id}/entitlement").get_json()["unlocked"] is True
+
+    rv = client.post("/api/refund", json={"transaction_id": txn_id})
+    assert rv.status_code == 200
+    assert client.get(f"/api/articles/{article_id}/entitlement").get_json()["unlocked"] is False
+    with app.app_context():
+        assert Entitlement.query.count() == 0
+
+
+def test_legacy_cookie_is_dropped_and_ignored(app, client):
+    article_id, _ = _seed(app)
+    _login(client)
+    with client.session_transaction() as sess:
+        sess["unlocked_articles"] = [str(article_id)]
+
+    assert client.get(f"/api/articles/{article_id}/entitlement").get_json()["unlocked"] is False
+    with client.session_transaction() as sess:
+        assert "unlocked_articles" not in sess
+
+
+def test_legacy_cookie_unlocks_are_migrated(app, client):
+    bought, refunded = _seed(app)
+    user_id = _login(client)
+    with app.app_context():
+        for aid, kind in [(bought, "debit"), (refunded, "debit"), (refunded, "refund")]:
+            db.session.add(Transaction(user_id=user_id, article_id=aid, publisher_id=1,
+                                       price_cents=50, fee_cents=0, net_cents=50, type=kind))
+        db.session.commit()
+    with client.session_transaction() as sess:
+        sess["unlocked_articles"] = [str(bought), str(refunded)]
+
+    assert client.get(f"/api/articles/{refunded}/entitlement").get_json()["unlocked"] is False
+    assert client.get(f"/api/articles/{bought}/entitlement").get_json()["unlocked"] is True
+    with app.app_context():
+        assert [e.article_id for e in Entitlement.query.filter_by(user_id=user_id)] == [bought]
+    with client.session_transaction() as sess:
+        assert "unlocked_articles" not in sess
+
+
+def test_expired_entitlement_is_locked(app, client):
+    app.config["ENTITLEMENT_DAYS"] = 1
+    article_id, _ = _seed(app)
+    user_id = _login(client)
+    client.post("/api/pay", json={"article_id": article_id})
+
+    with app.app_context():
+        row = Entitlement.query.filter_by(user_id=user_id, article_id=article_id).one()
+        assert row.expires_at is not None
+        row.expires_at = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+    entitlements.clear()
+
+    assert client.get(f"/api/articles/{article_id}/entitlement").get_json()["unlocked"] is False
+
+
+def test_backfill_skips_refunded_purchases(app):
+    kept, refunded = _seed(app)
+    with app.app_context():
+        user = User(email="old@example.com")
+        db.session.add(user)
+        db.session.flush()
+        for aid, kind in [(kept, "debit"), (refunded, "debit"), (refunded, "refund")]:
+            db.session.add(Transaction(user_id=user.id, article_id=aid, publisher_id=1,
+                                       price_cents=50, fee_cents=0, net_cents=50, type=kind))
+        db.session.commit()
+
+        assert entitlements.backfill(batch_size=1) == 1
+        assert entitlements.backfill() == 0
+        assert [e.article_id for e in Entitlement.query.filter_by(user_id=user.id)] == [kept]
@@ -0,0 +1,54 @@
+import json
+
+from extensions import db
+from models import Event, UserAgent
+from services.analytics import daily_series, rollup_events
+from services.event_encoding import EVENT_CODES, OTHER, compact_events, decode, write_events
+
+
+def _row(name="article_view", **meta):
+    return {"event_name": name, "article_id": 7, "publisher_id": 1, "metadata": meta}
+
+
+def test_round_trip_and_user_agent_dictionary(app):
+    ua = "Mozilla/5.0 (X11; Linux x86_64)"
+    with app.app_context():
+        write_events([_row(ip="203.0.113.9", user_agent=ua, price_cents=25, ref="home") for _ in range(3)])
+        write_events([_row("pay", ip="2001:db8::1", user_agent=ua)])
+        db.session.commit()
+
+        assert UserAgent.query.count() == 1
+        evt = Event.query.order_by(Event.id).first()
+        assert evt.name_id == EVENT_CODES["article_view"] and evt.event_name is None
+        assert len(evt.ip) == 4 and evt.price_cents == 25
+        assert json.loads(evt.extra_json) == {"ref": "home"}
+        assert decode(evt)["metadata"] == {"ip": "203.0.113.9", "user_agent": ua, "price_cents": 25, "ref": "home"}
+        assert decode(Event.query.order_by(Event.id.desc()).first())["metadata"]["ip"] == "2001:db8::1"
+
+
+def test_unregistered_name_is_kept(app):
+    with app.app_context():
+        write_events([_row("share_click", user_agent=None)])
+        db.session.commit()
+        evt = Event.query.one()
+        assert evt.name_id == OTHER and evt.user_agent_id is None
+        assert decode(evt)["name"] == "share_click"
+        rollup_events()
+        assert daily_series("share_click", days=1)[0]["count"] == 1
+
+
+def test_compact_rewrites_old_rows(app):
+    with app.app_context():
+        meta = json.dumps({"ip": "198.51.100.4", "user_agent": "curl/8", "price_cents": 50})
+        db.session.add_all([Event(event_name="pay", article_id=3, metadata_json=meta) for _ in range(3)])
+        db.session.add(Event(event_name="article_view", metadata_json="not json"))
+        db.session.commit()
+
+        assert compact_events(batch_size=2) == 4
+        assert Event.query.filter(Event.name_id.is_(None)).count() == 0
+        assert UserAgent.query.count() == 1
+        evt = Event.query.filter_by(name_id=EVENT_CODES["pay"]).first()
+        assert evt.metadata_json is None
+        assert decode(evt)["metadata"] == {"ip": "198.51.100.4", "user_agent": "curl/8", "price_cents": 50}
+        odd = Event.query.filter_by(name_id=EVENT_CODES["article_view"]).one()
+        assert json.loads(odd.extra_json) == {"raw_metadata": "not json"}
@@ -0,0 +1,57 @@
+import pytest
+
+from extensions import db
+from models import Article, Event, Publisher
+from services.analytics import daily_series, rollup_events
+from services.event_encoding import EVENT_CODES
+from services.event_policy import EventPolicy, load_policies
+from services.events import track_event
+
+
+def _article(app):
+    with app.app_context():
+        pub = Publisher(name="City Ledger", slug="city-ledger")
+        db.session.add(pub)
+        db.session.flush()
+        art = Article(publisher_id=pub.id, slug="story", title="Story", body_html="<p>x</p>")
+        db.session.add(art)
+        db.session.commit()
+        return art.id
+
+
+def test_reloads_within_window_are_recorded_once(app, client):
+    article_id = _article(app)
+    for _ in range(5):
+        assert client.get(f"/api/articles/{article_id}/entitlement").status_code == 200
+    client.get(f"/api/articles/{article_id}/entitlement", headers={"User-Agent": "other-browser"})
+
+    with app.app_context():
+        assert Event.query.filter_by(name_id=EVENT_CODES["article_view"]).count() == 2
+    stats = app.extensions["event_policy"].stats()
+    assert (stats["kept"], stats["deduped"]) == (2, 4)
+
+
+def test_money_events_always_kept():
+    policy = EventPolicy(load_policies({"pay": {"dedup_seconds": 600, "sample": 0.01}}))
+    assert [policy.admit("pay", "u1", 1) for _ in range(20)] == [1.0] * 20
+
+
+def test_sampled_events_are_weighted_in_rollups(app):
+    app.extensions["event_policy"] = EventPolicy(load_policies({"newsstand_view": {"dedup_seconds": 0, "sample": 0.25}}))
+    for i in range(400):
+        with app.test_request_context("/", headers={"User-Agent": f"ua-{i}"}):
+            track_event("newsstand_view")
+
+    with app.app_context():
+        stored = Event.query.count()
+        assert 40 < stored < 160
+        rollup_events()
+        assert daily_series("newsstand_view", days=1)[0]["count"] == stored * 4
+
+
+def test_invalid_policy_rejected():
+    with pytest.raises(ValueError):
+        load_policies('{"article_view": {"sample": 0}}')
+    with pytest.raises(ValueError):
+        load_policies({"article_view": {"sample": 0.3}})  # would count each kept row as 3
+    assert load_policies({"article_view": {"sample": 0.1}})["article_view"]["sample"] == 0.1
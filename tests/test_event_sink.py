@@ -0,0 +1,59 @@
+from extensions import db
+from models import Article, Event, Publisher
+from services.event_encoding import EVENT_CODES
+from services.event_sink import EventSink
+
+
+def _row():
+    return {"event_name": "article_view", "article_id": None, "metadata": {"user_agent": "pytest"}}
+
+
+def test_sink_writes_in_batches(app):
+    sink = EventSink(app, batch_size=500, flush_seconds=0.05)
+    try:
+        for _ in range(1200):
+            assert sink.put(_row())
+        sink.flush()
+    finally:
+        sink.close()
+
+    stats = sink.stats()
+    assert stats["written"] == 1200 and stats["queued"] == 0
+    assert stats["batches"] >= 3
+    with app.app_context():
+        assert Event.query.count() == 1200
+
+
+def test_full_queue_drops_and_counts(app, monkeypatch):
+    sink = EventSink(app, maxsize=2)
+    monkeypatch.setattr(sink, "_ensure_worker", lambda: None)
+    assert [sink.put(_row()) for _ in range(3)] == [True, True, False]
+    assert sink.stats()["dropped"] == 1
+
+    # Without a worker, flush drains inline
+    sink.flush()
+    with app.app_context():
+        assert Event.query.count() == 2
+
+
+def test_track_event_goes_through_sink(app, client):
+    with app.app_context():
+        pub = Publisher(name="City Ledger", slug="city-ledger")
+        db.session.add(pub)
+        db.session.flush()
+        art = Article(publisher_id=pub.id, slug="story", title="Story", body_html="<p>x</p>")
+        db.session.add(art)
+        db.session.commit()
+        article_id, publisher_id = art.id, pub.id
+
+    sink = app.extensions["event_sink"] = EventSink(app, flush_seconds=0.05)
+    try:
+        assert client.get(f"/api/articles/{article_id}/entitlement").status_code == 200
+        sink.flush()
+    finally:
+        sink.close()
+
+    assert sink.stats()["written"] == 1
+    with app.app_context():
+        evt = Event.query.one()
+        assert (evt.name_id, evt.article_id, evt.publisher_id) == (EVENT_CODES["article_view"], article_id, publisher_id)
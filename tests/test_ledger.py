@@ -0,0 +1,64 @@
+from datetime import datetime
+
+from extensions import db
+from models import Article, Publisher, User, WalletCheckpoint, WalletLedgerEntry
+from services.ledger import balance_as_of, rebuild_balance, reconcile_wallets
+from services.payments import purchase_articles
+
+
+def _seed(app):
+    with app.app_context():
+        pub = Publisher(name="City Ledger", slug="city-ledger", default_price_cents=25)
+        db.session.add(pub)
+        db.session.flush()
+        art = Article(publisher_id=pub.id, slug="story", title="Story", body_html="<p>Body</p>", price_cents=75)
+        db.session.add(art)
+        db.session.commit()
+        return art.id
+
+
+def test_ledger_tracks_wallet_and_reconciles(app, client):
+    article_id = _seed(app)
+    user_id = client.post("/api/auth/login", json={"email": "reader@example.com"}).get_json()["user"]["id"]
+    txn_id = client.post("/api/pay", json={"article_id": article_id}).get_json()["transaction_id"]
+    client.post("/api/refund", json={"transaction_id": txn_id})
+    client.post("/api/pay", json={"article_id": article_id})
+
+    with app.app_context():
+        kinds = [e.kind for e in WalletLedgerEntry.query.filter_by(user_id=user_id).order_by(WalletLedgerEntry.id)]
+        assert kinds == ["signup", "debit", "refund", "debit"]
+        assert balance_as_of(user_id, datetime.utcnow()) == 425
+        assert rebuild_balance(user_id) == 425
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=["wallet", "reconcile"])
+    assert result.exit_code == 0, result.output
+    assert "mismatches=0" in result.output
+
+    with app.app_context():
+        assert WalletCheckpoint.query.filter_by(user_id=user_id).one().balance_cents == 425
+        assert rebuild_balance(user_id) == 425
+        User.query.get(user_id).wallet_cents = 9999  # out-of-band change
+        db.session.commit()
+
+    result = runner.invoke(args=["wallet", "reconcile"])
+    assert result.exit_code == 1
+    assert f"MISMATCH user={user_id}" in result.output
+
+
+def test_batch_purchase_opens_legacy_wallet_at_prior_balance(app):
+    article_id = _seed(app)
+    with app.app_context():
+        user = User(email="legacy@example.com", wallet_cents=500)  # predates the ledger
+        db.session.add(user)
+        db.session.commit()
+        first = Article.query.get(article_id)
+        second = Article(publisher_id=first.publisher_id, slug="part-2", title="Part 2", body_html="<p>2</p>")
+        db.session.add(second)
+        db.session.commit()
+        assert purchase_articles(user.id, [(first, 100), (second, 100)]) is not None
+
+        entries = WalletLedgerEntry.query.filter_by(user_id=user.id).order_by(WalletLedgerEntry.id).all()
+        assert [(e.kind, e.balance_after_cents) for e in entries] == [("opening", 500), ("debit", 400), ("debit", 300)]
+        report = reconcile_wallets()
+        assert report.mismatches == []
@@ -0,0 +1,128 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import InvalidRequestError
+
+from extensions import db
+from models import Article, Publisher
+from services.listings import listing_query
+from services.response_cache import catalog_changed
+
+
+def _seed(app):
+    with app.app_context():
+        pub = Publisher(name="Listing Post", slug="listing-post", default_price_cents=30)
+        db.session.add(pub)
+        db.session.flush()
+        db.session.add(Article(publisher_id=pub.id, slug="long-read", title="Long Read",
+                               body_html="<p>" + "x" * 5000 + "</p>", body_preview="<p>x</p>"))
+        db.session.commit()
+
+
+def test_article_listing_skips_body_columns(app, client):
+    _seed(app)
+    statements = []
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", listener)
+    try:
+        rv = client.get("/api/articles")
+    finally:
+        with app.app_context():
+            event.remove(db.engine, "before_cursor_execute", listener)
+
+    assert rv.get_json()["items"][0]["price_cents"] == 30
+    assert any("FROM articles" in sql for sql in statements)
+    assert not any("body_html" in sql or "body_preview" in sql for sql in statements)
+
+    with app.app_context():
+        article = listing_query().first()
+        with pytest.raises(InvalidRequestError):
+            article.body_html
+
+
+LIST_ENDPOINTS = [
+    "/api/articles?limit=100",
+    "/api/articles?featured=true",
+    "/api/author/profile/{author_id}",
+    "/api/author/content",
+    "/api/publisher/available-content",
+    "/api/account/transactions",
+    "/api/admin/users/{user_id}",
+    "/showcase/pages/content",
+]
+
+
+def _add_rows(app, user_id, author_id, count, start):
+    """One article per publisher, each bought by the user: worst case for lazy loads."""
+    from models import Transaction
+
+    with app.app_context():
+        for i in range(start, start + count):
+            pub = Publisher(name=f"Pub {i}", slug=f"pub-{i}", default_price_cents=25)
+            db.session.add(pub)
+            db.session.flush()
+            art = Article(publisher_id=pub.id, author_id=author_id, slug=f"a-{i}", title=f"A {i}",
+                          body_html="<p>x</p>", price_cents=25, license_type="independent")
+            db.session.add(art)
+            db.session.flush()
+            db.session.add(Transaction(user_id=user_id, article_id=art.id, publisher_id=pub.id,
+                                       price_cents=25, fee_cents=3, net_cents=22, type="debit"))
+        db.session.commit()
+        catalog_changed()  # direct writes bypass the endpoints that invalidate
+
+
+def _query_count(app, client, url):
+    statements = []
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", listener)
+    try:
+        assert client.get(url).status_code == 200
+    finally:
+        with app.app_context():
+            event.remove(db.engine, "before_cursor_execute", listener)
+    return len(statements)
+
+
+@pytest.mark.parametrize("endpoint", LIST_ENDPOINTS)
+def test_list_endpoint_query_count_is_constant(app, client, endpoint):
+    from models import AuthorProfile, ShowcaseSite
+
+    user_id = client.post("/api/auth/login", json={"email": "writer@example.com"}).get_json()["user"]["id"]
+    with app.app_context():
+        author = AuthorProfile(user_id=user_id, display_name="Writer", accepts_publisher_requests=True)
+        db.session.add(author)
+        db.session.flush()
+        db.session.add(ShowcaseSite(slug="pages", name="Pages", owner_type="author", owner_id=author.id))
+        db.session.commit()
+        author_id = author.id
+    with client.session_transaction() as sess:
+        sess["is_admin"] = True
+    url = endpoint.format(author_id=author_id, user_id=user_id)
+
+    _add_rows(app, user_id, author_id, 2, start=0)
+    small = _query_count(app, client, url)
+    _add_rows(app, user_id, author_id, 6, start=2)
+    assert _query_count(app, client, url) == small
+
+
+def test_cursor_pagination_walks_every_row_once(app, client):
+    with app.app_context():
+        for i in range(7):
+            db.session.add(Publisher(name="Same Name" if i < 4 else f"Pub {i}", slug=f"cursor-{i}"))
+        db.session.commit()
+
+    seen, cursor = [], None
+    while True:
+        url = "/api/publishers?limit=3" + (f"&cursor={cursor}" if cursor else "")
+        data = client.get(url).get_json()
+        seen.extend(p["slug"] for p in data["items"])
+        cursor = data["next_cursor"]
+        if not cursor:
+            break
+    assert sorted(seen) == sorted(f"cursor-{i}" for i in range(7))
+    assert len(seen) == 7
+
+    legacy = client.get("/api/publishers?offset=3&limit=3").get_json()
+    assert [p["slug"] for p in legacy["items"]] == seen[3:6]
+    assert client.get("/api/publishers?cursor=not-a-cursor").status_code == 400
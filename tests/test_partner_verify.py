@@ -0,0 +1,96 @@
+from sqlalchemy import event
+
+from extensions import db
+from models import Publisher, PublisherUser
+from services.tokens import issue_jwt, revoke_token
+
+
+def _publisher_client(app, client, slug="city-ledger"):
+    with app.app_context():
+        pub = Publisher(name=slug.title(), slug=slug, default_price_cents=25)
+        db.session.add(pub)
+        db.session.flush()
+        db.session.add(PublisherUser(email=f"desk@{slug}.example", publisher_id=pub.id))
+        db.session.commit()
+        pub_id = pub.id
+    with client.session_transaction() as sess:
+        sess["publisher_user"] = f"desk@{slug}.example"
+        sess["publisher_id"] = pub_id
+    return pub_id
+
+
+def _create_key(client):
+    rv = client.post("/api/publisher/api-keys", json={"label": "render servers"})
+    assert rv.status_code == 201
+    return rv.get_json()["api_key"]
+
+
+def test_batch_verify(app, client):
+    pub_id = _publisher_client(app, client)
+    api_key = _create_key(client)
+    with app.app_context():
+        good = [issue_jwt(user, 100 + user, pub_id) for user in range(5)]
+        revoked = issue_jwt(9, 200, pub_id)
+        revoke_token(revoked)
+        foreign = issue_jwt(1, 300, pub_id + 1)
+
+    items = [{"token": t, "article_id": 100 + i} for i, t in enumerate(good)]
+    items += [
+        {"token": good[0], "article_id": 999},  # wrong article
+        {"token": revoked, "article_id": 200},
+        {"token": foreign, "article_id": 300},
+        {"token": "not-a-jwt", "article_id": 1},
+    ]
+
+    statements = []
+
+    def _listener(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", _listener)
+    try:
+        rv = app.test_client().post("/api/partner/verify", json={"items": items},
+                                    headers={"Authorization": f"Bearer {api_key}"})
+    finally:
+        event.remove(engine, "before_cursor_execute", _listener)
+
+    assert rv.status_code == 200
+    assert [r["valid"] for r in rv.get_json()["results"]] == [True] * 5 + [False] * 4
+    assert sum("revoked_tokens" in s for s in statements) == 1
+    assert sum(s.startswith("UPDATE publisher_api_keys") for s in statements) == 1
+
+    # A repeat call within a minute does not write last_used_at again
+    statements.clear()
+    event.listen(engine, "before_cursor_execute", _listener)
+    try:
+        rv = app.test_client().post("/api/partner/verify", json={"items": items[:1]},
+                                    headers={"Authorization": f"Bearer {api_key}"})
+    finally:
+        event.remove(engine, "before_cursor_execute", _listener)
+    assert rv.status_code == 200
+    assert not any(s.startswith("UPDATE") for s in statements)
+
+
+def test_batch_verify_requires_active_key(app, client):
+    _publisher_client(app, client)
+    api_key = _create_key(client)
+    body = {"items": [{"token": "x", "article_id": 1}]}
+
+    assert client.post("/api/partner/verify", json=body).status_code == 401
+    assert client.post("/api/partner/verify", json=body,
+                       headers={"X-Api-Key": api_key + "x"}).status_code == 401
+    assert client.post("/api/partner/verify", json=body, headers={"X-Api-Key": api_key}).status_code == 200
+
+    key_id = client.get("/api/publisher/api-keys").get_json()["keys"][0]["id"]
+    assert client.delete(f"/api/publisher/api-keys/{key_id}").status_code == 200
+    assert client.post("/api/partner/verify", json=body, headers={"X-Api-Key": api_key}).status_code == 401
+
+
+def test_batch_verify_limits_size(app, client):
+    _publisher_client(app, client)
+    api_key = _create_key(client)
+    items = [{"token": "x", "article_id": i} for i in range(501)]
+    rv = client.post("/api/partner/verify", json={"items": items}, headers={"X-Api-Key": api_key})
+    assert rv.status_code == 400
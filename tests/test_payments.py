@@ -0,0 +1,176 @@
+import pytest
+from sqlalchemy import event
+
+from extensions import db
+from models import Article, AuthorEarnings, AuthorProfile, Event, Publisher, SpendBucket, Transaction, User
+from services.event_encoding import EVENT_CODES
+from services.event_sink import EventSink
+from services.payments import purchase_article
+from services.spend import spent_in_window
+
+
+def _seed_article(app, price_cents=50):
+    with app.app_context():
+        owner = User(email="author@example.com", wallet_cents=0)
+        pub = Publisher(name="City Ledger", slug="city-ledger", default_price_cents=25)
+        db.session.add_all([owner, pub])
+        db.session.flush()
+        author = AuthorProfile(user_id=owner.id, display_name="A. Writer")
+        db.session.add(author)
+        db.session.flush()
+        art = Article(
+            publisher_id=pub.id,
+            author_id=author.id,
+            slug="story",
+            title="Story",
+            body_html="<p>Body</p>",
+            price_cents=price_cents,
+            license_type="revenue_share",
+        )
+        db.session.add(art)
+        db.session.commit()
+        return art.id
+
+
+def _login(client, email="reader@example.com"):
+    rv = client.post("/api/auth/login", json={"email": email})
+    assert rv.status_code == 200
+    return rv.get_json()["user"]["id"]
+
+
+def test_pay_commits_once(app, client):
+    article_id = _seed_article(app)
+    user_id = _login(client)
+    # As in production, the pay event is queued for the sink after the payment commits
+    sink = app.extensions["event_sink"] = EventSink(app, flush_seconds=0.05)
+
+    commits = []
+
+    def _count(session):
+        commits.append(session)
+
+    event.listen(db.session, "after_commit", _count)
+    try:
+        rv = client.post("/api/pay", json={"article_id": article_id})
+    finally:
+        event.remove(db.session, "after_commit", _count)
+
+    assert rv.status_code == 200
+    body = rv.get_json()
+    assert body["balance_cents"] == 450
+    assert len(commits) == 1
+    sink.close()
+
+    with app.app_context():
+        txn = Transaction.query.get(body["transaction_id"])
+        assert txn.user_id == user_id
+        assert AuthorEarnings.query.filter_by(transaction_id=txn.id).count() == 1
+        assert Event.query.filter_by(name_id=EVENT_CODES["pay"], article_id=article_id).count() == 1
+
+
+def test_purchase_rolls_back_when_balance_insufficient(app, client):
+    article_id = _seed_article(app, price_cents=600)
+    user_id = _login(client)
+
+    with app.test_request_context():
+        article = Article.query.get(article_id)
+        assert purchase_article(user_id, article, 600) is None
+        assert User.query.get(user_id).wallet_cents == 500
+        assert Transaction.query.count() == 0
+        assert Event.query.filter_by(name_id=EVENT_CODES["pay"]).count() == 0
+
+
+def test_pay_event_failure_does_not_fail_purchase(app, client, monkeypatch):
+    article_id = _seed_article(app)
+    user_id = _login(client)
+
+    def _fail(rows):
+        raise RuntimeError("analytics down")
+
+    monkeypatch.setattr("services.events.write_events", _fail)
+    with app.test_request_context():
+        article = Article.query.get(article_id)
+        assert purchase_article(user_id, article, 50) is not None
+        assert User.query.get(user_id).wallet_cents == 450
+        assert Transaction.query.count() == 1
+        assert Event.query.count() == 0
+
+
+def test_spend_buckets_track_pay_and_refund(app, client):
+    article_id = _seed_article(app)
+    user_id = _login(client)
+
+    rv = client.post("/api/pay", json={"article_id": article_id})
+    txn_id = rv.get_json()["transaction_id"]
+    with app.app_context():
+        assert spent_in_window(user_id) == 50
+
+    rv = client.post("/api/refund", json={"transaction_id": txn_id})
+    assert rv.status_code == 200
+    with app.app_context():
+        assert spent_in_window(user_id) == 0
+        assert SpendBucket.query.filter_by(user_id=user_id).count() == 1
+
+
+def test_pay_batch_all_or_nothing(app, client):
+    first = _seed_article(app, price_cents=200)
+    with app.app_context():
+        pub_id = Article.query.get(first).publisher_id
+        second = Article(publisher_id=pub_id, slug="part-2", title="Part 2", body_html="<p>2</p>", price_cents=400)
+        db.session.add(second)
+        db.session.commit()
+        second = second.id
+    user_id = _login(client)
+
+    rv = client.post("/api/pay/batch", json={"article_ids": [first, second]})
+    assert rv.status_code == 402
+    with app.app_context():
+        assert User.query.get(user_id).wallet_cents == 500
+        assert Transaction.query.count() == 0
+
+    with app.app_context():
+        Article.query.get(second).price_cents = 100
+        db.session.commit()
+    rv = client.post("/api/pay/batch", json={"article_ids": [first, second]})
+    assert rv.status_code == 200
+    body = rv.get_json()
+    assert body["balance_cents"] == 200
+    assert [i["article_id"] for i in body["items"]] == [first, second]
+    assert all(i["access_token"] for i in body["items"])
+
+
+def test_pay_retry_with_idempotency_key_replays(app, client):
+    article_id = _seed_article(app)
+    _login(client)
+    headers = {"Idempotency-Key": "retry-1"}
+
+    first = client.post("/api/pay", json={"article_id": article_id}, headers=headers)
+    second = client.post("/api/pay", json={"article_id": article_id}, headers=headers)
+    assert first.status_code == second.status_code == 200
+    assert second.headers.get("Idempotent-Replayed") == "true"
+    assert first.get_json()["transaction_id"] == second.get_json()["transaction_id"]
+
+    other = client.post("/api/pay", json={"article_id": article_id + 1}, headers=headers)
+    assert other.status_code == 422
+
+    with app.app_context():
+        assert Transaction.query.count() == 1
+
+
+def test_pay_failing_after_commit_is_not_charged_again(app, client, monkeypatch):
+    article_id = _seed_article(app)
+    user_id = _login(client)
+    headers = {"Idempotency-Key": "retry-2"}
+
+    def _broken(*args, **kwargs):
+        raise RuntimeError("signing unavailable")
+
+    monkeypatch.setattr("blueprints.api.issue_jwt", _broken)
+    with pytest.raises(RuntimeError):
+        client.post("/api/pay", json={"article_id": article_id}, headers=headers)
+
+    retry = client.post("/api/pay", json={"article_id": article_id}, headers=headers)
+    assert retry.status_code == 500 and retry.headers.get("Idempotent-Replayed") == "true"
+    with app.app_context():
+        assert Transaction.query.count() == 1
+        assert User.query.get(user_id).wallet_cents == 450
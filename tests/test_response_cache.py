@@ -0,0 +1,87 @@
+from extensions import db
+from models import AuthorProfile, Publisher
+
+
+def test_catalog_responses_cached_until_a_write(app, client):
+    with app.app_context():
+        db.session.add(Publisher(name="Cached Courier", slug="cached-courier", category="Local"))
+        db.session.commit()
+
+    first = client.get("/api/publishers?limit=5&q=")
+    assert first.headers["X-Cache"] == "MISS"
+    again = client.get("/api/publishers?q=&limit=5")  # same args, different order
+    assert again.headers["X-Cache"] == "HIT"
+    assert again.get_json() == first.get_json()
+    assert client.get("/api/articles").headers.get("X-Cache") is None  # only featured is cached
+
+    # A write through the author endpoints bumps the catalog version
+    user_id = client.post("/api/auth/login", json={"email": "writer@example.com"}).get_json()["user"]["id"]
+    with app.app_context():
+        db.session.add(AuthorProfile(user_id=user_id, display_name="Writer"))
+        db.session.commit()
+    client.post("/api/author/content/submit", json={"title": "Fresh", "body_html": "<p>x</p>"})
+    assert client.get("/api/publishers?limit=5").headers["X-Cache"] == "MISS"
+
+    with client.session_transaction() as sess:
+        sess["is_admin"] = True
+    stats = client.get("/api/admin/cache/stats").get_json()["response_cache"]
+    assert stats["hits"] == 1 and stats["misses"] == 2 and stats["version"] == 1
+
+
+def test_article_and_publisher_conditional_get(app, client):
+    from models import Article
+
+    with app.app_context():
+        pub = Publisher(name="Etag Times", slug="etag-times")
+        db.session.add(pub)
+        db.session.flush()
+        art = Article(publisher_id=pub.id, slug="story", title="Story", body_html="<p>x</p>", price_cents=25)
+        db.session.add(art)
+        db.session.commit()
+        article_id = art.id
+
+    first = client.get(f"/api/articles/{article_id}")
+    etag = first.headers["ETag"]
+    assert client.get(f"/api/articles/{article_id}", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(f"/api/articles/{article_id}",
+                      headers={"If-Modified-Since": first.headers["Last-Modified"]}).status_code == 304
+
+    # Unlocking changes the representation, so the old ETag no longer matches
+    client.post("/api/auth/login", json={"email": "reader@example.com"})
+    client.post("/api/pay", json={"article_id": article_id})
+    unlocked = client.get(f"/api/articles/{article_id}", headers={"If-None-Match": etag})
+    assert unlocked.status_code == 200 and unlocked.get_json()["unlocked"] is True
+
+    pub_etag = client.get("/api/publishers/etag-times").headers["ETag"]
+    cached = client.get("/api/publishers/etag-times", headers={"If-None-Match": pub_etag})
+    assert cached.status_code == 304 and cached.headers["X-Cache"] == "HIT"
+
+
+def test_public_article_document_and_entitlement(app, client):
+    from models import Article
+
+    with app.app_context():
+        pub = Publisher(name="Split Post", slug="split-post", default_price_cents=40)
+        db.session.add(pub)
+        db.session.flush()
+        art = Article(publisher_id=pub.id, slug="story", title="Story", body_html="<p>Full</p>",
+                      body_preview="<p>Teaser</p>")
+        db.session.add(art)
+        db.session.commit()
+        article_id = art.id
+
+    public = client.get(f"/api/articles/{article_id}/public")
+    assert public.headers["Cache-Control"].startswith("public")
+    assert public.get_json()["price_cents"] == 40
+    assert "body_html" not in public.get_json() and "unlocked" not in public.get_json()
+    assert client.get(f"/api/articles/{article_id}/public").headers["X-Cache"] == "HIT"
+
+    locked = client.get(f"/api/articles/{article_id}/entitlement")
+    assert locked.get_json() == {"article_id": article_id, "unlocked": False}
+    assert "no-store" in locked.headers["Cache-Control"]
+
+    client.post("/api/auth/login", json={"email": "reader@example.com"})
+    client.post("/api/pay", json={"article_id": article_id})
+    entitled = client.get(f"/api/articles/{article_id}/entitlement").get_json()
+    assert entitled["unlocked"] is True and entitled["body_html"] == "<p>Full</p>"
+    assert client.get("/api/articles/999/entitlement").status_code == 404
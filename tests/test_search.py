@@ -0,0 +1,69 @@
+from extensions import db
+from models import Article, AuthorProfile, Publisher, SearchDocument
+from services.search import rebuild_index
+
+
+def _seed(app):
+    with app.app_context():
+        pub = Publisher(name="Harbor Ledger", slug="harbor-ledger", strapline="Tides and trade",
+                        default_price_cents=30, category="Local")
+        other = Publisher(name="Mountain Gazette", slug="mountain-gazette", category="Sports")
+        db.session.add_all([pub, other])
+        db.session.flush()
+        db.session.add_all([
+            Article(publisher_id=pub.id, slug="ferry", title="Ferry schedule changes",
+                    body_html="<p>The harbor ferry moves to hourly service.</p>", price_cents=50),
+            Article(publisher_id=other.id, slug="race", title="Trail race results",
+                    body_html="<p>Runners crossed the harbor bridge.</p>", price_cents=10),
+            Article(publisher_id=pub.id, slug="draft", title="Harbor draft", body_html="<p>x</p>",
+                    status="draft"),
+        ])
+        db.session.commit()
+        rebuild_index()
+
+
+def test_search_ranks_and_filters(app, client):
+    _seed(app)
+    data = client.get("/api/search?q=harbor").get_json()
+    titles = [i.get("title") or i.get("name") for i in data["items"]]
+    assert "Harbor draft" not in titles
+    assert set(titles) == {"Harbor Ledger", "Ferry schedule changes", "Trail race results"}
+    assert data["items"][0]["score"] >= data["items"][-1]["score"]
+
+    data = client.get("/api/search?q=harbor&type=article&category=Local").get_json()
+    assert [i["slug"] for i in data["items"]] == ["ferry"]
+    data = client.get("/api/search?q=harbor&type=article&max_price=20").get_json()
+    assert [i["slug"] for i in data["items"]] == ["race"]
+
+    page = client.get("/api/search?q=harbor&limit=2").get_json()
+    assert len(page["items"]) == 2 and page["next_offset"] == 2
+
+    # Publisher name search uses the index; the last word matches as a prefix
+    assert [p["slug"] for p in client.get("/api/publishers?q=harb").get_json()["items"]] == ["harbor-ledger"]
+
+
+def test_author_edits_keep_index_in_sync(app, client):
+    user_id = client.post("/api/auth/login", json={"email": "writer@example.com"}).get_json()["user"]["id"]
+    with app.app_context():
+        db.session.add(AuthorProfile(user_id=user_id, display_name="Writer"))
+        db.session.commit()
+
+    article_id = client.post("/api/author/content/submit", json={
+        "title": "Lighthouse keepers", "body_html": "<p>Night shifts on the point.</p>",
+    }).get_json()["article"]["id"]
+    assert [i["id"] for i in client.get("/api/search?q=lighthouse").get_json()["items"]] == [article_id]
+
+    client.put(f"/api/author/content/{article_id}", json={"title": "Fog signals"})
+    assert client.get("/api/search?q=lighthouse").get_json()["items"] == []
+    assert [i["id"] for i in client.get("/api/search?q=fog").get_json()["items"]] == [article_id]
+
+
+def test_startup_indexes_existing_rows(app, client):
+    from services.search import ensure_schema
+
+    with app.app_context():
+        db.session.add(Publisher(name="Prairie Post", slug="prairie-post"))  # written without indexing
+        db.session.commit()
+        assert SearchDocument.query.count() == 0
+        ensure_schema(app)  # as on the next start
+    assert [p["slug"] for p in client.get("/api/publishers?q=prairie").get_json()["items"]] == ["prairie-post"]
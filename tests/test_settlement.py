@@ -0,0 +1,108 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from extensions import db
+from models import Article, AuthorProfile, PayoutLine, PayoutStatement, Publisher, Transaction, User
+from services.settlement import high_water_mark, run_settlement, settled_totals
+
+
+def _seed(app):
+    with app.app_context():
+        writer = User(email="writer@example.com")
+        pub = Publisher(name="Settle Times", slug="settle-times", default_price_cents=25)
+        db.session.add_all([writer, pub])
+        db.session.flush()
+        author = AuthorProfile(user_id=writer.id, display_name="Writer")
+        db.session.add(author)
+        db.session.flush()
+        art = Article(publisher_id=pub.id, author_id=author.id, slug="story", title="Story",
+                      body_html="<p>Body</p>", price_cents=100, license_type="revenue_share")
+        db.session.add(art)
+        db.session.commit()
+        return pub.id, author.id, art.id
+
+
+def test_settlement_run_is_incremental_and_net_of_refunds(app, client):
+    pub_id, author_id, article_id = _seed(app)
+    client.post("/api/auth/login", json={"email": "reader@example.com"})
+    first = client.post("/api/pay", json={"article_id": article_id}).get_json()["transaction_id"]
+    client.post("/api/refund", json={"transaction_id": first})
+    second = client.post("/api/pay", json={"article_id": article_id}).get_json()["transaction_id"]
+
+    with app.app_context():
+        split = json.loads(Transaction.query.get(second).split_breakdown_json)
+        result = run_settlement()
+        assert result.transactions_processed == 3
+        assert high_water_mark() == result.to_transaction_id
+
+        author = settled_totals("author", author_id)
+        assert author.amount_cents == split["author"]  # refunded sale nets to zero
+        publisher = settled_totals("publisher", pub_id)
+        assert publisher.amount_cents == split["publisher"]
+        assert (publisher.transaction_count, publisher.gross_cents) == (3, 300)
+        assert settled_totals("platform", None).amount_cents == split["platform"]
+        assert PayoutLine.query.filter_by(transaction_id=first).count() == len(split)
+
+        # Nothing new: no run is recorded
+        assert run_settlement().run_id is None
+
+    client.post("/api/pay", json={"article_id": article_id})
+    with app.app_context():
+        assert run_settlement().transactions_processed == 1
+        assert PayoutStatement.query.filter_by(payee_type="publisher").count() == 2
+        assert settled_totals("author", author_id).amount_cents == 2 * split["author"]
+
+
+def test_dashboard_totals_do_not_move_when_a_run_settles(app, client):
+    from blueprints.api import _publisher_all_time_stats
+
+    _, _, article_id = _seed(app)
+    client.post("/api/auth/login", json={"email": "reader@example.com"})
+    first = client.post("/api/pay", json={"article_id": article_id}).get_json()["transaction_id"]
+    client.post("/api/refund", json={"transaction_id": first})
+    client.post("/api/pay", json={"article_id": article_id})
+
+    def totals():
+        with app.app_context():
+            stats = _publisher_all_time_stats(None)
+        client.post("/api/auth/login", json={"email": "writer@example.com"})
+        earnings = client.get("/api/author/earnings").get_json()["total_earnings_cents"]
+        return stats, earnings
+
+    before = totals()
+    with app.app_context():
+        assert run_settlement().transactions_processed == 3
+    assert totals() == before
+    assert before[0] == (3, 300)
+
+
+def test_overlapping_runs_settle_once(app, client, monkeypatch):
+    import services.settlement as settlement
+
+    _, _, article_id = _seed(app)
+    client.post("/api/auth/login", json={"email": "reader@example.com"})
+    client.post("/api/pay", json={"article_id": article_id})
+    with app.app_context():
+        assert run_settlement().transactions_processed == 1
+        # A second run that read the mark before the first committed
+        monkeypatch.setattr(settlement, "high_water_mark", lambda: 0)
+        with pytest.raises(settlement.SettlementConflict):
+            run_settlement()
+        assert PayoutLine.query.count() == len(json.loads(Transaction.query.one().split_breakdown_json))
+
+
+def test_run_stops_before_unsettled_transactions(app, client):
+    app.config["SETTLEMENT_SETTLE_SECONDS"] = 60
+    _, _, article_id = _seed(app)
+    client.post("/api/auth/login", json={"email": "reader@example.com"})
+    ids = [client.post("/api/pay", json={"article_id": article_id}).get_json()["transaction_id"] for _ in range(3)]
+    client.post("/api/refund", json={"transaction_id": ids[-1]})
+    with app.app_context():
+        old = datetime.utcnow() - timedelta(minutes=5)
+        for txn_id in (ids[0], ids[2]):
+            Transaction.query.get(txn_id).created_at = old
+        db.session.commit()
+        result = run_settlement()
+        assert (result.transactions_processed, result.to_transaction_id) == (1, ids[0])
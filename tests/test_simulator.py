@@ -0,0 +1,64 @@
+import random
+from datetime import datetime, timedelta
+
+from extensions import db
+from models import Article, Publisher, SplitRule, Transaction, User
+from services import simulator
+from services.splits import compile_plan, load_publisher_terms
+
+
+def _seed(app, n=200):
+    rng = random.Random(7)
+    with app.app_context():
+        user = User(email="reader@example.com", wallet_cents=0)
+        pubs = [Publisher(name=f"Pub {i}", slug=f"pub-{i}", default_author_split_bps=5000 + i * 500) for i in range(3)]
+        db.session.add_all([user, *pubs])
+        db.session.flush()
+        db.session.add(SplitRule(publisher_id=pubs[0].id, role="editor", percent_bps=1500))
+        articles = []
+        for i, lic in enumerate(["independent", "revenue_share", "buyout", "revenue_share"]):
+            pub = pubs[i % 3]
+            articles.append(Article(publisher_id=pub.id, slug=f"a{i}", title="A", body_html="x", license_type=lic,
+                                    custom_splits='{"author": 7000, "publisher": 3000}' if i == 3 else None))
+        db.session.add_all(articles)
+        db.session.flush()
+        for _ in range(n):
+            a = rng.choice(articles)
+            db.session.add(Transaction(user_id=user.id, article_id=a.id, publisher_id=a.publisher_id,
+                                       price_cents=rng.choice([10, 25, 39, 99, 101]), fee_cents=0, net_cents=0))
+        db.session.commit()
+
+
+def _scalar_totals(fee_bps, overrides=None):
+    """Reference: replay SplitPlan.apply one transaction at a time."""
+    totals = {}
+    for t in Transaction.query.all():
+        article = Article.query.get(t.article_id)
+        terms = load_publisher_terms(article.publisher_id)
+        if overrides and article.publisher_id in overrides:
+            terms = simulator._override_terms(terms, overrides[article.publisher_id])
+        for role, v in compile_plan(article, terms).apply(t.price_cents).items():
+            totals[role] = totals.get(role, 0) + v
+    return totals
+
+
+def test_simulation_matches_scalar_replay(app):
+    _seed(app)
+    window = (datetime.utcnow() - timedelta(days=1), datetime.utcnow() + timedelta(days=1))
+    overrides = {2: {"default_author_split_bps": 4000, "rules": [{"role": "partner", "percent_bps": 1000}]}}
+
+    with app.test_request_context():
+        for engine in (simulator.np, None):
+            simulator_np, simulator.np = simulator.np, engine
+            try:
+                result = simulator.simulate(*window, fee_bps=1250, publisher_overrides=overrides)
+            finally:
+                simulator.np = simulator_np
+            assert result["rows"] == 200
+            assert result["totals"]["current"] == _scalar_totals(1000)
+
+            app.config["PLATFORM_FEE_BPS"] = 1250
+            try:
+                assert result["totals"]["candidate"] == _scalar_totals(1250, overrides)
+            finally:
+                app.config["PLATFORM_FEE_BPS"] = 1000
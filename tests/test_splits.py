@@ -0,0 +1,52 @@
+from sqlalchemy import event
+
+from extensions import db
+from models import Article, Publisher, SplitRule
+from services.payments import apply_split_rules, calculate_article_split
+from services.splits import invalidate_publisher
+
+
+def _article(app, **kwargs):
+    with app.app_context():
+        pub = Publisher(name="Bay Arts", slug="bay-arts", default_price_cents=25, default_author_split_bps=5000)
+        db.session.add(pub)
+        db.session.flush()
+        art = Article(publisher_id=pub.id, slug="piece", title="Piece", body_html="<p>x</p>", **kwargs)
+        db.session.add(art)
+        db.session.commit()
+        return art.id, pub.id
+
+
+def test_plan_cached_without_queries(app):
+    article_id, _ = _article(app, license_type="revenue_share")
+    with app.app_context():
+        article = Article.query.get(article_id)
+        assert calculate_article_split(100, article) == {"platform": 10, "author": 45, "publisher": 45}
+
+        statements = []
+        listener = lambda *args: statements.append(args[2])  # noqa: E731
+        event.listen(db.engine, "before_cursor_execute", listener)
+        try:
+            assert calculate_article_split(100, article) == {"platform": 10, "author": 45, "publisher": 45}
+        finally:
+            event.remove(db.engine, "before_cursor_execute", listener)
+        assert statements == []
+
+
+def test_split_rules_carve_publisher_share(app):
+    article_id, pub_id = _article(app, license_type="buyout")
+    with app.app_context():
+        article = Article.query.get(article_id)
+        assert calculate_article_split(100, article) == {"platform": 10, "publisher": 90}
+
+        db.session.add(SplitRule(publisher_id=pub_id, role="editor", percent_bps=2000))
+        db.session.commit()
+        invalidate_publisher(pub_id)
+        assert calculate_article_split(100, article) == {"platform": 10, "publisher": 72, "editor": 18}
+
+
+def test_split_rules_never_pay_out_more_than_the_share():
+    assert apply_split_rules(25, {"editor": 5000, "writer": 5000}) == {"editor": 12, "writer": 12, "publisher": 1}
+    carved = apply_split_rules(7, {"a": 3333, "b": 3333, "c": 3334})
+    assert sum(carved.values()) == 7 and carved["publisher"] == 7 - 6
+    assert sum(apply_split_rules(99, {"a": 8000, "b": 8000}).values()) == 99
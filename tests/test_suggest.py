@@ -0,0 +1,77 @@
+import threading
+
+from sqlalchemy import event
+
+from extensions import db
+from models import Article, Publisher, Transaction, User
+from services.suggest import Suggestion, _Snapshot, get_index
+
+
+def test_suggest_prefix_ranked_by_popularity_without_queries(app, client):
+    with app.app_context():
+        reader = User(email="reader@example.com")
+        quiet = Publisher(name="New Haven Register", slug="nh-register")
+        busy = Publisher(name="New York Chronicle", slug="nyc")
+        db.session.add_all([reader, quiet, busy])
+        db.session.flush()
+        art = Article(publisher_id=busy.id, slug="a", title="A", body_html="<p>x</p>")
+        db.session.add(art)
+        db.session.flush()
+        db.session.add(Transaction(user_id=reader.id, article_id=art.id, publisher_id=busy.id,
+                                   price_cents=25, fee_cents=3, net_cents=22, type="debit"))
+        db.session.commit()
+        get_index().build()
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", listener)
+    try:
+        names = [s["name"] for s in client.get("/api/suggest?q=ne").get_json()["items"]]
+        assert names == ["New York Chronicle", "New Haven Register"]
+        # Later words and slugs match too
+        assert [s["slug"] for s in client.get("/api/suggest?q=chron").get_json()["items"]] == ["nyc"]
+        assert [s["slug"] for s in client.get("/api/suggest?q=nh-reg").get_json()["items"]] == ["nh-register"]
+    finally:
+        with app.app_context():
+            event.remove(db.engine, "before_cursor_execute", listener)
+    assert not any("publishers" in sql or "author_profiles" in sql for sql in statements)
+
+
+def test_author_registration_updates_index(app, client):
+    client.post("/api/auth/login", json={"email": "writer@example.com"})
+    client.post("/api/author/register", json={"display_name": "Zelda Quill"})
+    assert [s["name"] for s in client.get("/api/suggest?q=quil").get_json()["items"]] == ["Zelda Quill"]
+
+
+def test_patches_match_a_full_rebuild():
+    items = {("publisher", i): Suggestion("publisher", i, f"News {i}", f"news-{i}", i % 7) for i in range(40)}
+    snap = _Snapshot(items)
+    snap.remove(("publisher", 6))
+    snap.add(("publisher", 3), Suggestion("publisher", 3, "Nordic Wire", "nw", 50))
+    snap.add(("author", 1), Suggestion("author", 1, "Nell Page", None, 0))
+    fresh = _Snapshot(snap.items)
+    for prefix in ("n", "ne", "news 1", "nordic", "nw", "page", "x"):
+        assert snap.lookup(prefix, 10) == fresh.lookup(prefix, 10)
+
+
+def test_stale_index_rebuilt_by_one_caller(app, monkeypatch):
+    index = get_index(app)
+    builds = []
+    started, release = threading.Event(), threading.Event()
+
+    def slow_build():
+        builds.append(1)
+        started.set()
+        release.wait(2)
+        return 0
+
+    monkeypatch.setattr(index, "_build", slow_build)
+    monkeypatch.setattr(index, "_built_at", None)
+    worker = threading.Thread(target=index.refresh_if_stale, args=(600,))
+    worker.start()
+    started.wait(2)
+    assert index.refresh_if_stale(600) is False  # busy: keep serving the old snapshot
+    release.set()
+    worker.join()
+    assert builds == [1]
@@ -0,0 +1,160 @@
+from datetime import datetime, timedelta
+
+import jwt
+import pytest
+from sqlalchemy import event
+
+from extensions import db
+from models import RevokedToken
+from services.tokens import _hash_token, get_verifier, issue_jwt, revoke_token, verify_jwt
+
+
+def _count_queries(app, fn):
+    statements = []
+
+    def _listener(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", _listener)
+    try:
+        result = fn()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", _listener)
+    return result, statements
+
+
+def test_repeat_verify_uses_no_queries(app):
+    with app.app_context():
+        token = issue_jwt(1, 2, 3)
+        assert verify_jwt(token)["article_id"] == 2
+
+        claims, statements = _count_queries(app, lambda: verify_jwt(token))
+        assert claims["article_id"] == 2
+        assert statements == []
+        assert get_verifier().stats()["hits"] == 1
+
+
+def test_revoke_takes_effect_immediately(app):
+    with app.app_context():
+        token = issue_jwt(1, 2, 3)
+        assert verify_jwt(token)
+        revoke_token(token)
+        assert verify_jwt(token) is None
+
+
+def test_revocation_from_another_worker_is_pulled(app):
+    app.config["TOKEN_REVOCATION_REFRESH_SECONDS"] = 0
+    with app.app_context():
+        token = issue_jwt(1, 2, 3)
+        assert verify_jwt(token)
+        # Written directly, as another process would
+        db.session.add(RevokedToken(token_hash=_hash_token(token)))
+        db.session.commit()
+        assert verify_jwt(token) is None
+
+
+def test_revoked_set_is_bounded_and_falls_back_to_db(app):
+    app.config["TOKEN_REVOKED_MAXSIZE"] = 2
+    with app.app_context():
+        tokens = [issue_jwt(1, i, 3) for i in range(4)]
+        for token in tokens:
+            assert verify_jwt(token)
+            revoke_token(token)
+        stats = get_verifier().stats()
+        assert stats["revoked"] == 2 and stats["revoked_overflowed"]
+        assert all(verify_jwt(t) is None for t in tokens)
+
+
+def test_first_refresh_seeds_only_the_window(app):
+    app.config["TOKEN_REVOKED_MAXSIZE"] = 2
+    with app.app_context():
+        old = datetime.utcnow() - timedelta(minutes=app.config["REVOCATION_FEED_WINDOW_MINUTES"] + 1)
+        db.session.add_all([RevokedToken(token_hash=f"old{i}", created_at=old) for i in range(5)])
+        db.session.commit()
+        token = issue_jwt(1, 2, 3)
+        assert verify_jwt(token)
+        stats = get_verifier().stats()
+        assert stats["revoked"] == 0 and not stats["revoked_overflowed"]
+
+
+def test_expired_and_tampered_tokens_rejected(app):
+    with app.app_context():
+        assert verify_jwt(issue_jwt(1, 2, 3, exp_minutes=-1)) is None
+        token = issue_jwt(1, 2, 3)
+        assert verify_jwt(token[:-2] + ("AA" if not token.endswith("AA") else "BB")) is None
+
+
+def test_jwks_empty_for_hs256(client):
+    rv = client.get("/.well-known/jwks.json")
+    assert rv.status_code == 200
+    assert rv.get_json() == {"keys": []}
+
+
+def test_eddsa_tokens_verify_offline_with_published_key(app, client):
+    pytest.importorskip("cryptography")
+    app.config["JWT_ALGORITHM"] = "EdDSA"
+    with app.app_context():
+        token = issue_jwt(1, 2, 3)
+
+    jwks = client.get("/.well-known/jwks.json")
+    assert "public" in jwks.headers["Cache-Control"]
+    [key] = jwks.get_json()["keys"]
+    assert key["alg"] == "EdDSA" and key["kid"] == jwt.get_unverified_header(token)["kid"]
+
+    # What a partner does, with no call back to us
+    public_key = jwt.PyJWK(key).key
+    assert jwt.decode(token, public_key, algorithms=["EdDSA"])["article_id"] == 2
+
+    with app.app_context():
+        assert verify_jwt(token)["article_id"] == 2
+
+
+def test_retired_key_still_verifies_and_hs256_fallback(app, tmp_path):
+    pytest.importorskip("cryptography")
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+    paths = []
+    for name in ("old.pem", "new.pem"):
+        pem = Ed25519PrivateKey.generate().private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+        (tmp_path / name).write_bytes(pem)
+        paths.append(str(tmp_path / name))
+
+    with app.app_context():
+        legacy = issue_jwt(1, 2, 3)
+    app.config.update(JWT_ALGORITHM="EdDSA", JWT_SIGNING_KEY_FILES=paths[0])
+    with app.app_context():
+        old = issue_jwt(1, 2, 3)
+
+    # Rotate: new key signs, old key stays published
+    app.extensions.pop("jwt_keyring")
+    app.config["JWT_SIGNING_KEY_FILES"] = f"{paths[1]},{paths[0]}"
+    with app.app_context():
+        new = issue_jwt(1, 2, 3)
+        assert jwt.get_unverified_header(new)["kid"] != jwt.get_unverified_header(old)["kid"]
+        assert verify_jwt(new) and verify_jwt(old) and verify_jwt(legacy)
+
+
+def test_asymmetric_keys_required_outside_development(app):
+    pytest.importorskip("cryptography")
+    from services.signing_keys import get_keyring
+    app.config.update(JWT_ALGORITHM="EdDSA", ENV="production")
+    with pytest.raises(RuntimeError, match="JWT_SIGNING_KEY_FILES"):
+        get_keyring(app)
+
+
+def test_revocation_feed(app, client):
+    with app.app_context():
+        tokens = [issue_jwt(1, i, 3) for i in range(3)]
+        for t in tokens[:2]:
+            revoke_token(t)
+
+    body = client.get("/.well-known/paypr-revocations.json").get_json()
+    assert body["revoked"] == [_hash_token(t) for t in tokens[:2]]
+
+    with app.app_context():
+        revoke_token(tokens[2])
+    later = client.get(f"/.well-known/paypr-revocations.json?since={body['next_since']}").get_json()
+    assert later["revoked"] == [_hash_token(tokens[2])]
+    assert client.get("/.well-known/paypr-revocations.json?since=x").status_code == 400